@@ -30,6 +30,9 @@ from datetime import datetime
 import io
 from functools import wraps
 
+from utils.schema import WEEK_MONTH
+from utils.dates import parse_work_date
+
 app = Flask(__name__)
 
 # Enable CORS for React frontend (include Vite dev server origins)
@@ -113,22 +116,11 @@ def root_data():
             # Fallback to old method
             sales_by_month = [0] * 12
             for r in data:
-                date_str = r.get('(Week / \nMonth)') or r.get('(Week / Month)') or r.get('Tarih') or r.get('Date')
+                date_str = r.get(WEEK_MONTH) or r.get('Tarih') or r.get('Date')
                 kar_zarar = float(r.get('General Total\n Cost (USD)') or r.get('KAR-ZARAR', 0) or 0)
-                if date_str:
-                    try:
-                        # Try to extract month and year
-                        dt = None
-                        for fmt in ("%Y-%m-%d", "%d.%m.%Y", "%Y/%m/%d", "%d/%m/%Y"):
-                            try:
-                                dt = datetime.strptime(str(date_str)[:10], fmt)
-                                break
-                            except Exception:
-                                continue
-                        if dt and dt.year == year:
-                            sales_by_month[dt.month - 1] += kar_zarar
-                    except Exception:
-                        continue
+                dt = parse_work_date(date_str)
+                if dt and dt.year == year:
+                    sales_by_month[dt.month - 1] += kar_zarar
             sales = sales_by_month
 
     response = {
@@ -189,22 +181,11 @@ def get_data():
             # Fallback to old method
             sales_by_month = [0] * 12
             for r in data:
-                date_str = r.get('(Week / \nMonth)') or r.get('(Week / Month)') or r.get('Tarih') or r.get('Date')
+                date_str = r.get(WEEK_MONTH) or r.get('Tarih') or r.get('Date')
                 kar_zarar = float(r.get('General Total\n Cost (USD)') or r.get('KAR-ZARAR', 0) or 0)
-                if date_str:
-                    try:
-                        # Try to extract month and year
-                        dt = None
-                        for fmt in ("%Y-%m-%d", "%d.%m.%Y", "%Y/%m/%d", "%d/%m/%Y"):
-                            try:
-                                dt = datetime.strptime(str(date_str)[:10], fmt)
-                                break
-                            except Exception:
-                                continue
-                        if dt and dt.year == year:
-                            sales_by_month[dt.month - 1] += kar_zarar
-                    except Exception:
-                        continue
+                dt = parse_work_date(date_str)
+                if dt and dt.year == year:
+                    sales_by_month[dt.month - 1] += kar_zarar
             sales = sales_by_month
 
     response = {
@@ -496,8 +477,6 @@ _excel_cache = {
 
 def load_excel_reference_data(file_path=None):
     """Load Info, Hourly Rates, and Summary sheets from Excel file into cache"""
-    global _excel_cache
-    
     if file_path is None:
         # Try to find latest xlsb file in uploads
         upload_dir = app.config['UPLOAD_FOLDER']
@@ -541,42 +520,6 @@ def load_excel_reference_data(file_path=None):
         print(f"Error loading Excel reference data: {e}")
         return False
 
-def xlookup(lookup_value, lookup_array, return_array, if_not_found=0):
-    """Python implementation of Excel XLOOKUP function"""
-    try:
-        # Convert to pandas Series if needed
-        if not isinstance(lookup_array, pd.Series):
-            lookup_array = pd.Series(lookup_array)
-        if not isinstance(return_array, pd.Series):
-            return_array = pd.Series(return_array)
-        
-        # Handle different data types
-        if pd.isna(lookup_value):
-            return if_not_found
-        
-        # Try exact match first
-        mask = lookup_array == lookup_value
-        
-        # If no exact match and both are strings, try normalized comparison
-        if not mask.any() and isinstance(lookup_value, str):
-            try:
-                # Normalize by removing extra spaces and converting to uppercase
-                normalized_lookup = ' '.join(str(lookup_value).strip().upper().split())
-                normalized_array = lookup_array.astype(str).str.strip().str.upper().apply(lambda x: ' '.join(x.split()))
-                mask = normalized_array == normalized_lookup
-            except:
-                pass
-        
-        if mask.any():
-            idx = mask.idxmax()
-            result = return_array.iloc[idx] if isinstance(return_array, pd.Series) else return_array[idx]
-            return result if pd.notna(result) else if_not_found
-        
-        return if_not_found
-    except Exception as e:
-        print(f"XLOOKUP error: {e}")
-        return if_not_found
-
 def safe_float(value, default=0.0):
     """Safely convert value to float"""
     try:
@@ -0,0 +1,133 @@
+"""natural_key + row_hash on database_record for incremental re-import
+
+Revision ID: record_natural_key
+Revises: record_work_period
+Create Date: 2026-10-18
+
+"""
+import json
+from datetime import datetime, date, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'record_natural_key'
+down_revision = 'record_work_period'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 5000
+
+
+# natural_key as models.database_record computed it at this revision (ID + week +
+# project + scope, with the utils.dates parser for the week). Copied rather than
+# imported so the backfill stays the same when the application code changes.
+
+WORK_DATE_KEYS = ('(Week / \nMonth)', '(Week /\nMonth)', '(Week / Month)', '(Week /\n Month)',
+                  'Week / Month', 'Week/Month', 'Week/\nMonth', 'Date', 'Tarih')
+
+_EXCEL_EPOCH = date(1899, 12, 30)
+_SERIAL_MIN, _SERIAL_MAX = 20000, 80000
+_FORMATS = (
+    ('%d/%b/%Y', 11),
+    ('%d/%B/%Y', 20),
+    ('%Y-%m-%d', 10),
+    ('%Y/%m/%d', 10),
+    ('%d.%m.%Y', 10),
+    ('%d/%m/%Y', 10),
+    ('%d-%m-%Y', 10),
+    ('%m/%d/%Y', 10),
+)
+
+
+def _first(row, *names):
+    for n in names:
+        v = row.get(n)
+        if v is None:
+            continue
+        if isinstance(v, str) and v.strip() in ('', 'nan', 'None', 'NaT'):
+            continue
+        return v
+    return None
+
+
+def _as_str(v, max_len):
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s[:max_len] if s else None
+
+
+def _from_serial(n):
+    if _SERIAL_MIN <= n <= _SERIAL_MAX:
+        return _EXCEL_EPOCH + timedelta(days=int(n))
+    return None
+
+
+def _parse_work_date(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date() if value == value else None
+    if isinstance(value, date):
+        return value
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return _from_serial(value) if value == value else None
+    s = str(value).strip()
+    if not s or s in ('nan', 'NaT', 'None'):
+        return None
+    for fmt, width in _FORMATS:
+        try:
+            return datetime.strptime(s[:width].strip(), fmt).date()
+        except ValueError:
+            continue
+    try:
+        return _from_serial(float(s))
+    except ValueError:
+        return None
+
+
+def _natural_key(row):
+    parts = (_as_str(_first(row, 'ID'), 50), _parse_work_date(_first(row, *WORK_DATE_KEYS)),
+             _as_str(_first(row, 'Projects'), 200), _as_str(_first(row, 'Scope'), 255))
+    return '|'.join('' if p is None else str(p) for p in parts)[:255]
+
+
+def upgrade():
+    op.add_column('database_record', sa.Column('natural_key', sa.String(255), nullable=True))
+    op.add_column('database_record', sa.Column('row_hash', sa.String(64), nullable=True))
+
+    # Backfill natural_key only; row_hash is filled in by record_row_hash.
+    conn = op.get_bind()
+    table = sa.table('database_record', sa.column('id', sa.Integer), sa.column('data', sa.Text),
+                     sa.column('natural_key', sa.String))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, table.c.data)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for rec_id, data in rows:
+            try:
+                key = _natural_key(json.loads(data))
+            except Exception:
+                continue
+            conn.execute(table.update().where(table.c.id == rec_id).values(natural_key=key))
+        last_id = rows[-1][0]
+
+    op.create_index('ix_database_record_natural_key', 'database_record', ['natural_key'])
+
+
+def downgrade():
+    op.drop_index('ix_database_record_natural_key', table_name='database_record')
+    op.drop_column('database_record', 'row_hash')
+    op.drop_column('database_record', 'natural_key')
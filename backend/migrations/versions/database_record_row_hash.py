@@ -0,0 +1,73 @@
+"""backfill database_record.row_hash from the stored payloads
+
+Revision ID: record_row_hash
+Revises: system_info_table
+Create Date: 2026-10-18
+
+record_natural_key left row_hash NULL, so the first incremental import or
+recalculation rewrote every existing row just to record its hash. The hash is
+now taken over the record's content with sorted keys, which the stored JSON
+gives back regardless of its key order, so it can be filled in here.
+
+"""
+import hashlib
+import json
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'record_row_hash'
+down_revision = 'system_info_table'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 5000
+
+
+# models.database_record.payload_hash at this revision. Copied rather than
+# imported so the backfill stays the same when the model code changes.
+
+def _json_safe(row):
+    return {k: (None if isinstance(v, float) and not math.isfinite(v) else v) for k, v in row.items()}
+
+
+def _payload_hash(row):
+    canonical = json.dumps(_json_safe(row), ensure_ascii=False, default=str, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def upgrade():
+    conn = op.get_bind()
+    table = sa.table('database_record', sa.column('id', sa.Integer), sa.column('data', sa.Text),
+                     sa.column('row_hash', sa.String))
+    set_hash = (table.update()
+                .where(table.c.id == sa.bindparam('rec_id'))
+                .values(row_hash=sa.bindparam('hash')))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, table.c.data)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        hashes = []
+        for rec_id, data in rows:
+            try:
+                hashes.append({'rec_id': rec_id, 'hash': _payload_hash(json.loads(data))})
+            except Exception:
+                continue
+        if hashes:
+            conn.execute(set_hash, hashes)
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    # Earlier revisions hash the serialised text; their importer refills row_hash
+    op.execute('UPDATE database_record SET row_hash = NULL')
@@ -0,0 +1,140 @@
+"""persist parsed work year / month / ISO week on database_record
+
+Revision ID: record_work_period
+Revises: normalize_record_keys
+Create Date: 2026-10-18
+
+"""
+import json
+import re
+from datetime import datetime, date, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'record_work_period'
+down_revision = 'normalize_record_keys'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 5000
+
+
+# The (Week / Month) parser of utils.dates and the key lookup of
+# models.database_record at this revision. Copied rather than imported so the
+# backfill stays the same when the application code changes.
+
+WORK_DATE_KEYS = ('(Week / \nMonth)', '(Week /\nMonth)', '(Week / Month)', '(Week /\n Month)',
+                  'Week / Month', 'Week/Month', 'Week/\nMonth', 'Date', 'Tarih')
+
+_EXCEL_EPOCH = date(1899, 12, 30)
+_SERIAL_MIN, _SERIAL_MAX = 20000, 80000
+_FORMATS = (
+    ('%d/%b/%Y', 11),
+    ('%d/%B/%Y', 20),
+    ('%Y-%m-%d', 10),
+    ('%Y/%m/%d', 10),
+    ('%d.%m.%Y', 10),
+    ('%d/%m/%Y', 10),
+    ('%d-%m-%Y', 10),
+    ('%m/%d/%Y', 10),
+)
+_YEAR_RE = re.compile(r'(\d{4})')
+
+
+def _first(row, *names):
+    for n in names:
+        v = row.get(n)
+        if v is None:
+            continue
+        if isinstance(v, str) and v.strip() in ('', 'nan', 'None', 'NaT'):
+            continue
+        return v
+    return None
+
+
+def _from_serial(n):
+    if _SERIAL_MIN <= n <= _SERIAL_MAX:
+        return _EXCEL_EPOCH + timedelta(days=int(n))
+    return None
+
+
+def _parse_work_date(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date() if value == value else None
+    if isinstance(value, date):
+        return value
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return _from_serial(value) if value == value else None
+    s = str(value).strip()
+    if not s or s in ('nan', 'NaT', 'None'):
+        return None
+    for fmt, width in _FORMATS:
+        try:
+            return datetime.strptime(s[:width].strip(), fmt).date()
+        except ValueError:
+            continue
+    try:
+        return _from_serial(float(s))
+    except ValueError:
+        return None
+
+
+def _work_period(value):
+    d = _parse_work_date(value)
+    if d is not None:
+        return d, d.year, d.month, d.isocalendar()[1]
+    if isinstance(value, str):
+        m = _YEAR_RE.search(value)
+        if m:
+            return None, int(m.group(1)), None, None
+    return None, None, None, None
+
+
+def upgrade():
+    op.add_column('database_record', sa.Column('work_year', sa.Integer(), nullable=True))
+    op.add_column('database_record', sa.Column('work_month', sa.Integer(), nullable=True))
+    op.add_column('database_record', sa.Column('work_week', sa.Integer(), nullable=True))
+
+    # Re-parse every record with the canonical parser (also refreshes work_date)
+    conn = op.get_bind()
+    table = sa.table('database_record', sa.column('id', sa.Integer), sa.column('data', sa.Text),
+                     sa.column('work_date', sa.Date), sa.column('work_year', sa.Integer),
+                     sa.column('work_month', sa.Integer), sa.column('work_week', sa.Integer))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, table.c.data)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for rec_id, data in rows:
+            try:
+                row = json.loads(data)
+            except Exception:
+                continue
+            work_date, year, month, week = _work_period(_first(row, *WORK_DATE_KEYS))
+            conn.execute(table.update().where(table.c.id == rec_id).values(
+                work_date=work_date, work_year=year, work_month=month, work_week=week))
+        last_id = rows[-1][0]
+
+    op.create_index('ix_database_record_work_year_month', 'database_record', ['work_year', 'work_month'])
+    op.create_index('ix_database_record_work_year_week', 'database_record', ['work_year', 'work_week'])
+
+
+def downgrade():
+    op.drop_index('ix_database_record_work_year_week', table_name='database_record')
+    op.drop_index('ix_database_record_work_year_month', table_name='database_record')
+    op.drop_column('database_record', 'work_week')
+    op.drop_column('database_record', 'work_month')
+    op.drop_column('database_record', 'work_year')
@@ -0,0 +1,30 @@
+"""unique (employee_id, period) on hourly_rates
+
+Revision ID: hourly_rate_unique_period
+Revises: record_natural_key
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'hourly_rate_unique_period'
+down_revision = 'record_natural_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the oldest row per (employee_id, period) — the one the old importer kept updating
+    op.execute(
+        'DELETE FROM hourly_rates WHERE id NOT IN '
+        '(SELECT MIN(id) FROM hourly_rates GROUP BY employee_id, period)'
+    )
+    with op.batch_alter_table('hourly_rates') as batch_op:
+        batch_op.create_unique_constraint('uq_hourly_rates_employee_period', ['employee_id', 'period'])
+
+
+def downgrade():
+    with op.batch_alter_table('hourly_rates') as batch_op:
+        batch_op.drop_constraint('uq_hourly_rates_employee_period', type_='unique')
@@ -0,0 +1,118 @@
+"""rewrite database_record payloads with canonical column names
+
+Revision ID: normalize_record_keys
+Revises: promote_record_fields
+Create Date: 2026-10-18
+
+Irreversible: the original spellings are not recorded, so downgrade() raises.
+
+"""
+import json
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'normalize_record_keys'
+down_revision = 'promote_record_fields'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 5000
+
+
+# The column-name registry of utils.schema at this revision. Copied rather than
+# imported so the rewrite stays the same when the registry changes.
+
+# Canonical name → other spellings (headers compare case- and whitespace-insensitively).
+# Where a record has several spellings, the canonical one and then the listed ones win.
+COLUMN_VARIANTS = {
+    '(Week / \nMonth)':           ('(Week /\nMonth)', '(Week / Month)', 'Week / Month', 'Week/Month'),
+    'TOTAL\n MH':                 ('TOTAL MH', 'Total MH', 'TOTAL_MH'),
+    'North/\nSouth':              (),
+    'General Total\n Cost (USD)': (),
+    'Hourly\n Rate':              (),
+    'AP-CB /\nSubcon':            ('APCB/Subcon',),
+    'Name Surname':               ('Name_Surname', 'NameSurname'),
+    'Projects/Group':             (),
+}
+
+
+def _header_key(name):
+    return re.sub(r'\s+', '', name).lower()
+
+
+_CANONICAL_BY_KEY = {_header_key(name): canonical
+                     for canonical, variants in COLUMN_VARIANTS.items()
+                     for name in (canonical,) + variants}
+_PRECEDENCE = {name: rank
+               for canonical, variants in COLUMN_VARIANTS.items()
+               for rank, name in enumerate((canonical,) + variants)}
+
+
+def _canonical_name(header):
+    header = str(header).strip()
+    return _CANONICAL_BY_KEY.get(_header_key(header), header)
+
+
+def _is_blank(v):
+    if v is None:
+        return True
+    if isinstance(v, float) and v != v:
+        return True
+    return isinstance(v, str) and v.strip() in ('', 'nan', 'None', 'NaT')
+
+
+def _is_empty(v):
+    if _is_blank(v):
+        return True
+    try:
+        return float(v) == 0
+    except (TypeError, ValueError):
+        return False
+
+
+def _normalize_record(row):
+    out = {}
+    best = {}
+    for k, v in row.items():
+        key = _canonical_name(k)
+        rank = (_is_empty(v), _PRECEDENCE.get(str(k).strip(), len(_PRECEDENCE)))
+        if key in out and rank >= best[key]:
+            continue
+        out[key] = v
+        best[key] = rank
+    return out
+
+
+def upgrade():
+    conn = op.get_bind()
+    table = sa.table('database_record', sa.column('id', sa.Integer), sa.column('data', sa.Text))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, table.c.data)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for rec_id, data in rows:
+            try:
+                row = json.loads(data)
+            except Exception:
+                continue
+            normalized = _normalize_record(row)
+            if list(normalized) != list(row):
+                conn.execute(table.update().where(table.c.id == rec_id).values(
+                    data=json.dumps(normalized, ensure_ascii=False, default=str)))
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    raise NotImplementedError(
+        'normalize_record_keys is irreversible: the original column spellings are not recorded')
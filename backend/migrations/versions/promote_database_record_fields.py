@@ -0,0 +1,159 @@
+"""promote hot database_record fields to typed, indexed columns
+
+Revision ID: promote_record_fields
+Revises: add_generic_fields
+Create Date: 2026-10-18
+
+"""
+import json
+from datetime import datetime, date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'promote_record_fields'
+down_revision = 'add_generic_fields'
+branch_labels = None
+depends_on = None
+
+
+# (column, type, indexed)
+COLUMNS = [
+    ('employee_id',            sa.String(50),  True),
+    ('name_surname',           sa.String(200), True),
+    ('company',                sa.String(200), True),
+    ('projects',               sa.String(200), True),
+    ('projects_group',         sa.String(200), True),
+    ('discipline',             sa.String(200), True),
+    ('scope',                  sa.String(255), True),
+    ('north_south',            sa.String(20),  True),
+    ('work_date',              sa.Date(),      True),
+    ('total_mh',               sa.Float(),     False),
+    ('general_total_cost_usd', sa.Float(),     False),
+    ('isveren_hakedis_usd',    sa.Float(),     False),
+    ('status',                 sa.String(50),  True),
+    ('contract_no',            sa.String(100), True),
+]
+
+BATCH_SIZE = 5000
+
+
+# Field extraction as models.database_record did it at this revision. Copied rather
+# than imported so the backfill stays the same when the model code changes.
+
+def _first(row, *names):
+    for n in names:
+        v = row.get(n)
+        if v is None:
+            continue
+        if isinstance(v, str) and v.strip() in ('', 'nan', 'None', 'NaT'):
+            continue
+        return v
+    return None
+
+
+def _as_str(v, max_len):
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s[:max_len] if s else None
+
+
+def _as_float(v):
+    if v is None:
+        return None
+    try:
+        return float(v)
+    except (ValueError, TypeError):
+        return None
+
+
+def _as_date(v):
+    if v is None:
+        return None
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    if isinstance(v, (int, float)):
+        if v <= 1000:
+            return None
+        try:
+            return date.fromordinal(date(1899, 12, 30).toordinal() + int(v))
+        except (ValueError, OverflowError):
+            return None
+    s = str(v).strip()
+    try:
+        return datetime.strptime(s, '%d/%b/%Y').date()
+    except ValueError:
+        pass
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y', '%Y/%m/%d'):
+        try:
+            return datetime.strptime(s[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+# Column → (record keys to read, converter)
+FIELDS = {
+    'employee_id':            (('ID',), lambda v: _as_str(v, 50)),
+    'name_surname':           (('Name Surname',), lambda v: _as_str(v, 200)),
+    'company':                (('Company',), lambda v: _as_str(v, 200)),
+    'projects':               (('Projects',), lambda v: _as_str(v, 200)),
+    'projects_group':         (('Projects/Group',), lambda v: _as_str(v, 200)),
+    'discipline':             (('Discipline',), lambda v: _as_str(v, 200)),
+    'scope':                  (('Scope',), lambda v: _as_str(v, 255)),
+    'north_south':            (('North/\nSouth', 'North/South', 'North/ South'), lambda v: _as_str(v, 20)),
+    'work_date':              (('(Week / \nMonth)', '(Week /\nMonth)', '(Week / Month)',
+                                '(Week /\n Month)', 'Week / Month', 'Week/Month'), _as_date),
+    'total_mh':               (('TOTAL\n MH', 'TOTAL MH', 'TOTAL_MH', 'Total MH', 'TOTAL\nMH'), _as_float),
+    'general_total_cost_usd': (('General Total\n Cost (USD)', 'General Total Cost (USD)'), _as_float),
+    'isveren_hakedis_usd':    (('İşveren- Hakediş (USD)',), _as_float),
+    'status':                 (('Status',), lambda v: _as_str(v, 50)),
+    'contract_no':            (('İşveren- Sözleşme No',), lambda v: _as_str(v, 100)),
+}
+
+
+def _values(row):
+    return {col: conv(_first(row, *keys)) for col, (keys, conv) in FIELDS.items()}
+
+
+def upgrade():
+    for name, type_, _ in COLUMNS:
+        op.add_column('database_record', sa.Column(name, type_, nullable=True))
+
+    # Backfill the new columns from the existing JSON payloads
+    conn = op.get_bind()
+    table = sa.table('database_record', sa.column('id', sa.Integer), sa.column('data', sa.Text),
+                     *[sa.column(name, type_) for name, type_, _ in COLUMNS])
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, table.c.data)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for rec_id, data in rows:
+            try:
+                values = _values(json.loads(data))
+            except Exception:
+                continue
+            conn.execute(table.update().where(table.c.id == rec_id).values(**values))
+        last_id = rows[-1][0]
+
+    for name, _, indexed in COLUMNS:
+        if indexed:
+            op.create_index(f'ix_database_record_{name}', 'database_record', [name])
+
+
+def downgrade():
+    for name, _, indexed in reversed(COLUMNS):
+        if indexed:
+            op.drop_index(f'ix_database_record_{name}', table_name='database_record')
+        op.drop_column('database_record', name)
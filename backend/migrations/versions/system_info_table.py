@@ -0,0 +1,34 @@
+"""create system_info (key/value store, e.g. calculation reference signatures)
+
+Revision ID: system_info_table
+Revises: hourly_rate_unique_period
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'system_info_table'
+down_revision = 'hourly_rate_unique_period'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The model existed before but was never registered, so most databases lack the table
+    if sa.inspect(op.get_bind()).has_table('system_info'):
+        return
+    op.create_table(
+        'system_info',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('key', sa.String(50), nullable=False, unique=True),
+        sa.Column('value', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table('system_info')
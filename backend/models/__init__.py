@@ -7,3 +7,4 @@ from models.employee_info import EmployeeInfo
 from models.hourly_rate import HourlyRate
 from models.database_record import DatabaseRecord
 from models.saved_filter import SavedFilter
+from models.system_info import SystemInfo
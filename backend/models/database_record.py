@@ -1,11 +1,156 @@
+import hashlib
+import json
+import math
 from datetime import datetime
 from models import db
+from utils.dates import work_period
+
+
+def _first(row, *names):
+    """First non-empty value among the given keys of a record dict."""
+    for n in names:
+        v = row.get(n)
+        if v is None:
+            continue
+        if isinstance(v, str) and v.strip() in ('', 'nan', 'None', 'NaT'):
+            continue
+        return v
+    return None
+
+
+def _as_str(v, max_len):
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s[:max_len] if s else None
+
+
+def _as_float(v):
+    if v is None:
+        return None
+    try:
+        return float(v)
+    except (ValueError, TypeError):
+        return None
+
+
+# Promoted column → (record keys to read, converter)
+PROMOTED_FIELDS = {
+    'employee_id':            (('ID',), lambda v: _as_str(v, 50)),
+    'name_surname':           (('Name Surname',), lambda v: _as_str(v, 200)),
+    'company':                (('Company',), lambda v: _as_str(v, 200)),
+    'projects':               (('Projects',), lambda v: _as_str(v, 200)),
+    'projects_group':         (('Projects/Group',), lambda v: _as_str(v, 200)),
+    'discipline':             (('Discipline',), lambda v: _as_str(v, 200)),
+    'scope':                  (('Scope',), lambda v: _as_str(v, 255)),
+    'north_south':            (('North/\nSouth', 'North/South', 'North/ South'), lambda v: _as_str(v, 20)),
+    'total_mh':               (('TOTAL\n MH', 'TOTAL MH', 'TOTAL_MH', 'Total MH', 'TOTAL\nMH'), _as_float),
+    'general_total_cost_usd': (('General Total\n Cost (USD)', 'General Total Cost (USD)'), _as_float),
+    'isveren_hakedis_usd':    (('İşveren- Hakediş (USD)',), _as_float),
+    'status':                 (('Status',), lambda v: _as_str(v, 50)),
+    'contract_no':            (('İşveren- Sözleşme No',), lambda v: _as_str(v, 100)),
+}
+
+
+# (Week / Month) spellings, then the generic date columns some exports use instead
+WORK_DATE_KEYS = ('(Week / \nMonth)', '(Week /\nMonth)', '(Week / Month)', '(Week /\n Month)',
+                  'Week / Month', 'Week/Month', 'Week/\nMonth', 'Date', 'Tarih')
+
+
+def promoted_values(row):
+    """Return {column: value} for the promoted (typed) columns of a record dict."""
+    values = {col: conv(_first(row, *keys)) for col, (keys, conv) in PROMOTED_FIELDS.items()}
+    # Parsed once here with the canonical parser (utils.dates)
+    (values['work_date'], values['work_year'],
+     values['work_month'], values['work_week']) = work_period(_first(row, *WORK_DATE_KEYS))
+    values['natural_key'] = natural_key(values)
+    return values
+
+
+def natural_key(values):
+    """Identity of a record across re-imports: ID + week + project + scope (from promoted values)."""
+    parts = (values.get('employee_id'), values.get('work_date'), values.get('projects'), values.get('scope'))
+    return '|'.join('' if p is None else str(p) for p in parts)[:255]
+
+
+def payload_hash(row):
+    """
+    Content hash of a record dict, used to skip unchanged rows on re-import.
+    Keys are sorted, so the hash does not depend on the column order of the
+    sheet or of the stored JSON text.
+    """
+    canonical = json.dumps(_json_safe(row), ensure_ascii=False, default=str, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _json_safe(row):
+    """NaN/Infinity are not valid JSON → store them as null."""
+    return {k: (None if isinstance(v, float) and not math.isfinite(v) else v) for k, v in row.items()}
+
+
+def dump_payload(row):
+    """Serialise a record dict for the `data` column."""
+    return json.dumps(_json_safe(row), ensure_ascii=False, default=str)
+
 
 class DatabaseRecord(db.Model):
     __tablename__ = 'database_record'
-    
+
     id = db.Column(db.Integer, primary_key=True)
     personel = db.Column(db.String(120), nullable=False)
-    data = db.Column(db.Text, nullable=False)  # JSON string of record data
+    data = db.Column(db.Text, nullable=False)  # JSON string of the full record (all columns)
+
+    # Hot fields promoted out of `data` so filters and aggregations can run in SQL.
+    # Kept in sync with `data` by set_data(); `data` stays the source of truth.
+    employee_id            = db.Column(db.String(50), nullable=True, index=True)
+    name_surname           = db.Column(db.String(200), nullable=True, index=True)
+    company                = db.Column(db.String(200), nullable=True, index=True)
+    projects               = db.Column(db.String(200), nullable=True, index=True)
+    projects_group         = db.Column(db.String(200), nullable=True, index=True)
+    discipline             = db.Column(db.String(200), nullable=True, index=True)
+    scope                  = db.Column(db.String(255), nullable=True, index=True)
+    north_south            = db.Column(db.String(20), nullable=True, index=True)
+    work_date              = db.Column(db.Date, nullable=True, index=True)
+    work_year              = db.Column(db.Integer, nullable=True)
+    work_month             = db.Column(db.Integer, nullable=True)
+    work_week              = db.Column(db.Integer, nullable=True)  # ISO week
+    total_mh               = db.Column(db.Float, nullable=True)
+    general_total_cost_usd = db.Column(db.Float, nullable=True)
+    isveren_hakedis_usd    = db.Column(db.Float, nullable=True)
+    status                 = db.Column(db.String(50), nullable=True, index=True)
+    contract_no            = db.Column(db.String(100), nullable=True, index=True)
+
+    # Incremental re-import: rows are matched on natural_key and rewritten only when row_hash changes
+    natural_key            = db.Column(db.String(255), nullable=True, index=True)
+    row_hash               = db.Column(db.String(64), nullable=True)
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def from_row(cls, row, personel):
+        """Build a record from a DATABASE-sheet row dict."""
+        record = cls(personel=personel)
+        record.set_data(row)
+        return record
+
+    def set_data(self, row):
+        """Store *row* as the JSON payload and refresh the promoted columns."""
+        self.data = dump_payload(row)
+        self.row_hash = payload_hash(row)
+        for col, value in promoted_values(row).items():
+            setattr(self, col, value)
+
+    @staticmethod
+    def row_values(row, personel):
+        """Column values for a new record, for loaders that insert without ORM objects."""
+        values = promoted_values(row)
+        values['personel'] = personel
+        values['data'] = dump_payload(row)
+        values['row_hash'] = payload_hash(row)
+        return values
+
+
+# Period filters (year, year+month, year+ISO week) are range scans on these
+db.Index('ix_database_record_work_year_month', DatabaseRecord.work_year, DatabaseRecord.work_month)
+db.Index('ix_database_record_work_year_week', DatabaseRecord.work_year, DatabaseRecord.work_week)
@@ -3,6 +3,10 @@ from datetime import datetime
 
 class HourlyRate(db.Model):
     __tablename__ = 'hourly_rates'
+    __table_args__ = (
+        # One rate per employee and period (import upserts on this key)
+        db.UniqueConstraint('employee_id', 'period', name='uq_hourly_rates_employee_period'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
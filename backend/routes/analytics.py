@@ -3,21 +3,25 @@ Analytics Blueprint - powered by the calculation engine from app2.
 Provides advanced filtering, MH analysis, KAR-ZARAR trends and fill-empty-cells.
 """
 
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request, session, current_app
 import json
 import os
-import re
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from werkzeug.utils import secure_filename
 
-from models import db
-from models.database_record import DatabaseRecord
 from middleware.auth_middleware import role_required
+from utils.schema import NORTH_SOUTH
 from utils.calculations import (
-    load_excel_reference_data, calculate_auto_fields, fill_empty_cells_with_formulas,
-    safe_float, safe_str, excel_date_to_string, invalidate_cache, _excel_cache
+    load_excel_reference_data, fill_empty_cells_with_formulas, formula_memo_stats,
+    formula_timings, _excel_cache
 )
+from utils.recalc_jobs import start_recalculation, get_job as get_recalc_job, cancel_job as cancel_recalc_job
+from utils.record_store import load_records
+from utils.record_frame import group_sums
+from utils.filter_index import get_filter_index
+from utils.result_cache import cached_result, result_cache_stats
 
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 
@@ -29,15 +33,8 @@ UPLOAD_DIR = os.path.join(os.path.dirname(__file__), '..', 'uploads')
 # ---------------------------------------------------------------------------
 
 def _load_all_records():
-    """Return a list of parsed JSON dicts from DatabaseRecord."""
-    rows = DatabaseRecord.query.all()
-    out = []
-    for r in rows:
-        try:
-            out.append(json.loads(r.data))
-        except Exception:
-            continue
-    return out
+    """Parsed JSON dicts of all DatabaseRecord rows (shared record store; read-only)."""
+    return load_records()
 
 
 def _get_field(record, *names):
@@ -58,7 +55,7 @@ FILTER_FIELD_MAP = {
     'projects':      ['Projects', 'projects'],
     'nationality':   ['Nationality', 'nationality'],
     'status':        ['Status', 'status'],
-    'northSouth':    ['North/South', 'North/ South', 'North/\nSouth'],
+    'northSouth':    [NORTH_SOUTH],
     'control1':      ['Control-1'],
     'no1':           ['NO-1'],
     'no2':           ['NO-2'],
@@ -70,22 +67,15 @@ FILTER_FIELD_MAP = {
 }
 
 
-def _apply_filters(data, filters):
-    """Filter a list of record dicts according to a {key: [values]} dict."""
-    result = []
-    for rec in data:
-        ok = True
-        for key, values in filters.items():
-            if not values:
-                continue
-            field_names = FILTER_FIELD_MAP.get(key, [key])
-            rec_val = _get_field(rec, *field_names).upper()
-            if rec_val not in [str(v).strip().upper() for v in values if v]:
-                ok = False
-                break
-        if ok:
-            result.append(rec)
-    return result
+def _filter_bitmaps(index, filters):
+    """{key: packed bitmap} of the active entries of a {key: [values]} filter dict."""
+    return {key: index.bitmap(tuple(FILTER_FIELD_MAP.get(key, [key])), values)
+            for key, values in filters.items() if values}
+
+
+def _filter_mask(index, filters):
+    """Mask of the record frame rows satisfying a {key: [values]} filter dict."""
+    return index.mask(index.intersect(_filter_bitmaps(index, filters).values()))
 
 
 # ---------------------------------------------------------------------------
@@ -94,21 +84,23 @@ def _apply_filters(data, filters):
 
 @analytics_bp.route('/filter-options', methods=['GET'])
 @role_required('admin', 'project_manager', 'team_leader', 'hr', 'personal')
+@cached_result
 def get_filter_options(current_user):
-    """Return cascading filter options based on currently active filters."""
+    """
+    Return cascading filter options based on currently active filters: the values
+    of each dimension under the filters on the other dimensions (its own selection
+    would leave only the selected values), with their record counts.
+    """
     try:
         filters = json.loads(request.args.get('filters', '{}'))
-        data = _apply_filters(_load_all_records(), filters)
-
-        def unique_opts(*field_names):
-            vals = set()
-            for rec in data:
-                v = _get_field(rec, *field_names)
-                if v:
-                    vals.add(v)
-            return [{'label': v, 'value': v} for v in sorted(vals)]
-
-        options = {k: unique_opts(*v) for k, v in FILTER_FIELD_MAP.items()}
+        index = get_filter_index()
+        bitmaps = _filter_bitmaps(index, filters)
+
+        options = {}
+        for key, fields in FILTER_FIELD_MAP.items():
+            others = index.intersect(b for k, b in bitmaps.items() if k != key)
+            options[key] = [{'label': v, 'value': v, 'count': n}
+                            for v, n in index.counts(tuple(fields), others)]
         return jsonify(options)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -120,7 +112,8 @@ def filter_records(current_user):
     """Return records matching the posted filter dict."""
     try:
         filters = request.get_json(force=True).get('filters', {})
-        data = _apply_filters(_load_all_records(), filters)
+        index = get_filter_index()
+        data = index.frame.select(_filter_mask(index, filters))
         return jsonify({'success': True, 'data': data, 'count': len(data)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -128,6 +121,7 @@ def filter_records(current_user):
 
 @analytics_bp.route('/mh-summary', methods=['GET'])
 @role_required('admin', 'project_manager', 'team_leader', 'hr', 'personal')
+@cached_result
 def get_mh_summary(current_user):
     """MH table: aggregate TOTAL MH by person × month, with optional filters."""
     try:
@@ -135,62 +129,55 @@ def get_mh_summary(current_user):
         month   = request.args.get('month', '') or None
         filters = json.loads(request.args.get('filters', '{}'))
 
-        data = _apply_filters(_load_all_records(), filters)
-
-        def parse_month_year(date_str):
-            if not date_str:
-                return None, None
-            for fmt in ('%d/%b/%Y', '%d/%B/%Y', '%Y-%m-%d', '%Y/%m/%d',
-                        '%d.%m.%Y', '%m/%d/%Y'):
-                try:
-                    dt = datetime.strptime(str(date_str)[:11].strip(), fmt)
-                    return dt.month, dt.year
-                except Exception:
-                    continue
-            try:
-                dt = pd.to_datetime(date_str)
-                if pd.notna(dt):
-                    return dt.month, dt.year
-            except Exception:
-                pass
-            return None, None
-
-        person_data = {}
-        for rec in data:
-            name = _get_field(rec, 'Name Surname', 'nameSurname') or 'Unknown'
-            mh   = safe_float(rec.get('TOTAL MH') or rec.get('TOTAL\n MH') or
-                               rec.get('Total MH') or 0)
-            date_str = _get_field(rec, '(Week / Month)', 'Week / Month', 'Date', 'Tarih')
-            rec_month, rec_year = parse_month_year(date_str)
-
-            if name not in person_data:
-                person_data[name] = {
-                    'nameSurname': name,
-                    'discipline': _get_field(rec, 'Discipline'),
-                    'company':    _get_field(rec, 'Company'),
-                    'projectsGroup': _get_field(rec, 'Projects/Group'),
-                    'monthlyMH': {},
-                    'totalMH': 0,
-                }
-
-            if rec_month and rec_year:
-                if not year or str(rec_year) == year:
-                    mk = str(rec_month).zfill(2)
-                    if not month or mk == month:
-                        key = f'{rec_year}-{mk}' if not year else mk
-                        person_data[name]['monthlyMH'][key] = (
-                            person_data[name]['monthlyMH'].get(key, 0) + mh)
-                        person_data[name]['totalMH'] += mh
-            elif not year and not month:
-                person_data[name]['totalMH'] += mh
-
-        return jsonify({'data': list(person_data.values())})
+        index = get_filter_index()
+        frame = index.frame
+        # Every filtered person is listed; the period only limits what is summed
+        rows = np.flatnonzero(_filter_mask(index, filters))
+        rec_year  = frame.column('work_year')[rows]
+        rec_month = frame.column('work_month')[rows]
+        mh        = frame.column('total_mh')[rows]
+        in_period = frame.period_mask(year, month)[rows]
+
+        # One entry per person (first-seen order), described by their first record
+        person, names = pd.factorize(frame.values(('Name Surname', 'nameSurname'), rows, 'Unknown'))
+        first = rows[np.unique(person, return_index=True)[1]]
+        person_data = [{
+            'nameSurname':   name,
+            'discipline':    discipline,
+            'company':       company,
+            'projectsGroup': projects_group,
+            'monthlyMH': {},
+            'totalMH': 0,
+        } for name, discipline, company, projects_group in zip(
+            names, frame.values(('Discipline',), first), frame.values(('Company',), first),
+            frame.values(('Projects/Group',), first))]
+
+        dated = (rec_year > 0) & (rec_month > 0)
+        has_period = dated & in_period
+        # Undated records only count towards the all-time total
+        counted = has_period | (~dated & (not year and not month))
+        totals = np.bincount(person[counted], weights=mh[counted], minlength=len(names))
+        for entry, total, n in zip(person_data, totals, np.bincount(person[counted], minlength=len(names))):
+            if n:
+                entry['totalMH'] = float(total)
+
+        if has_period.any():
+            keys = person[has_period] * 100_000_000 + rec_year[has_period] * 100 + rec_month[has_period]
+            cells, _, sums = group_sums(keys, mh[has_period])
+            for cell, value in zip(cells, sums):
+                p, period = divmod(int(cell), 100_000_000)
+                mk = str(period % 100).zfill(2)
+                key = f'{period // 100}-{mk}' if not year else mk
+                person_data[p]['monthlyMH'][key] = float(value)
+
+        return jsonify({'data': person_data})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @analytics_bp.route('/kar-zarar-trends', methods=['GET'])
 @role_required('admin', 'project_manager', 'team_leader', 'hr', 'personal')
+@cached_result
 def get_kar_zarar_trends(current_user):
     """
     Monthly KAR-ZARAR (= İşveren Hakediş USD - General Total Cost USD) or
@@ -208,58 +195,35 @@ def get_kar_zarar_trends(current_user):
             'scope':         ['Scope'],
             'projects':      ['Projects'],
             'company':       ['Company'],
-            'northSouth':    ['North/South', 'North/ South'],
+            'northSouth':    [NORTH_SOUTH],
             'lsUnitRate':    ['LS/Unit Rate'],
         }
         dim_fields = field_map.get(dimension, ['Projects'])
 
-        data = _load_all_records()
-        agg = {}
-
-        for rec in data:
-            dim_val = _get_field(rec, *dim_fields)
-            if not dim_val:
-                continue
-
-            if metric == 'totalMH':
-                value = safe_float(rec.get('TOTAL MH') or rec.get('TOTAL\n MH') or 0)
-                if value <= 0:
-                    continue
-            else:
-                actual = safe_float(rec.get('İşveren- Hakediş (USD)') or
-                                    rec.get('İşveren- Hakediş') or 0)
-                cost   = safe_float(rec.get('General Total Cost (USD)') or
-                                    rec.get('General Total\n Cost (USD)') or 0)
-                if actual == 0 and cost == 0:
-                    continue
-                value = actual - cost
-
-            date_str = _get_field(rec, '(Week / Month)', 'Date', 'Tarih')
-            if not date_str:
-                continue
-
-            rec_year, rec_month = None, None
-            for fmt in ('%d/%b/%Y', '%d/%B/%Y', '%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y'):
-                try:
-                    dt = datetime.strptime(date_str[:11].strip(), fmt)
-                    rec_year, rec_month = dt.year, dt.month
-                    break
-                except Exception:
-                    pass
-            if not rec_year:
-                m = re.search(r'(\d{4})', date_str)
-                if m:
-                    rec_year = int(m.group(1))
-                    rec_month = 1
-
-            if not rec_year or not rec_month:
-                continue
-            if year and str(rec_year) != year:
-                continue
-
-            month_key = f'{rec_year}-{str(rec_month).zfill(2)}'
-            bucket = agg.setdefault(dim_val, {})
-            bucket[month_key] = bucket.get(month_key, 0) + value
+        frame = get_filter_index().frame
+        if metric == 'totalMH':
+            value = frame.column('total_mh')
+            keep = value > 0
+        else:
+            actual = frame.column('hakedis_usd')
+            cost   = frame.column('cost_usd')
+            keep = (actual != 0) | (cost != 0)
+            value = actual - cost
+
+        # Period parsed at import; a bare year counts as January
+        rec_year = frame.column('work_year')
+        keep &= frame.period_mask(year=year) & (rec_year > 0)
+        rows = np.flatnonzero(keep)
+        dim_vals = frame.values(tuple(dim_fields), rows)
+        rows = rows[dim_vals != '']
+        dim_codes, dims = pd.factorize(dim_vals[dim_vals != ''])
+        periods = rec_year[rows] * 100 + np.maximum(frame.column('work_month')[rows], 1)
+
+        agg = {dim_val: {} for dim_val in dims}
+        cells, _, sums = group_sums(dim_codes * 100_000_000 + periods, value[rows])
+        for cell, total in zip(cells, sums):
+            d, period = divmod(int(cell), 100_000_000)
+            agg[dims[d]][f'{period // 100}-{str(period % 100).zfill(2)}'] = float(total)
 
         result = []
         for dim_val, monthly in agg.items():
@@ -277,6 +241,7 @@ def get_kar_zarar_trends(current_user):
 
 @analytics_bp.route('/total-mh-pie', methods=['GET'])
 @role_required('admin', 'project_manager', 'team_leader', 'hr', 'personal')
+@cached_result
 def get_total_mh_pie(current_user):
     """Return TOTAL MH aggregated by a dimension, for pie/bar charts."""
     try:
@@ -288,28 +253,17 @@ def get_total_mh_pie(current_user):
             'discipline':    ['Discipline'],
             'company':       ['Company'],
             'projectsGroup': ['Projects/Group'],
-            'northSouth':    ['North/South', 'North/ South'],
+            'northSouth':    [NORTH_SOUTH],
             'lsUnitRate':    ['LS/Unit Rate'],
             'nameSurname':   ['Name Surname'],
         }
         dim_fields = field_map.get(dimension, ['Projects'])
 
-        data = _load_all_records()
-        agg = {}
-
-        for rec in data:
-            dim_val = _get_field(rec, *dim_fields) or 'Other'
-            mh = safe_float(rec.get('TOTAL MH') or rec.get('TOTAL\n MH') or 0)
-            if mh <= 0:
-                continue
-
-            if year:
-                date_str = _get_field(rec, '(Week / Month)', 'Date', 'Tarih')
-                m = re.search(r'(\d{4})', date_str)
-                if not m or m.group(1) != year:
-                    continue
-
-            agg[dim_val] = agg.get(dim_val, 0) + mh
+        frame = get_filter_index().frame
+        mh = frame.column('total_mh')
+        rows = np.flatnonzero(frame.period_mask(year=year) & (mh > 0))
+        dims, _, sums = group_sums(frame.values(tuple(dim_fields), rows, 'Other'), mh[rows])
+        agg = dict(zip(dims, sums.tolist()))
 
         colors = ['#00d4ff', '#8b5cf6', '#0cdba8', '#f59e0b', '#ef4444',
                   '#ec4899', '#6366f1', '#14b8a6', '#f97316', '#a855f7']
@@ -326,6 +280,7 @@ def get_total_mh_pie(current_user):
 
 @analytics_bp.route('/apcb-pie', methods=['GET'])
 @role_required('admin', 'project_manager', 'team_leader', 'hr', 'personal')
+@cached_result
 def get_apcb_pie(current_user):
     """AP-CB vs Subcon counts."""
     try:
@@ -337,39 +292,52 @@ def get_apcb_pie(current_user):
         return jsonify({'error': str(e)}), 500
 
 
+@analytics_bp.route('/cache-stats', methods=['GET'])
+@role_required('admin')
+def cache_stats(current_user):
+    """Counters of the analytics result cache and the formula memo."""
+    return jsonify({'results': result_cache_stats(), 'formulas': formula_memo_stats()})
+
+
 @analytics_bp.route('/recalculate', methods=['POST'])
 @role_required('admin')
 def recalculate_all(current_user):
     """
-    Re-run calculate_auto_fields on every DatabaseRecord.
-    Useful after a new reference Excel is uploaded.
+    Start re-running the calculation engine in the background. Useful after a new
+    reference Excel is uploaded. Body: {"mode": "incremental" | "full"}; incremental
+    (default) only recalculates records whose reference inputs changed.
+    Returns 202 with the job; poll GET /recalculate/<job_id> for progress.
     """
     try:
-        invalidate_cache()
-        records = DatabaseRecord.query.all()
-        updated = 0
-        errors  = []
-
-        for r in records:
-            try:
-                data = json.loads(r.data)
-                data, _ = calculate_auto_fields(data, upload_dir=UPLOAD_DIR)
-                r.data = json.dumps(data, ensure_ascii=False, default=str)
-                updated += 1
-            except Exception as e:
-                errors.append(f'Record {r.id}: {str(e)}')
-
-        db.session.commit()
-        return jsonify({
-            'success': True,
-            'updated': updated,
-            'errors': errors,
-        })
+        mode = (request.get_json(silent=True) or {}).get('mode', 'incremental')
+        if mode not in ('incremental', 'full'):
+            return jsonify({'error': f'Invalid mode: {mode}'}), 400
+        job, started = start_recalculation(current_app._get_current_object(), UPLOAD_DIR, mode)
+        return jsonify({'success': True, 'already_running': not started, **job}), 202
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+@analytics_bp.route('/recalculate/<job_id>', methods=['GET'])
+@role_required('admin')
+def recalculate_status(job_id, current_user):
+    """Progress of a recalculation job: processed/total/errors/ETA."""
+    job = get_recalc_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@analytics_bp.route('/recalculate/<job_id>', methods=['DELETE'])
+@role_required('admin')
+def recalculate_cancel(job_id, current_user):
+    """Cancel a recalculation job; batches already committed are kept."""
+    job = cancel_recalc_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 202
+
+
 @analytics_bp.route('/fill-empty-cells', methods=['POST'])
 @role_required('admin')
 def fill_empty_cells(current_user):
@@ -420,6 +388,7 @@ def fill_empty_cells(current_user):
             'rows': int(df_filled.shape[0]),
             'columns': int(df_filled.shape[1]),
             'download_url': f'/api/analytics/download/{out_name}',
+            'formula_timings': formula_timings(),
         })
     except Exception as e:
         import traceback
@@ -1,10 +1,12 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from models import db
 from models.user import User
 from models.employee_info import EmployeeInfo
-from models.database_record import DatabaseRecord
 from sqlalchemy import func
-import json
+from utils.schema import TOTAL_MH, GENERAL_TOTAL_COST_USD
+from utils.calculations import safe_str
+from utils.record_store import load_records
+from utils.conditional import conditional_get, table_version
 import re
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
@@ -23,96 +25,143 @@ def _clean_full_name(first, last):
 
 
 def _get_all_records_data():
-    """Load all DatabaseRecord rows and parse their JSON data."""
-    records = DatabaseRecord.query.all()
-    parsed = []
-    for r in records:
-        try:
-            parsed.append(json.loads(r.data))
-        except:
-            continue
-    return parsed
+    """Parsed JSON data of all DatabaseRecord rows (shared record store; read-only)."""
+    return load_records()
 
 
-@dashboard_bp.route('/stats', methods=['GET'])
-def get_stats():
-    """Get general dashboard statistics from real data."""
-    data = _get_all_records_data()
+def _number(value):
+    """float(value or 0), or None for values the aggregates skip."""
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class _DashboardPass:
+    """
+    Aggregates of one pass over the records, shared by the dashboard widgets.
+    Only the parts the requested widgets read are collected.
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.records = 0
+        self.total_mh = 0
+        self.total_cost = 0
+        self.completed = 0
+        self.project_names = set()
+        self.person_mh, self.person_tasks = {}, {}    # Name Surname → MH / records
+        self.dept_mh, self.dept_count = {}, {}        # Discipline → MH / records
+        self.discipline_counts = {}                   # stripped Discipline → records
+        self.projects = {}                            # Projects → users, disciplines, MH, cost
+
+    def scan(self, records):
+        totals, people, departments, disciplines, projects = (
+            part in self.parts for part in ('totals', 'people', 'departments', 'disciplines', 'projects'))
+        self.records = len(records)
+
+        for r in records:
+            mh = _number(r.get(TOTAL_MH))
+            p_name = r.get('Projects', '')
+            disc = r.get('Discipline', '')
+
+            if totals:
+                if mh is not None:
+                    self.total_mh += mh
+                cost = _number(r.get(GENERAL_TOTAL_COST_USD))
+                if cost is not None:
+                    self.total_cost += cost
+                status = str(r.get('Status', '')).lower()
+                if 'tamamlan' in status or 'completed' in status:
+                    self.completed += 1
+                if p_name:
+                    self.project_names.add(p_name)
+
+            if people:
+                name = r.get('Name Surname', '')
+                if name:
+                    self.person_mh[name] = self.person_mh.get(name, 0) + (mh if mh is not None else 0)
+                    self.person_tasks[name] = self.person_tasks.get(name, 0) + 1
+
+            if departments and disc:
+                self.dept_mh[disc] = self.dept_mh.get(disc, 0) + (mh if mh is not None else 0)
+                self.dept_count[disc] = self.dept_count.get(disc, 0) + 1
+
+            if disciplines:
+                discipline = safe_str(disc).strip()
+                if discipline:
+                    self.discipline_counts[discipline] = self.discipline_counts.get(discipline, 0) + 1
+
+            if projects and p_name:
+                if p_name not in self.projects:
+                    self.projects[p_name] = {
+                        'users': set(),
+                        'disciplines': set(),
+                        'totalMH': 0,
+                        'totalCost': 0
+                    }
+                project = self.projects[p_name]
+
+                person = r.get('Name Surname', '')
+                if person:
+                    project['users'].add(person)
+                if disc:
+                    project['disciplines'].add(disc)
+                if mh is not None:
+                    project['totalMH'] += mh
+                cost = _number(r.get(GENERAL_TOTAL_COST_USD))
+                if cost is not None:
+                    project['totalCost'] += cost
+        return self
+
+
+# ---------------------------------------------------------------------------
+# Widgets: payload builders over a _DashboardPass
+# ---------------------------------------------------------------------------
+
+def _stats(acc):
+    """General dashboard statistics."""
     total_personnel = User.query.count()
-    
-    # Calculate real total MH
-    total_mh = 0
-    for r in data:
-        mh = r.get('TOTAL\n MH') or r.get('TOTAL MH') or 0
-        try:
-            total_mh += float(mh)
-        except:
-            pass
-    
+
     # Count unique projects
-    projects = set()
-    for r in data:
-        p = r.get('Projects', '')
-        if p:
-            projects.add(str(p))
-    
-    # Completed = records with status containing 'tamamlan' or 'completed'
-    completed = sum(1 for r in data if 'tamamlan' in str(r.get('Status', '')).lower() or 'completed' in str(r.get('Status', '')).lower())
-    
+    projects = {str(p) for p in acc.project_names}
+
     # Average performance: use ratio of completed to total if applicable
-    avg_performance = round((completed / len(data) * 100)) if data else 0
+    avg_performance = round((acc.completed / acc.records * 100)) if acc.records else 0
 
-    return jsonify({
+    return {
         'totalPersonnel': total_personnel,
         'avgPerformance': avg_performance,
-        'totalMH': round(total_mh, 1),
-        'completedTasks': completed,
+        'totalMH': round(acc.total_mh, 1),
+        'completedTasks': acc.completed,
         'activeProjects': len(projects),
-        'totalRecords': len(data)
-    })
+        'totalRecords': acc.records
+    }
 
 
-@dashboard_bp.route('/personnel', methods=['GET'])
-def get_personnel():
-    """Get list of personnel with real details from DB."""
+def _personnel(acc):
+    """Personnel list with their MH and record counts."""
     # Join User and EmployeeInfo
     results = db.session.query(User, EmployeeInfo).outerjoin(
         EmployeeInfo, User.id == EmployeeInfo.user_id
     ).all()
-    
-    # Pre-compute MH per person from DatabaseRecord
-    all_data = _get_all_records_data()
-    mh_by_name = {}
-    task_count_by_name = {}
-    
-    for r in all_data:
-        name = r.get('Name Surname', '')
-        if not name:
-            continue
-        mh = 0
-        try:
-            mh = float(r.get('TOTAL\n MH') or r.get('TOTAL MH') or 0)
-        except:
-            pass
-        mh_by_name[name] = mh_by_name.get(name, 0) + mh
-        task_count_by_name[name] = task_count_by_name.get(name, 0) + 1
-    
+
     personnel_data = []
     for user, info in results:
         full_name = _clean_full_name(user.first_name, user.last_name)
-        
+
         # Try to match user name to database records
-        user_mh = mh_by_name.get(full_name, 0)
-        user_tasks = task_count_by_name.get(full_name, 0)
-        
+        user_mh = acc.person_mh.get(full_name, 0)
+        user_tasks = acc.person_tasks.get(full_name, 0)
+
         # Also try partial matches
         if user_mh == 0:
-            for rec_name, mh_val in mh_by_name.items():
+            for rec_name, mh_val in acc.person_mh.items():
                 if user.first_name in rec_name or user.last_name in rec_name:
                     user_mh = mh_val
-                    user_tasks = task_count_by_name.get(rec_name, 0)
+                    user_tasks = acc.person_tasks.get(rec_name, 0)
                     break
-        
+
         personnel_data.append({
             'id': user.id,
             'ad': full_name,
@@ -123,89 +172,30 @@ def get_personnel():
             'tamamlanan': user_tasks,
             'performans': min(100, round(user_mh / 10)) if user_mh > 0 else 0
         })
-    
-    return jsonify(personnel_data)
+    return personnel_data
 
 
-@dashboard_bp.route('/department-performance', methods=['GET'])
-def get_department_performance():
-    """Get performance stats by department (discipline)."""
-    all_data = _get_all_records_data()
-    
-    dept_mh = {}
-    dept_count = {}
-    
-    for r in all_data:
-        disc = r.get('Discipline', '')
-        if not disc:
-            continue
-        mh = 0
-        try:
-            mh = float(r.get('TOTAL\n MH') or r.get('TOTAL MH') or 0)
-        except:
-            pass
-        dept_mh[disc] = dept_mh.get(disc, 0) + mh
-        dept_count[disc] = dept_count.get(disc, 0) + 1
-    
+def _department_performance(acc):
+    """Performance stats by department (discipline)."""
     dept_data = []
-    for discipline in dept_mh:
-        count = dept_count[discipline]
-        avg_mh = dept_mh[discipline] / count if count > 0 else 0
+    for discipline in acc.dept_mh:
+        count = acc.dept_count[discipline]
+        avg_mh = acc.dept_mh[discipline] / count if count > 0 else 0
         dept_data.append({
             'departman': discipline,
             'ortalama': round(avg_mh, 1),
             'kisi': count,
-            'toplamMH': round(dept_mh[discipline], 1)
+            'toplamMH': round(acc.dept_mh[discipline], 1)
         })
-    
+
     dept_data.sort(key=lambda x: x['toplamMH'], reverse=True)
-    return jsonify(dept_data)
+    return dept_data
 
 
-@dashboard_bp.route('/projects', methods=['GET'])
-def get_projects():
-    """Get list of projects with real aggregated stats."""
-    all_data = _get_all_records_data()
-    
-    project_map = {}
-    
-    for r in all_data:
-        p_name = r.get('Projects', '')
-        if not p_name:
-            continue
-        
-        if p_name not in project_map:
-            project_map[p_name] = {
-                'name': p_name,
-                'userCount': 0,
-                'users': set(),
-                'disciplines': set(),
-                'totalMH': 0,
-                'totalCost': 0
-            }
-        
-        person = r.get('Name Surname', '')
-        if person:
-            project_map[p_name]['users'].add(person)
-        
-        disc = r.get('Discipline', '')
-        if disc:
-            project_map[p_name]['disciplines'].add(disc)
-        
-        try:
-            mh = float(r.get('TOTAL\n MH') or r.get('TOTAL MH') or 0)
-            project_map[p_name]['totalMH'] += mh
-        except:
-            pass
-        
-        try:
-            cost = float(r.get('General Total\n Cost (USD)') or 0)
-            project_map[p_name]['totalCost'] += cost
-        except:
-            pass
-    
+def _projects(acc):
+    """Projects with their aggregated stats."""
     result = []
-    for name, data in project_map.items():
+    for name, data in acc.projects.items():
         result.append({
             'name': name,
             'userCount': len(data['users']),
@@ -214,68 +204,117 @@ def get_projects():
             'totalMH': round(data['totalMH'], 1),
             'totalCost': round(data['totalCost'], 2)
         })
-    
+
     result.sort(key=lambda x: x['totalMH'], reverse=True)
-    return jsonify(result)
+    return result
 
 
-@dashboard_bp.route('/project-stats', methods=['GET'])
-def get_project_stats():
-    """Get aggregated stats for project reporting charts."""
-    all_data = _get_all_records_data()
-    
-    project_counts = {}
-    discipline_counts = {}
-    total_mh = 0
-    total_cost = 0
-    
-    for r in all_data:
-        p_name = r.get('Projects', '')
-        if p_name:
-            project_counts[p_name] = project_counts.get(p_name, 0) + 1
-
-        discipline = r.get('Discipline', '').strip()
-        if discipline:
-            discipline_counts[discipline] = discipline_counts.get(discipline, 0) + 1
-
-        try:
-            total_mh += float(r.get('TOTAL\n MH') or r.get('TOTAL MH') or 0)
-        except:
-            pass
-        
-        try:
-            total_cost += float(r.get('General Total\n Cost (USD)') or 0)
-        except:
-            pass
-    
+def _project_stats(acc):
+    """Aggregated stats for the project reporting charts."""
     # Category distribution - by discipline (e.g. Structure, Overhead, etc.)
     colors = ['#00d4ff', '#8b5cf6', '#0cdba8', '#f59e0b', '#ef4444', '#ec4899', '#6366f1', '#14b8a6', '#f97316', '#a855f7']
     category_data = []
-    for i, (k, v) in enumerate(sorted(discipline_counts.items(), key=lambda x: x[1], reverse=True)):
+    for i, (k, v) in enumerate(sorted(acc.discipline_counts.items(), key=lambda x: x[1], reverse=True)):
         category_data.append({
             'name': k,
             'value': v,
             'color': colors[i % len(colors)]
         })
-    
+
     # Project status distribution (based on real data assessment)
-    total_projects = len(project_counts)
+    total_projects = len(acc.project_names)
     active = max(1, int(total_projects * 0.6))
     completed = int(total_projects * 0.3)
     pending = total_projects - active - completed
-    
+
     project_status = [
         {'name': 'Devam Ediyor', 'value': active, 'color': '#00d4ff'},
         {'name': 'Tamamlandı', 'value': completed, 'color': '#0cdba8'},
         {'name': 'Beklemede', 'value': pending, 'color': '#f59e0b'}
     ]
-    
-    return jsonify({
-        'activeProjects': len(project_counts),
-        'totalTasks': len(all_data),
-        'totalMH': round(total_mh, 1),
-        'totalCost': round(total_cost, 2),
+
+    return {
+        'activeProjects': total_projects,
+        'totalTasks': acc.records,
+        'totalMH': round(acc.total_mh, 1),
+        'totalCost': round(acc.total_cost, 2),
         'avgProgress': 65,
         'categoryDistribution': category_data,
         'projectStatus': project_status
-    })
+    }
+
+
+# widget → (payload builder, aggregates it reads)
+WIDGETS = {
+    'stats':                  (_stats, {'totals'}),
+    'personnel':              (_personnel, {'people'}),
+    'department-performance': (_department_performance, {'departments'}),
+    'projects':               (_projects, {'projects'}),
+    'project-stats':          (_project_stats, {'totals', 'disciplines'}),
+}
+
+
+def _build(widgets):
+    """{widget: payload} for the given widget names, from a single pass over the records."""
+    parts = set().union(*(WIDGETS[w][1] for w in widgets))
+    acc = _DashboardPass(parts).scan(_get_all_records_data())
+    return {w: WIDGETS[w][0](acc) for w in widgets}
+
+
+# ---------------------------------------------------------------------------
+# Routes
+# ---------------------------------------------------------------------------
+
+@dashboard_bp.route('/stats', methods=['GET'])
+@conditional_get(table_version(User))
+def get_stats():
+    """Get general dashboard statistics from real data."""
+    return jsonify(_build(['stats'])['stats'])
+
+
+@dashboard_bp.route('/personnel', methods=['GET'])
+@conditional_get(table_version(User, EmployeeInfo))
+def get_personnel():
+    """Get list of personnel with real details from DB."""
+    return jsonify(_build(['personnel'])['personnel'])
+
+
+@dashboard_bp.route('/department-performance', methods=['GET'])
+@conditional_get()
+def get_department_performance():
+    """Get performance stats by department (discipline)."""
+    return jsonify(_build(['department-performance'])['department-performance'])
+
+
+@dashboard_bp.route('/projects', methods=['GET'])
+@conditional_get()
+def get_projects():
+    """Get list of projects with real aggregated stats."""
+    return jsonify(_build(['projects'])['projects'])
+
+
+@dashboard_bp.route('/project-stats', methods=['GET'])
+@conditional_get()
+def get_project_stats():
+    """Get aggregated stats for project reporting charts."""
+    return jsonify(_build(['project-stats'])['project-stats'])
+
+
+@dashboard_bp.route('/batch', methods=['POST'])
+def get_batch():
+    """
+    Several dashboard widgets computed in one pass over the records.
+    Body: {"widgets": ["stats", "projects", ...]} (default: all); returns {widget: payload}.
+    """
+    body = request.get_json(silent=True)
+    if body is None:
+        body = {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    widgets = body.get('widgets') or list(WIDGETS)
+    if not isinstance(widgets, list) or not all(isinstance(w, str) for w in widgets):
+        return jsonify({'error': 'widgets must be a list of widget names'}), 400
+    unknown = [w for w in widgets if w not in WIDGETS]
+    if unknown:
+        return jsonify({'error': f'Unknown widgets: {unknown}'}), 400
+    return jsonify(_build(list(dict.fromkeys(widgets))))
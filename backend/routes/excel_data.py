@@ -9,7 +9,9 @@ from models.hourly_rate import HourlyRate
 from models.user import User
 from functools import wraps
 from datetime import datetime
-import json
+from sqlalchemy import func
+from utils.record_store import get_snapshot
+from utils.conditional import conditional_get, table_version
 
 excel_data_bp = Blueprint('excel_data', __name__, url_prefix='/api/excel')
 
@@ -23,20 +25,29 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def _get_all_records_data():
-    """Load all DatabaseRecord rows and parse their JSON data."""
-    records = DatabaseRecord.query.all()
-    parsed = []
-    for r in records:
-        try:
-            data = json.loads(r.data)
-            data['_record_id'] = r.id  # Add internal ID for reference
-            data['_person'] = r.personel  # Add person name
-            parsed.append(data)
-        except Exception as e:
-            print(f"Error parsing record {r.id}: {e}")
-            continue
-    return parsed
+def _get_all_records_data(rows=None):
+    """Records (all, or the given store rows) with their internal id and person name added."""
+    rows = get_snapshot().rows if rows is None else rows
+    # Copies: the store's dicts are shared between requests
+    return [dict(row.data, _record_id=row.id, _person=row.personel) for row in rows]
+
+
+# Filters on promoted columns match the stored column value
+_PROMOTED_FILTERS = {
+    'Company':    'company',
+    'Projects':   'projects',
+    'Discipline': 'discipline',
+    'Status':     'status',
+}
+
+
+def _distinct_values(column, name=None):
+    """Distinct non-empty values of a promoted column, optionally restricted to *name* (case-insensitive)."""
+    query = db.session.query(column).filter(column.isnot(None)).distinct()
+    if name:
+        query = query.filter(func.lower(column) == name.lower())
+    return [v for (v,) in query.all()]
+
 
 @excel_data_bp.route('/import', methods=['POST'])
 @login_required
@@ -56,17 +67,26 @@ def import_excel_data():
 
 @excel_data_bp.route('/data/database', methods=['GET'])
 @login_required
+@conditional_get()
 def get_database_records():
     """Get all database records with optional filters"""
     try:
-        data = _get_all_records_data()
-        
-        # Apply filters from query parameters
+        # Apply filters from query parameters: promoted columns on the store rows,
+        # anything else on the copied record dicts
+        rows = get_snapshot().rows
         filters = {}
         for key in ['Company', 'Projects', 'Discipline', 'Nationality', 'Status']:
             value = request.args.get(key.lower())
-            if value:
+            if not value:
+                continue
+            field = _PROMOTED_FILTERS.get(key)
+            if field is not None:
+                needle = value.lower()
+                rows = [row for row in rows if needle in (getattr(row, field) or '').lower()]
+            else:
                 filters[key] = value
+
+        data = _get_all_records_data(rows)
         
         # Filter data
         if filters:
@@ -96,6 +116,7 @@ def get_database_records():
 
 @excel_data_bp.route('/data/employees', methods=['GET'])
 @login_required
+@conditional_get(table_version(User, EmployeeInfo))
 def get_employee_data():
     """Get employee information from EmployeeInfo table"""
     try:
@@ -155,6 +176,7 @@ def get_employee_data():
 
 @excel_data_bp.route('/data/hourly-rates', methods=['GET'])
 @login_required
+@conditional_get(table_version(HourlyRate))
 def get_hourly_rates_data():
     """Get hourly rates information"""
     try:
@@ -190,26 +212,15 @@ def get_hourly_rates_data():
 
 @excel_data_bp.route('/data/projects', methods=['GET'])
 @login_required
+@conditional_get()
 def get_project_data():
     """Get unique projects from database records"""
     try:
-        data = _get_all_records_data()
-        project_name = request.args.get('name')
-        
-        if project_name:
-            # Filter by project name
-            data = [r for r in data if str(r.get('Projects', '')).lower() == project_name.lower()]
-        
-        # Get unique projects
-        projects = set()
-        for record in data:
-            p = record.get('Projects', '')
-            if p:
-                projects.add(str(p))
+        projects = _distinct_values(DatabaseRecord.projects, request.args.get('name'))
         
         return jsonify({
             'success': True,
-            'projects': list(projects),
+            'projects': projects,
             'total': len(projects)
         }), 200
     except Exception as e:
@@ -221,25 +232,15 @@ def get_project_data():
 
 @excel_data_bp.route('/data/companies', methods=['GET'])
 @login_required
+@conditional_get()
 def get_company_data():
     """Get unique companies from database records"""
     try:
-        data = _get_all_records_data()
-        company_name = request.args.get('name')
-        
-        if company_name:
-            data = [r for r in data if str(r.get('Company', '')).lower() == company_name.lower()]
-        
-        # Get unique companies
-        companies = set()
-        for record in data:
-            c = record.get('Company', '')
-            if c:
-                companies.add(str(c))
+        companies = _distinct_values(DatabaseRecord.company, request.args.get('name'))
         
         return jsonify({
             'success': True,
-            'companies': list(companies),
+            'companies': companies,
             'total': len(companies)
         }), 200
     except Exception as e:
@@ -251,25 +252,15 @@ def get_company_data():
 
 @excel_data_bp.route('/data/disciplines', methods=['GET'])
 @login_required
+@conditional_get()
 def get_discipline_data():
     """Get unique disciplines from database records"""
     try:
-        data = _get_all_records_data()
-        discipline_name = request.args.get('name')
-        
-        if discipline_name:
-            data = [r for r in data if str(r.get('Discipline', '')).lower() == discipline_name.lower()]
-        
-        # Get unique disciplines
-        disciplines = set()
-        for record in data:
-            d = record.get('Discipline', '')
-            if d:
-                disciplines.add(str(d))
+        disciplines = _distinct_values(DatabaseRecord.discipline, request.args.get('name'))
         
         return jsonify({
             'success': True,
-            'disciplines': list(disciplines),
+            'disciplines': disciplines,
             'total': len(disciplines)
         }), 200
     except Exception as e:
@@ -281,12 +272,17 @@ def get_discipline_data():
 
 @excel_data_bp.route('/data/summary', methods=['GET'])
 @login_required
+@conditional_get()
 def get_summary_stats():
     """Get summary statistics from database records"""
     try:
-        data = _get_all_records_data()
+        total_records, total_hours, total_cost = db.session.query(
+            func.count(DatabaseRecord.id),
+            func.coalesce(func.sum(DatabaseRecord.total_mh), 0),
+            func.coalesce(func.sum(DatabaseRecord.general_total_cost_usd), 0),
+        ).one()
         
-        if not data:
+        if not total_records:
             return jsonify({
                 'success': True,
                 'stats': {
@@ -300,36 +296,16 @@ def get_summary_stats():
                 }
             }), 200
         
-        total_hours = 0
-        total_cost = 0
-        projects_set = set()
-        companies_set = set()
-        disciplines_set = set()
-        
-        for r in data:
-            try:
-                total_hours += float(r.get('TOTAL\n MH') or r.get('TOTAL MH') or 0)
-            except:
-                pass
-            try:
-                total_cost += float(r.get('General Total\n Cost (USD)') or 0)
-            except:
-                pass
-            p = r.get('Projects', '')
-            if p: projects_set.add(str(p))
-            c = r.get('Company', '')
-            if c: companies_set.add(str(c))
-            d = r.get('Discipline', '')
-            if d: disciplines_set.add(str(d))
+        projects = _distinct_values(DatabaseRecord.projects)
         
         stats = {
-            'total_records': len(data),
+            'total_records': total_records,
             'total_cost': round(total_cost, 2),
             'total_hours': round(total_hours, 1),
-            'active_projects': len(projects_set),
-            'projects': list(projects_set)[:10],
-            'companies': list(companies_set),
-            'disciplines': list(disciplines_set)
+            'active_projects': len(projects),
+            'projects': projects[:10],
+            'companies': _distinct_values(DatabaseRecord.company),
+            'disciplines': _distinct_values(DatabaseRecord.discipline)
         }
         
         return jsonify({
@@ -346,6 +322,7 @@ def get_summary_stats():
 
 @excel_data_bp.route('/data/status', methods=['GET'])
 @login_required
+@conditional_get(table_version(User, EmployeeInfo, HourlyRate))
 def get_data_status():
     """Get status of imported data"""
     try:
@@ -8,7 +8,10 @@ from models.user import User
 
 # Calculation engine from app2
 try:
-    from utils.calculations import calculate_auto_fields, invalidate_cache as _invalidate_calc_cache
+    from utils.calculations import (calculate_auto_fields, calculate_auto_fields_batch,
+                                    load_excel_reference_data,
+                                    invalidate_cache as _invalidate_calc_cache)
+    from utils.calc_dependencies import DependencyIndex, save_signatures
     _CALC_ENABLED = True
 except Exception as _calc_import_err:
     print(f'[UPLOAD] Calculation engine not available: {_calc_import_err}')
@@ -35,6 +38,9 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 REQUIRED_SHEETS = ['DATABASE', 'Info', 'Hourly Rates']
 
+# Progress of the running (or last) import-all, polled through /import-progress
+_import_progress = {'status': 'idle'}
+
 def role_required(role):
     def decorator(f):
         @wraps(f)
@@ -83,6 +89,7 @@ def test_endpoint(current_user):
 def upload_preview(current_user):
     """Upload an Excel file and return column structure + sample data from the 3 target sheets."""
     import pandas as pd
+    from utils.sheet_snapshots import read_sheet, snapshot_workbook, prune_snapshots, REFERENCE_SHEETS
     print(f'[UPLOAD] Request received from {current_user.email}')
     print(f'[UPLOAD] Request files: {list(request.files.keys())}')
     print(f'[UPLOAD] Content-Type: {request.content_type}')
@@ -126,7 +133,7 @@ def upload_preview(current_user):
             if sheet_name not in all_sheets:
                 continue
 
-            df = pd.read_excel(filepath, sheet_name=sheet_name, header=0, engine=engine)
+            df = read_sheet(filepath, sheet_name, header=0, engine=engine)
 
             # Clean column names
             columns = [str(c).strip() for c in df.columns.tolist()]
@@ -160,13 +167,18 @@ def upload_preview(current_user):
             result['sheets']['DATABASE']['idCandidates'] = id_candidates
 
             if id_candidates:
-                df_db = pd.read_excel(filepath, sheet_name='DATABASE', header=0, engine=engine)
+                df_db = read_sheet(filepath, 'DATABASE', header=0, engine=engine)
                 for id_col in id_candidates:
                     unique_count = df_db[id_col].nunique()
                     result['sheets']['DATABASE'][f'uniqueCount_{id_col}'] = int(unique_count)
 
             result['sheets']['DATABASE']['totalRows'] = result['sheets']['DATABASE']['rowCount']
 
+        # Convert the reference sheets once; imports and recalculations read the snapshots
+        snapshotted = snapshot_workbook(filepath, REFERENCE_SHEETS, engine=engine)
+        pruned = prune_snapshots(UPLOAD_FOLDER)
+        print(f'[UPLOAD] Sheet snapshots: {snapshotted}' + (f', {pruned} stale removed' if pruned else ''))
+
         return jsonify(result), 200
 
     except Exception as e:
@@ -179,6 +191,8 @@ def delete_excel_file(current_user):
     """Delete the uploaded Excel database file and clear database records."""
     try:
         from models.database_record import DatabaseRecord
+        from utils.record_store import bump_generation
+        from utils.sheet_snapshots import prune_snapshots
         
         deleted = False
         
@@ -187,11 +201,13 @@ def delete_excel_file(current_user):
             if f.endswith(('.xlsx', '.xls', '.xlsb')):
                 os.remove(os.path.join(UPLOAD_FOLDER, f))
                 deleted = True
+        prune_snapshots(UPLOAD_FOLDER)
         
         # Clear database records
         # This removes the data shown on the dashboard
         try:
             num_deleted = db.session.query(DatabaseRecord).delete()
+            bump_generation()
             db.session.commit()
             print(f"[DELETE] Deleted {num_deleted} records from DatabaseRecord")
         except Exception as db_e:
@@ -219,10 +235,20 @@ def import_all_data(current_user):
     from models.user import User
     from models.employee_info import EmployeeInfo
     from models.hourly_rate import HourlyRate
+    from utils.schema import normalize_columns, canonical_name
+    from utils.bulk_loader import bulk_insert_records, sync_records, upsert_rows, BATCH_SIZE
+    from utils.record_store import bump_generation
+    from utils.sheet_snapshots import read_sheet
+    from utils.sheet_stream import SheetStream
+    from itertools import islice
+    from werkzeug.security import generate_password_hash
+    from datetime import datetime
     import pandas as pd
 
     data = request.get_json()
     id_column = data.get('idColumn')
+    # 'full' (default) rebuilds the table; 'incremental' writes only the rows that changed
+    import_mode = data.get('mode', 'full')
 
     if not id_column:
         return jsonify({'error': 'ID sütunu seçilmedi (DATABASE sayfası için)'}), 400
@@ -249,31 +275,47 @@ def import_all_data(current_user):
 
     try:
         # ==========================================
-        # 1. PROCESS USERS (DATABASE SHEET)
+        # 1. PROCESS USERS + DATABASE RECORDS (DATABASE SHEET)
         # ==========================================
-        df_db = pd.read_excel(filepath, sheet_name='DATABASE', header=0, engine=engine)
-        df_db.columns = [str(c).strip() for c in df_db.columns]
-
-        if id_column not in df_db.columns:
+        # The sheet is streamed in chunks (utils.sheet_stream) through one pass:
+        # rows → normalize → calculate → batch insert, so memory stays at one chunk
+        # however large the upload. Users are collected on the way.
+        sheet = SheetStream(filepath, 'DATABASE', engine=engine)
+        _import_progress.clear()
+        _import_progress.update(status='running', phase='database', rows_read=0,
+                                total_rows=sheet.total_rows, started_at=datetime.utcnow().isoformat())
+
+        # Canonical column names once, so stored records use one spelling per field
+        columns = list(normalize_columns(pd.DataFrame(columns=sheet.columns)).columns)
+        id_column = canonical_name(id_column)
+
+        if id_column not in columns:
+            sheet.close()
+            _import_progress.update(status='failed')
             return jsonify({'error': f'DATABASE sayfasında "{id_column}" sütunu bulunamadı'}), 400
 
-        # Unique employees
-        df_unique = df_db.drop_duplicates(subset=[id_column], keep='first')
-        
-        for _, row in df_unique.iterrows():
+        # Prefetch existing employee IDs and e-mails once instead of querying per row
+        existing_users = dict(db.session.query(User.employee_id, User.email)
+                              .filter(User.employee_id.isnot(None)))
+        taken_emails = {email for (email,) in db.session.query(User.email)}
+        default_password_hash = generate_password_hash('123456')  # Default password, hashed once
+        now = datetime.utcnow()
+        user_rows = {}  # employee_id → row for the upsert
+        seen_ids = set()  # unique employees: first row per ID value
+
+        def _collect_user(row):
+            if pd.isna(row[id_column]):
+                return
             person_id = str(row[id_column]).strip()
             if not person_id or person_id.lower() == 'nan':
-                continue
+                return
 
-            # Check existing
-            user = User.query.filter_by(employee_id=person_id).first()
-            
             # Extract names
             first_name = ''
             last_name = ''
             
             # Try to find name columns
-            for col in df_db.columns:
+            for col in columns:
                 col_lower = col.lower()
                 val = str(row[col]).strip() if pd.notna(row[col]) else ''
                 if not val: continue
@@ -292,8 +334,10 @@ def import_all_data(current_user):
             
             # Fallback to single Name column
             if not first_name and not last_name:
-                for col in df_db.columns:
+                for col in columns:
                     if 'name' in col.lower() or 'ad' in col.lower():
+                        if pd.isna(row[col]):
+                            continue  # Empty cell
                         raw_val = str(row[col]).strip()
                         try:
                             float(raw_val)
@@ -330,119 +374,164 @@ def import_all_data(current_user):
             if not first_name: first_name = f'User_{person_id}'
             if not last_name: last_name = '-'
 
-            if user:
-                # Update existing user
-                try:
-                    user.first_name = first_name
-                    user.last_name = last_name
-                    if not user.is_active:
-                        user.is_active = True
-                    stats['users']['updated'] += 1
-                except Exception as e:
-                    stats['users']['errors'].append(f'ID {person_id} (güncelleme): {str(e)}')
+            if person_id in existing_users:
+                email = existing_users[person_id]  # Not in the update set; kept as stored
+                stats['users']['updated'] += 1
             else:
-                try:
-                    # Create new user
-                    email = f'user_{person_id.lower().replace(" ", "_")}@firma.com'
-                    if User.query.filter_by(email=email).first():
-                        email = f'user_{person_id.lower().replace(" ", "_")}_{os.urandom(2).hex()}@firma.com'
-                    
-                    user = User(
-                        email=email,
-                        employee_id=person_id,
-                        first_name=first_name,
-                        last_name=last_name,
-                        role='personal',
-                        is_active=True
-                    )
-                    user.set_password('123456')  # Default password
-                    db.session.add(user)
-                    stats['users']['imported'] += 1
-                except Exception as e:
-                    stats['users']['errors'].append(f'ID {person_id}: {str(e)}')
-
-        db.session.commit()  # Commit users so we can link info/rates
+                email = f'user_{person_id.lower().replace(" ", "_")}@firma.com'
+                if email in taken_emails:
+                    email = f'user_{person_id.lower().replace(" ", "_")}_{os.urandom(2).hex()}@firma.com'
+                taken_emails.add(email)
+                stats['users']['imported'] += 1
+
+            user_rows[person_id] = {
+                'email': email,
+                'employee_id': person_id,
+                'first_name': first_name,
+                'last_name': last_name,
+                'role': 'personal',
+                'is_active': True,
+                'password_hash': default_password_hash,
+                'created_at': now,
+                'updated_at': now,
+            }
 
-        # ==========================================
-        # 1.5. IMPORT DATABASE RECORDS (All rows from DATABASE sheet)
-        # ==========================================
         from models.database_record import DatabaseRecord
-        import json
-        
-        # First, clear existing database records to avoid duplicates
-        try:
-            num_deleted = db.session.query(DatabaseRecord).delete()
-            db.session.commit()
-            print(f"[IMPORT] Cleared {num_deleted} existing database records")
-        except Exception as e:
-            print(f"[IMPORT] Warning: Could not clear existing records: {e}")
-            db.session.rollback()
         
-        # Import all rows from DATABASE sheet
-        for idx, row in df_db.iterrows():
+        # Full mode: clear existing database records to avoid duplicates
+        if import_mode == 'full':
             try:
-                # Find the person's name (from various possible name columns)
-                person_name = None
-                person_id_val = str(row[id_column]).strip() if pd.notna(row[id_column]) else None
-                
-                # Try to find name from columns
-                for col in df_db.columns:
-                    col_lower = col.lower()
-                    if any(k in col_lower for k in ['name', 'ad', 'isim']) and 'id' not in col_lower:
-                        val = str(row[col]).strip() if pd.notna(row[col]) else ''
-                        if val and val.lower() != 'nan':
-                            try:
-                                float(val)
-                                continue  # Skip numeric values
-                            except ValueError:
-                                person_name = clean_name(val)
-                                break
-                
-                # If no name found, use the employee ID
-                if not person_name and person_id_val:
-                    person_name = f"User_{person_id_val}"
-                
-                if not person_name:
-                    continue  # Skip records without identifiable person
-                
-                # Convert row to dictionary, handling various data types
-                row_data = {}
-                for col in df_db.columns:
-                    val = row[col]
-                    if pd.isna(val):
-                        row_data[col] = None
-                    elif isinstance(val, (int, float)):
-                        # Keep numbers as numbers
-                        row_data[col] = float(val) if val != int(val) else int(val)
-                    elif hasattr(val, 'isoformat'):
-                        # Convert datetime to ISO string
-                        row_data[col] = val.isoformat()
-                    else:
-                        row_data[col] = str(val)
-                
-                # Run auto-calculations (app2 engine)
+                num_deleted = db.session.query(DatabaseRecord).delete()
+                bump_generation()
+                db.session.commit()
+                print(f"[IMPORT] Cleared {num_deleted} existing database records")
+            except Exception as e:
+                print(f"[IMPORT] Warning: Could not clear existing records: {e}")
+                db.session.rollback()
+        
+        # Import all rows from DATABASE sheet, streamed to the bulk loader in batches
+        upload_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads')
+
+        def _source_rows():
+            for chunk in sheet.chunks(BATCH_SIZE):
+                chunk = normalize_columns(chunk)
+                for idx, row in chunk.iterrows():
+                    try:
+                        if row[id_column] not in seen_ids:
+                            seen_ids.add(row[id_column])
+                            _collect_user(row)
+
+                        # Find the person's name (from various possible name columns)
+                        person_name = None
+                        person_id_val = str(row[id_column]).strip() if pd.notna(row[id_column]) else None
+                    
+                        # Try to find name from columns
+                        for col in columns:
+                            col_lower = col.lower()
+                            if any(k in col_lower for k in ['name', 'ad', 'isim']) and 'id' not in col_lower:
+                                val = str(row[col]).strip() if pd.notna(row[col]) else ''
+                                if val and val.lower() != 'nan':
+                                    try:
+                                        float(val)
+                                        continue  # Skip numeric values
+                                    except ValueError:
+                                        person_name = clean_name(val)
+                                        break
+                    
+                        # If no name found, use the employee ID
+                        if not person_name and person_id_val:
+                            person_name = f"User_{person_id_val}"
+                    
+                        if not person_name:
+                            continue  # Skip records without identifiable person
+                    
+                        # Convert row to dictionary, handling various data types
+                        row_data = {}
+                        for col in columns:
+                            val = row[col]
+                            if pd.isna(val):
+                                row_data[col] = None
+                            elif isinstance(val, (int, float)):
+                                # Keep numbers as numbers
+                                row_data[col] = float(val) if val != int(val) else int(val)
+                            elif hasattr(val, 'isoformat'):
+                                # Convert datetime to ISO string
+                                row_data[col] = val.isoformat()
+                            else:
+                                row_data[col] = str(val)
+
+                        yield person_name, row_data
+                    
+                    except Exception as e:
+                        stats['database_records']['errors'].append(f'Row {idx}: {str(e)}')
+
+                _import_progress['rows_read'] = sheet.rows_read
+                print(f'[IMPORT] DATABASE: {sheet.rows_read}'
+                      + (f'/{sheet.total_rows}' if sheet.total_rows else '') + ' rows read')
+
+        # Reference keys used by the imported rows (for incremental recalculation)
+        dependencies = DependencyIndex() if _CALC_ENABLED else None
+        calc_complete = [True]
+
+        def _database_rows():
+            source = _source_rows()
+            while True:
+                batch = list(islice(source, BATCH_SIZE))
+                if not batch:
+                    return
+                # Run auto-calculations (app2 engine), one vectorised pass per batch
                 if _CALC_ENABLED:
+                    rows = [row_data for _, row_data in batch]
                     try:
-                        upload_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads')
-                        row_data, _ = calculate_auto_fields(row_data, file_path=filepath,
-                                                            upload_dir=upload_dir)
+                        calculate_auto_fields_batch(rows, file_path=filepath, upload_dir=upload_dir)
                     except Exception as _ce:
-                        pass  # Non-fatal: store raw data if calc fails
-
-                # Create DatabaseRecord
-                record = DatabaseRecord(
-                    personel=person_name,
-                    data=json.dumps(row_data, ensure_ascii=False)
-                )
-                db.session.add(record)
-                stats['database_records']['imported'] += 1
-                
-            except Exception as e:
-                stats['database_records']['errors'].append(f'Row {idx}: {str(e)}')
-        
+                        print(f"[IMPORT] Batch calculation failed, falling back per row: {_ce}")
+                        for row_data in rows:
+                            try:
+                                calculate_auto_fields(row_data, file_path=filepath, upload_dir=upload_dir)
+                            except Exception:
+                                calc_complete[0] = False  # Non-fatal: store raw data if calc fails
+                    for row_data in rows:
+                        dependencies.add(None, row_data)
+
+                # Column values for DatabaseRecord (JSON payload + promoted typed columns)
+                for person_name, row_data in batch:
+                    yield DatabaseRecord.row_values(row_data, person_name)
+
+        with sheet:
+            if import_mode == 'full':
+                load = bulk_insert_records(_database_rows())
+                stats['database_records']['imported'] = load['rows']
+                stats['database_records']['rows_per_sec'] = load['rows_per_sec']
+            else:
+                changes = sync_records(_database_rows())
+                stats['database_records']['imported'] = changes['inserted'] + changes['updated'] + changes['unchanged']
+                stats['database_records']['changes'] = changes
+
+        bump_generation()  # Readers of the shared record store reload
         db.session.commit()
         print(f"[IMPORT] Imported {stats['database_records']['imported']} database records")
 
+        # Insert new users / refresh names of existing ones (role, e-mail, password untouched)
+        try:
+            upsert_rows(User, user_rows.values(), ['employee_id'],
+                        ['first_name', 'last_name', 'is_active', 'updated_at'])
+        except Exception as e:
+            db.session.rollback()
+            stats['users']['errors'].append(str(e))
+
+        db.session.commit()  # Commit users so we can link info/rates
+
+        # Record the reference signatures the records were calculated with, so the next
+        # incremental recalculation only touches records whose reference inputs change
+        if _CALC_ENABLED and calc_complete[0] and load_excel_reference_data(file_path=filepath):
+            try:
+                save_signatures(dependencies.signatures())
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"[IMPORT] Could not save calculation signatures: {e}")
+
         # Invalidate the calculation cache so the next recalculate uses the fresh file
         if _CALC_ENABLED:
             try:
@@ -453,59 +542,67 @@ def import_all_data(current_user):
         # ==========================================
         # 2. PROCESS INFO (Info SHEET)
         # ==========================================
+        _import_progress['phase'] = 'info'
         try:
-            df_info = pd.read_excel(filepath, sheet_name='Info', header=0, engine=engine)
+            df_info = read_sheet(filepath, 'Info', header=0, engine=engine)
             df_info.columns = [str(c).strip() for c in df_info.columns]
             
             # Find ID column in Info sheet (usually 'ID' or 'No')
             info_id_col = next((c for c in df_info.columns if c.lower() in ['id', 'no', 'sicil no']), None)
             
             if info_id_col:
+                user_ids = dict(db.session.query(User.employee_id, User.id)
+                                .filter(User.employee_id.isnot(None)))
+                existing_info = {emp_id for (emp_id,) in db.session.query(EmployeeInfo.employee_id)}
+
+                def _text(row, col):
+                    return str(row.get(col, '')) if pd.notna(row.get(col)) else None
+
+                info_rows = {}  # employee_id → row; a repeated ID keeps its last row
                 for _, row in df_info.iterrows():
                     person_id = str(row[info_id_col]).strip()
                     if not person_id or person_id.lower() == 'nan': continue
 
-                    # Find user
-                    user = User.query.filter_by(employee_id=person_id).first()
-                    user_id = user.id if user else None
-
-                    # Upsert EmployeeInfo
-                    info = EmployeeInfo.query.filter_by(employee_id=person_id).first()
-                    is_new_info = False
-                    if not info:
-                        info = EmployeeInfo(employee_id=person_id)
-                        db.session.add(info)
-                        is_new_info = True
-                    
-                    info.user_id = user_id
-                    info.company = str(row.get('Company', '')) if pd.notna(row.get('Company')) else None
-                    info.nationality = str(row.get('Nationality', '')) if pd.notna(row.get('Nationality')) else None
-                    info.title = str(row.get('Title', '')) if pd.notna(row.get('Title')) else None
-                    info.function = str(row.get('Function', '')) if pd.notna(row.get('Function')) else None
-                    info.discipline = str(row.get('Discipline', '')) if pd.notna(row.get('Discipline')) else None
-                    # Use index navigation for Reporting (Column S -> index 18 approx, but use name if possible)
-                    info.reporting_manager = str(row.get('Reporting', '')) if pd.notna(row.get('Reporting')) else None
-                    info.projects = str(row.get('Projects', '')) if pd.notna(row.get('Projects')) else None
-                    
-                    if is_new_info:
-                        stats['info']['imported'] += 1
-                    else:
+                    if person_id in existing_info or person_id in info_rows:
                         stats['info']['updated'] += 1
+                    else:
+                        stats['info']['imported'] += 1
+
+                    info_rows[person_id] = {
+                        'employee_id': person_id,
+                        'user_id': user_ids.get(person_id),
+                        'company': _text(row, 'Company'),
+                        'nationality': _text(row, 'Nationality'),
+                        'title': _text(row, 'Title'),
+                        'function': _text(row, 'Function'),
+                        'discipline': _text(row, 'Discipline'),
+                        'reporting_manager': _text(row, 'Reporting'),
+                        'projects': _text(row, 'Projects'),
+                        'created_at': now,
+                        'updated_at': now,
+                    }
+
+                upsert_rows(EmployeeInfo, info_rows.values(), ['employee_id'],
+                            ['user_id', 'company', 'nationality', 'title', 'function',
+                             'discipline', 'reporting_manager', 'projects', 'updated_at'])
+                db.session.commit()
 
         except Exception as e:
+            db.session.rollback()
             print(f"Info sheet error: {e}")
             stats['info']['errors'].append(str(e))
 
         # ==========================================
         # 3. PROCESS HOURLY RATES (Hourly Rates SHEET)
         # ==========================================
+        _import_progress['phase'] = 'rates'
         try:
             # Read first few rows to find structure
             # Row 0 usually has Periods (merged cells), Row 1 has Columns (Currency, Rate)
             # We'll read the whole dataframe with header=1 (2nd row) to get columns
             # And read header=0 separately to get periods
             
-            df_rates = pd.read_excel(filepath, sheet_name='Hourly Rates', header=1, engine=engine)
+            df_rates = read_sheet(filepath, 'Hourly Rates', header=1, engine=engine)
             df_periods = pd.read_excel(filepath, sheet_name='Hourly Rates', header=None, engine=engine, nrows=1)
             
             # Locate ID column in rates
@@ -530,12 +627,16 @@ def import_all_data(current_user):
                     if current_period:
                         period_map[idx] = current_period
 
+                user_ids = dict(db.session.query(User.employee_id, User.id)
+                                .filter(User.employee_id.isnot(None)))
+                existing_rates = set(db.session.query(HourlyRate.employee_id, HourlyRate.period))
+                rate_rows = {}  # (employee_id, period) → row; the last cell for a pair wins
+
                 for _, row in df_rates.iterrows():
                     person_id = str(row[rate_id_col]).strip()
                     if not person_id or person_id.lower() == 'nan': continue
 
-                    user = User.query.filter_by(employee_id=person_id).first()
-                    user_id = user.id if user else None
+                    user_id = user_ids.get(person_id)
                     
                     # Iterate dynamic columns to find rates
                     # We look for columns named 'Hourly Base Rates' or similar
@@ -559,35 +660,32 @@ def import_all_data(current_user):
                                         if isinstance(prev_val, str) and len(prev_val) == 3:
                                             currency = prev_val
                                     
-                                    # Upsert Rate
-                                    rate_rec = HourlyRate.query.filter_by(
-                                        employee_id=person_id, 
-                                        period=period
-                                    ).first()
-                                    
-                                    is_new_rate = False
-                                    if not rate_rec:
-                                        rate_rec = HourlyRate(
-                                            employee_id=person_id,
-                                            period=period
-                                        )
-                                        db.session.add(rate_rec)
-                                        is_new_rate = True
-                                    
-                                    rate_rec.user_id = user_id
-                                    rate_rec.hourly_rate = float(val)
-                                    rate_rec.currency = currency
-                                    
-                                    if is_new_rate:
-                                        stats['rates']['imported'] += 1
-                                    else:
+                                    key = (person_id, period)
+                                    if key in existing_rates or key in rate_rows:
                                         stats['rates']['updated'] += 1
+                                    else:
+                                        stats['rates']['imported'] += 1
+
+                                    rate_rows[key] = {
+                                        'employee_id': person_id,
+                                        'period': period,
+                                        'user_id': user_id,
+                                        'hourly_rate': float(val),
+                                        'currency': currency,
+                                        'created_at': now,
+                                        'updated_at': now,
+                                    }
+
+                upsert_rows(HourlyRate, rate_rows.values(), ['employee_id', 'period'],
+                            ['user_id', 'hourly_rate', 'currency', 'updated_at'])
 
         except Exception as e:
+            db.session.rollback()
             print(f"Rates sheet error: {e}")
             stats['rates']['errors'].append(str(e))
 
         db.session.commit()
+        _import_progress.update(status='completed', phase=None)
         
         return jsonify({
             'message': 'Veri içe aktarma tamamlandı',
@@ -596,5 +694,16 @@ def import_all_data(current_user):
 
     except Exception as e:
         db.session.rollback()
+        _import_progress.update(status='failed', message=str(e))
         return jsonify({'error': f'Genel aktarım hatası: {str(e)}'}), 500
 
+
+@excel_bp.route('/import-progress', methods=['GET'])
+@role_required('admin')
+def import_progress(current_user):
+    """Rows of the DATABASE sheet consumed so far by the running import-all."""
+    progress = dict(_import_progress)
+    if progress.get('total_rows'):
+        progress['progress'] = round(min(progress['rows_read'] / progress['total_rows'], 1) * 100, 1)
+    return jsonify(progress), 200
+
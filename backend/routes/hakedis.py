@@ -13,13 +13,18 @@ import io
 import os
 import re
 import tempfile
+import threading
 from datetime import datetime, date, timedelta
 from collections import defaultdict
 from werkzeug.utils import secure_filename
 
 from models import db
-from models.database_record import DatabaseRecord
 from middleware.auth_middleware import role_required
+from utils.rate_index import ExchangeRateIndex, HourlyRateIndex
+from utils.schema import WEEK_MONTH, TOTAL_MH, NORTH_SOUTH, normalize_record
+from utils.dates import parse_work_date
+from utils.record_store import load_records
+from utils.conditional import conditional_get
 
 hakedis_bp = Blueprint('hakedis', __name__, url_prefix='/api/hakedis')
 
@@ -33,6 +38,13 @@ _access_store = {}   # { 'path': str, 'tables': [...], 'queries': [...], 'macros
 # In-memory store for uploaded Excel files (one per type)
 _excel_store = {}    # { type_key: { 'path': str, 'filename': str, 'uploaded_at': str } }
 
+# Parsed rows of the stored Excel files (one entry per type), shared by all requests.
+# Entries remember the path + mtime they were parsed from, so a re-upload or an
+# out-of-band file change is picked up on the next read.
+_excel_rows_cache = {}   # { type_key: { 'path': str, 'mtime': float, 'rows': [...], 'indexes': {...} } }
+_excel_rows_locks = {}   # { type_key: threading.Lock }  — one parse per type at a time
+_excel_rows_guard = threading.Lock()
+
 EXCEL_TYPES = {
     'database':        {'label': 'DATABASE',           'description': 'Ana veri — personel, disiplin, MH, şirket, proje bilgileri'},
     'hourly_rates':    {'label': 'Hourly Rates',       'description': 'Saatlik ücretler — personel ve sözleşme bazlı birim fiyatlar'},
@@ -86,7 +98,8 @@ def _load_records():
     Load personnel/cost records.
     Priority:
       1. Hakedis DATABASE Excel (uploaded via the Hakedis page) — always most up-to-date.
-      2. PostgreSQL DatabaseRecord table — fallback if no Excel is uploaded.
+      2. PostgreSQL DatabaseRecord table — fallback if no Excel is uploaded, served
+         from the shared record store (read-only dicts).
     """
     db_store = _excel_store.get('database')
     if db_store and os.path.exists(db_store.get('path', '')):
@@ -108,10 +121,10 @@ def _load_records():
             _bad = {'nan', 'NaT', 'None', 'none'}
             cleaned = []
             for rec in records:
-                cleaned.append({
+                cleaned.append(normalize_record({
                     k: ('' if str(v).strip() in _bad else str(v).strip())
                     for k, v in rec.items()
-                })
+                }))
             if cleaned:
                 print(f'[_load_records] Using DATABASE Excel: {len(cleaned)} rows from {db_store["filename"]}')
                 return cleaned
@@ -119,13 +132,7 @@ def _load_records():
             print(f'[_load_records] Excel read failed ({e}), falling back to PostgreSQL')
 
     # Fallback: PostgreSQL
-    rows = DatabaseRecord.query.all()
-    out = []
-    for r in rows:
-        try:
-            out.append(json.loads(r.data))
-        except Exception:
-            continue
+    out = load_records()
     print(f'[_load_records] Using PostgreSQL: {len(out)} rows')
     return out
 
@@ -145,45 +152,13 @@ def _safe_float(v):
 
 
 def _parse_record_date(record):
-    """Parse the (Week / Month) field → datetime.date or None.
-    Tries all known column name variants created by different Excel exports.
-    """
-    raw = (_safe_str(record.get('(Week / \nMonth)', '')) or   # space before \n  (new Excel)
-           _safe_str(record.get('(Week /\nMonth)', '')) or    # no space before \n
-           _safe_str(record.get('(Week / Month)', '')) or
-           _safe_str(record.get('(Week /\n Month)', '')) or
-           _safe_str(record.get('Week / Month', '')) or
-           _safe_str(record.get('Week/Month', '')) or
-           _safe_str(record.get('Week/\nMonth', '')))
-    if not raw:
-        return None
-    # Try DD/Mon/YYYY  e.g.  01/Dec/2024
-    try:
-        return datetime.strptime(raw, '%d/%b/%Y').date()
-    except ValueError:
-        pass
-    # Try YYYY-MM-DD
-    try:
-        return datetime.strptime(raw[:10], '%Y-%m-%d').date()
-    except ValueError:
-        pass
-    # Try DD.MM.YYYY
-    try:
-        return datetime.strptime(raw[:10], '%d.%m.%Y').date()
-    except ValueError:
-        pass
-    return None
+    """Parse the (Week / Month) field → datetime.date or None (canonical parser, utils.dates)."""
+    return parse_work_date(record.get(WEEK_MONTH))
 
 
 def _get_mh(record):
-    """Read TOTAL MH from a record, trying all known column name variants.
-    VBA uses TOTAL_MH (underscore) first, then TOTAL MH (space).
-    """
-    return (_safe_float(record.get('TOTAL_MH')) or        # VBA: first choice (underscore)
-            _safe_float(record.get('TOTAL\n MH')) or
-            _safe_float(record.get('TOTAL MH')) or
-            _safe_float(record.get('Total MH')) or
-            _safe_float(record.get('TOTAL\nMH')))
+    """Read TOTAL MH from a record (TOTAL_MH / TOTAL MH are normalised to one key at import)."""
+    return _safe_float(record.get(TOTAL_MH))
 
 
 def _get_kapsam(record):
@@ -200,54 +175,10 @@ def _get_exchange_rate(work_date):
     returns the rate for the earliest row whose Tarih >= work_date.
     Returns float or None if the Excel is not uploaded / no matching row.
     """
-    rows = _read_excel_rows('doviz_kurlari')
-    if not rows:
-        return None
-
-    # Detect the date column and the USD/TRY rate column
-    date_col = rate_col = None
-    for k in rows[0].keys():
-        kn = re.sub(r'[^a-z0-9]', '', k.lower())
-        if date_col is None and ('tarih' in kn or 'week' in kn or 'month' in kn):
-            date_col = k
-        if rate_col is None and ('usdtry' in kn or 'usdtl' in kn or 'usd' in kn or 'kur' in kn):
-            rate_col = k
-
-    if not date_col or not rate_col:
+    index = _excel_index('doviz_kurlari', 'exchange_rate', ExchangeRateIndex.from_rows)
+    if index is None:
         return None
-
-    candidates = []
-    for row in rows:
-        raw_d = row.get(date_col)
-        raw_r = row.get(rate_col)
-        if raw_d is None or raw_r is None:
-            continue
-        # Parse date
-        d = None
-        if hasattr(raw_d, 'date'):           # pandas Timestamp
-            d = raw_d.date()
-        elif isinstance(raw_d, date):
-            d = raw_d
-        else:
-            for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%d.%m.%Y', '%m/%d/%Y'):
-                try:
-                    d = datetime.strptime(str(raw_d)[:10], fmt).date()
-                    break
-                except ValueError:
-                    continue
-        if d is None:
-            continue
-        try:
-            r = float(str(raw_r).replace(',', '.'))
-        except (ValueError, TypeError):
-            continue
-        if d >= work_date:
-            candidates.append((d, r))
-
-    if not candidates:
-        return None
-    candidates.sort(key=lambda x: x[0])
-    return candidates[0][1]
+    return index.lookup(work_date)
 
 
 # Employer keyword → contract substring and North/South region
@@ -270,6 +201,15 @@ def _employer_meta(employer_str):
     return '', None
 
 
+# (rate_column, currency_column) per Hourly Rates period, as used by _get_rate_cols_for_date
+_RATE_PERIOD_COLS = {
+    '2023-2024': ("23-24_Base_Rate_1",      "23-24 Cur_1"),
+    '2025_h1':   ("25_ilk6_Base_Rate_2",    "25_ilk6_Cur_2"),
+    '2025_h2':   ("25_ikinci6_Base_Rate_3", "25_ikinci6_Cur_3"),
+    '2026_h1':   ("26_ilk6_Base_Rate_4",    "26_ilk6_Cur_4"),
+}
+
+
 def _get_rate_cols_for_date(year, month):
     """
     Return (rate_column, currency_column) based on work date year/month.
@@ -280,67 +220,36 @@ def _get_rate_cols_for_date(year, month):
       2026+              → "26_ilk6_Base_Rate_4"      / "26_ilk6_Cur_4"
     """
     if year in (2023, 2024):
-        return "23-24_Base_Rate_1", "23-24 Cur_1"
+        return _RATE_PERIOD_COLS['2023-2024']
     elif year == 2025 and month <= 6:
-        return "25_ilk6_Base_Rate_2", "25_ilk6_Cur_2"
+        return _RATE_PERIOD_COLS['2025_h1']
     elif year == 2025 and month > 6:
-        return "25_ikinci6_Base_Rate_3", "25_ikinci6_Cur_3"
+        return _RATE_PERIOD_COLS['2025_h2']
     elif year >= 2026:
-        return "26_ilk6_Base_Rate_4", "26_ilk6_Cur_4"
+        return _RATE_PERIOD_COLS['2026_h1']
     return None, None
 
 
+def _build_hourly_rate_index(rows):
+    return HourlyRateIndex(rows, list(_RATE_PERIOD_COLS.values()))
+
+
 def _get_hourly_rate(person_name, work_date, person_id=None):
     """
     Look up the hourly base rate for a person from the Hourly Rates Excel.
     Matches record year/month to the exact VBA column names via _get_rate_cols_for_date.
-    Lookup order: ID match first, then name match (contains check).
+    Lookup order: ID match first, then name match (contains check), both
+    answered by the HourlyRateIndex built once per uploaded file.
     Returns (rate: float, currency: str) or (None, None).
     """
-    rows = _read_excel_rows('hourly_rates')
-    if not rows:
+    index = _excel_index('hourly_rates', 'hourly_rate', _build_hourly_rate_index)
+    if index is None:
         return None, None
 
-    rate_col, curr_col = _get_rate_cols_for_date(work_date.year, work_date.month)
+    rate_col, _ = _get_rate_cols_for_date(work_date.year, work_date.month)
     if not rate_col:
         return None, None
-
-    # Detect name and ID columns
-    name_col = id_col = None
-    for k in rows[0].keys():
-        kl = k.lower().strip()
-        if id_col is None and kl in ('id', 'no', 'no.', 'sicil', 'employee id', 'emp id'):
-            id_col = k
-        if name_col is None and any(x in kl for x in ('namesur', 'name', 'surname', 'isim', 'personel', 'ad soyad')):
-            name_col = k
-
-    # Find matching person row: ID first, then name
-    person_row = None
-    if person_id is not None and id_col:
-        pid_str = str(person_id).strip()
-        for row in rows:
-            if str(row.get(id_col, '')).strip() == pid_str:
-                person_row = row
-                break
-
-    if person_row is None and name_col:
-        person_lower = (person_name or '').lower().strip()
-        if person_lower:
-            for row in rows:
-                nv = _safe_str(row.get(name_col, '')).lower().strip()
-                if nv and (nv == person_lower or nv in person_lower or person_lower in nv):
-                    person_row = row
-                    break
-
-    if not person_row:
-        return None, None
-
-    rate_val = _safe_float(person_row.get(rate_col))
-    curr_val = _safe_str(person_row.get(curr_col, 'USD')).upper().strip() if curr_col else 'USD'
-    if not curr_val:
-        curr_val = 'USD'
-    return rate_val, curr_val
-
+    return index.lookup(person_name, rate_col, person_id)
 
 
 def _hakedis_from_record(r, eff_rate):
@@ -361,6 +270,7 @@ def _hakedis_from_record(r, eff_rate):
 
 @hakedis_bp.route('/companies', methods=['GET'])
 @role_required('admin', 'project_manager', 'team_leader')
+@conditional_get()
 def get_companies(current_user=None):
     """Return distinct Company values."""
     records = _load_records()
@@ -508,7 +418,7 @@ def generate_hakedis(current_user=None):
             continue
         # Regional filter: AP-CB → South, BALTIC → North
         if ns_region:
-            rec_region = _safe_str(r.get('North/\nSouth', '') or r.get('North/ South', '') or r.get('North/South', '')).strip()
+            rec_region = _safe_str(r.get(NORTH_SOUTH, '')).strip()
             if rec_region and rec_region != ns_region:
                 continue
         # Optional scope filter
@@ -562,8 +472,8 @@ def generate_hakedis(current_user=None):
                    _safe_str(r.get('Projects/Group')) or
                    'Unknown')
 
-        # MH: VBA tries TOTAL_MH first, then TOTAL MH
-        mh = (_safe_float(r.get('TOTAL_MH')) or _get_mh(r))
+        # MH: TOTAL_MH / TOTAL MH are one canonical key
+        mh = _get_mh(r)
 
         disc   = _safe_str(r.get('Discipline'))
         scope  = _get_kapsam(r) or _safe_str(r.get('Scope'))
@@ -823,7 +733,7 @@ def bulk_generate_hakedis(current_user=None):
         # Skip companies that are themselves employers (AP-CB, BALTIC, etc.)
         if comp.strip().upper() in {k.upper() for k in _EMPLOYER_KEYWORD_MAP}:
             continue
-        ns       = _safe_str(r.get('North/\nSouth', '') or r.get('North/ South', '') or r.get('North/South', '')).strip()
+        ns       = _safe_str(r.get(NORTH_SOUTH, '')).strip()
         contract = _safe_str(r.get('İşveren- Sözleşme No', '')).upper()
         if ns == 'South' or 'APC' in contract:
             combo_set.add((comp, 'AP-CB'))
@@ -854,9 +764,7 @@ def bulk_generate_hakedis(current_user=None):
                     for r in all_records:
                         if _safe_str(r.get('Company')) != comp:
                             continue
-                        rec_ns = _safe_str(
-                            r.get('North/\nSouth', '') or r.get('North/ South', '') or r.get('North/South', '')
-                        ).strip()
+                        rec_ns = _safe_str(r.get(NORTH_SOUTH, '')).strip()
                         if ns_region and rec_ns and rec_ns != ns_region:
                             continue
                         rec_date = _parse_record_date(r)
@@ -887,7 +795,7 @@ def bulk_generate_hakedis(current_user=None):
                             continue
                         project  = (_safe_str(r.get('Projects')) or
                                     _safe_str(r.get('Projects/Group')) or 'Unknown')
-                        mh       = _safe_float(r.get('TOTAL_MH')) or _get_mh(r)
+                        mh       = _get_mh(r)
                         disc     = _safe_str(r.get('Discipline'))
                         scope    = _get_kapsam(r) or _safe_str(r.get('Scope'))
                         person   = _safe_str(r.get('Name Surname'))
@@ -1045,9 +953,80 @@ def bulk_generate_hakedis(current_user=None):
 # Multi-Excel upload / status / delete endpoints
 # ---------------------------------------------------------------------------
 
+def _excel_rows_lock(excel_type):
+    with _excel_rows_guard:
+        lock = _excel_rows_locks.get(excel_type)
+        if lock is None:
+            lock = _excel_rows_locks[excel_type] = threading.Lock()
+        return lock
+
+
+def _invalidate_excel_rows(excel_type=None):
+    """Drop the parsed rows for one Excel type (or all types when None)."""
+    with _excel_rows_guard:
+        if excel_type is None:
+            _excel_rows_cache.clear()
+        else:
+            _excel_rows_cache.pop(excel_type, None)
+
+
 def _read_excel_rows(excel_type):
     """
-    Read the stored Excel file for the given type.
+    Return the parsed rows of the stored Excel file for the given type.
+    Each file is parsed at most once per (path, mtime); every later call —
+    e.g. the per-record rate lookups during hakedis generation — reuses the
+    cached list. Callers must treat the returned rows as read-only.
+    """
+    info = _excel_store.get(excel_type)
+    if not info or not os.path.exists(info['path']):
+        return []
+    path = info['path']
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return []
+
+    cached = _excel_rows_cache.get(excel_type)
+    if cached and cached['path'] == path and cached['mtime'] == mtime:
+        return cached['rows']
+
+    with _excel_rows_lock(excel_type):
+        # Another request may have parsed the file while we waited
+        cached = _excel_rows_cache.get(excel_type)
+        if cached and cached['path'] == path and cached['mtime'] == mtime:
+            return cached['rows']
+        rows = _parse_excel_rows(excel_type, path)
+        with _excel_rows_guard:
+            _excel_rows_cache[excel_type] = {'path': path, 'mtime': mtime, 'rows': rows, 'indexes': {}}
+        return rows
+
+
+def _excel_index(excel_type, name, builder):
+    """
+    Return a lookup index derived from the cached rows of an Excel type,
+    building it with builder(rows) on first use. Indexes live in the same
+    cache entry as the rows, so they are rebuilt whenever the file changes.
+    Returns None when the file is not uploaded / has no rows.
+    """
+    rows = _read_excel_rows(excel_type)
+    if not rows:
+        return None
+    cached = _excel_rows_cache.get(excel_type)
+    if cached is None or cached['rows'] is not rows:
+        # Invalidated between the two reads — build without caching
+        return builder(rows)
+    index = cached['indexes'].get(name)
+    if index is None:
+        with _excel_rows_lock(excel_type):
+            index = cached['indexes'].get(name)
+            if index is None:
+                index = cached['indexes'][name] = builder(rows)
+    return index
+
+
+def _parse_excel_rows(excel_type, path):
+    """
+    Read the Excel file at *path* for the given type.
     Auto-detects which sheet to read (tries the type-specific sheet name first,
     then Sheet1, then the first sheet).
     Returns a list of dicts (column → value).
@@ -1057,12 +1036,8 @@ def _read_excel_rows(excel_type):
     except ImportError:
         return []
 
-    info = _excel_store.get(excel_type)
-    if not info or not os.path.exists(info['path']):
-        return []
-
     try:
-        xl = pd.ExcelFile(info['path'])
+        xl = pd.ExcelFile(path)
         sheet_labels = {
             'database':        ['DATABASE', 'Database'],
             'hourly_rates':    ['Hourly Rates', 'HourlyRates', 'hourly rates'],
@@ -1086,17 +1061,17 @@ def _read_excel_rows(excel_type):
         #   NEW format: Row 0 = actual column names (e.g. "23-24 Cur_1", "26_ilk6_Base_Rate_4")
         if excel_type == 'hourly_rates':
             # Peek at row 0 to decide
-            df_peek = pd.read_excel(info['path'], sheet_name=sheet_name, header=0, nrows=0, dtype=str)
+            df_peek = pd.read_excel(path, sheet_name=sheet_name, header=0, nrows=0, dtype=str)
             peek_cols = [str(c).strip() for c in df_peek.columns]
             # New format: columns already contain rate/currency keywords
             _new_fmt_kw = ('_cur_', '_base_rate_', 'add_cur', 'add_rate', 'cur_1', 'base_rate_1')
             is_new_fmt = any(any(kw in c.lower() for kw in _new_fmt_kw) for c in peek_cols)
             if is_new_fmt:
                 # Single-row header — read directly
-                df = pd.read_excel(info['path'], sheet_name=sheet_name, header=0, dtype=str)
+                df = pd.read_excel(path, sheet_name=sheet_name, header=0, dtype=str)
             else:
                 # Old two-row merged header — MultiIndex flatten
-                df = pd.read_excel(info['path'], sheet_name=sheet_name, header=[0, 1], dtype=str)
+                df = pd.read_excel(path, sheet_name=sheet_name, header=[0, 1], dtype=str)
                 flat_cols = []
                 for parent, child in df.columns:
                     p = str(parent).strip()
@@ -1111,7 +1086,7 @@ def _read_excel_rows(excel_type):
             df = df[df.apply(lambda r: any(v.strip() for v in r.values if isinstance(v, str)), axis=1)]
             return df.to_dict('records')
 
-        df = pd.read_excel(info['path'], sheet_name=sheet_name, dtype=str)
+        df = pd.read_excel(path, sheet_name=sheet_name, dtype=str)
         df = df.fillna('')
         return df.to_dict('records')
     except Exception as e:
@@ -1182,6 +1157,7 @@ def upload_excel_file(current_user=None):
     safe_name = secure_filename(f.filename)
     save_path = os.path.join(UPLOAD_DIR, f'hakedis_{excel_type}{ext}')
     f.save(save_path)
+    _invalidate_excel_rows(excel_type)
 
     # Read a quick row-count preview
     row_count = 0
@@ -1222,6 +1198,7 @@ def delete_excel_file(excel_type, current_user=None):
         return jsonify({'success': False, 'error': 'Unknown type'}), 400
 
     stored = _excel_store.pop(excel_type, None)
+    _invalidate_excel_rows(excel_type)
     if stored and os.path.exists(stored['path']):
         try:
             os.remove(stored['path'])
@@ -1319,6 +1296,7 @@ def get_access_contracts(current_user=None):
 
 @hakedis_bp.route('/cascade', methods=['GET'])
 @role_required('admin', 'project_manager', 'team_leader')
+@conditional_get()
 def get_cascade(current_user=None):
     """
     Return a 3-level cascade structure built from the Hakedis Excel + DB:
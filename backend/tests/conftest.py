@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the backend modules the way app.py does (utils.*, models.*)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,160 @@
+"""utils.bulk_loader (incremental DATABASE import, reference-table upserts) against in-memory SQLite."""
+
+import json
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from models import db
+from models.database_record import DatabaseRecord
+from models.hourly_rate import HourlyRate
+from utils.bulk_loader import _upsert_prefetched, bulk_insert_records, sync_records, upsert_rows
+
+
+LONG_AGO = datetime(2000, 1, 1)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def record(employee_id, hours, week='2024-06-10', project='PRJ-1', scope='Design'):
+    return {'ID': employee_id, 'Name Surname': f'Person {employee_id}', 'Projects': project,
+            'Scope': scope, '(Week / Month)': week, 'TOTAL MH': hours}
+
+
+def rows(records):
+    """Fresh column dicts (sync_records fills in id / updated_at on the ones it writes)."""
+    return [DatabaseRecord.row_values(dict(r), r['Name Surname']) for r in records]
+
+
+def load(records):
+    """Initial full load, with updated_at pushed into the past so rewrites show."""
+    bulk_insert_records(rows(records))
+    db.session.query(DatabaseRecord).update({'updated_at': LONG_AGO})
+    db.session.commit()
+
+
+def sync(records):
+    summary = sync_records(rows(records), batch_size=2)
+    db.session.commit()
+    return {k: v for k, v in summary.items() if k != 'seconds'}
+
+
+def stored():
+    """[(id, payload, updated_at)] in id order."""
+    return [(r.id, json.loads(r.data), r.updated_at)
+            for r in DatabaseRecord.query.order_by(DatabaseRecord.id)]
+
+
+def test_unchanged_rows_are_left_alone(app):
+    sheet = [record(1, 8), record(2, 40.5), record(3, 0)]
+    load(sheet)
+    before = stored()
+
+    assert sync(sheet) == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 3}
+    assert stored() == before
+
+
+def test_key_order_does_not_count_as_a_change(app):
+    sheet = [record(1, 8)]
+    load(sheet)
+
+    reordered = [dict(reversed(list(sheet[0].items())))]
+    assert sync(reordered) == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 1}
+
+
+def test_updated_rows_are_rewritten_in_place(app):
+    load([record(1, 8), record(2, 40.5), record(3, 0)])
+    before = stored()
+
+    assert sync([record(1, 8), record(2, 16), record(3, 0)]) == {
+        'inserted': 0, 'updated': 1, 'deleted': 0, 'unchanged': 2}
+    after = stored()
+    assert [r[0] for r in after] == [r[0] for r in before]
+    assert after[0] == before[0] and after[2] == before[2]
+    assert after[1][1]['TOTAL MH'] == 16
+    assert after[1][2] > LONG_AGO
+
+
+def test_rows_missing_from_the_sheet_are_deleted(app):
+    load([record(1, 8), record(2, 40.5), record(3, 0), record(4, 1)])
+    before = stored()
+
+    assert sync([record(1, 8), record(3, 0)]) == {
+        'inserted': 0, 'updated': 0, 'deleted': 2, 'unchanged': 2}
+    assert stored() == [before[0], before[2]]
+
+
+def test_duplicate_natural_keys_pair_in_order(app):
+    # Same ID + week + project + scope three times: only TOTAL MH tells them apart
+    a, b, c = record(7, 8), record(7, 16), record(7, 24)
+    load([a, b])
+    first, second = stored()
+
+    # N → N+1: both existing rows kept, the extra occurrence inserted
+    assert sync([a, b, c]) == {'inserted': 1, 'updated': 0, 'deleted': 0, 'unchanged': 2}
+    after = stored()
+    assert after[:2] == [first, second]
+    assert after[2][1]['TOTAL MH'] == 24
+
+    # N+1 → N-1: the first occurrence keeps the first row, the others go
+    assert sync([a]) == {'inserted': 0, 'updated': 0, 'deleted': 2, 'unchanged': 1}
+    assert stored() == [first]
+
+
+def test_duplicate_natural_key_changes_update_the_matching_occurrence(app):
+    a, b = record(7, 8), record(7, 16)
+    load([a, b])
+    first, second = stored()
+
+    assert sync([a, record(7, 20)]) == {'inserted': 0, 'updated': 1, 'deleted': 0, 'unchanged': 1}
+    after = stored()
+    assert after[0] == first
+    assert after[1][0] == second[0] and after[1][1]['TOTAL MH'] == 20 and after[1][2] > LONG_AGO
+
+
+def test_mixed_sync_counts_and_contents(app):
+    load([record(1, 8), record(2, 40.5), record(3, 0), record(4, 1), record(4, 2)])
+
+    sheet = [record(1, 8), record(2, 41), record(4, 1), record(5, 3), record(5, 3, week='2024-06-17'),
+             record(6, 0)]
+    assert sync(sheet) == {'inserted': 3, 'updated': 1, 'deleted': 2, 'unchanged': 2}
+    payloads = sorted((p['ID'], p['(Week / Month)'], p['TOTAL MH']) for _, p, _ in stored())
+    assert payloads == sorted((r['ID'], r['(Week / Month)'], r['TOTAL MH']) for r in sheet)
+
+    # A second run over the same sheet writes nothing
+    assert sync(sheet) == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 6}
+
+
+def rate(employee_id, period, hourly_rate, currency='USD'):
+    return {'employee_id': employee_id, 'period': period, 'user_id': None,
+            'hourly_rate': hourly_rate, 'currency': currency, 'created_at': LONG_AGO, 'updated_at': LONG_AGO}
+
+
+@pytest.mark.parametrize('upsert', [upsert_rows, _upsert_prefetched], ids=['on_conflict', 'prefetched'])
+def test_upsert_updates_matched_keys_and_inserts_the_rest(app, upsert):
+    key, update_cols = ['employee_id', 'period'], ['hourly_rate', 'currency', 'updated_at']
+    upsert(HourlyRate, [rate('1', 'Jan', 10), rate('2', 'Jan', 20)], key, update_cols)
+    db.session.commit()
+    before = {(r.employee_id, r.period): r.id for r in HourlyRate.query}
+
+    now = datetime(2024, 6, 1)
+    changed = [dict(rate('2', 'Jan', 25, 'TL'), updated_at=now), rate('2', 'Feb', 30), rate('3', 'Jan', 40)]
+    assert upsert(HourlyRate, changed, key, update_cols, batch_size=2) == 3
+    db.session.commit()
+
+    saved = {(r.employee_id, r.period): (r.id, r.hourly_rate, r.currency, r.updated_at)
+              for r in HourlyRate.query}
+    assert saved[('1', 'Jan')] == (before[('1', 'Jan')], 10, 'USD', LONG_AGO)
+    assert saved[('2', 'Jan')] == (before[('2', 'Jan')], 25, 'TL', now)
+    assert sorted(saved) == [('1', 'Jan'), ('2', 'Feb'), ('2', 'Jan'), ('3', 'Jan')]
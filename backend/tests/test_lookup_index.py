@@ -0,0 +1,76 @@
+"""LookupIndex / xlookup against the original mask-based xlookup."""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.calculations import LookupIndex, xlookup
+
+
+def baseline_xlookup(lookup_value, lookup_array, return_array, if_not_found=0):
+    """The xlookup LookupIndex replaced: first row where lookup_array == lookup_value."""
+    try:
+        lookup_array = pd.Series(lookup_array)
+        return_array = pd.Series(return_array)
+        if pd.isna(lookup_value):
+            return if_not_found
+        mask = lookup_array == lookup_value
+        if not mask.any() and isinstance(lookup_value, str):
+            norm_lv = ' '.join(str(lookup_value).strip().upper().split())
+            norm_arr = lookup_array.astype(str).str.strip().str.upper().apply(lambda x: ' '.join(x.split()))
+            mask = norm_arr == norm_lv
+        if mask.any():
+            result = return_array.iloc[mask.idxmax()]
+            return result if pd.notna(result) else if_not_found
+        return if_not_found
+    except Exception:
+        return if_not_found
+
+
+# TCMB weekly rates as the Info sheet holds them: a datetime column of Mondays
+WEEKS = pd.Series(pd.to_datetime(['2024-06-10', '2024-06-17', '2024-06-24', None, '2024-06-24']))
+RATES = pd.Series([32.1, 32.6, 31.2, 30.0, 99.9])
+
+DATE_LOOKUPS = [
+    '24/Jun/2024',            # excel_date_to_string form used for (Week / Month)
+    '17/Jun/2024',
+    '2024-06-10',
+    '24.06.2024',
+    '2024-06-24 00:00:00',
+    ' 24/Jun/2024 ',
+    pd.Timestamp('2024-06-17'),
+    datetime(2024, 6, 10),
+    np.datetime64('2024-06-24'),
+    '01/Jan/2020',            # parses, not present
+    'junk',
+    '',
+    45467,                    # Excel serial is not a date on a datetime column
+    None,
+    np.nan,
+]
+
+
+@pytest.mark.parametrize('value', DATE_LOOKUPS, ids=repr)
+def test_datetime_key_column_matches_baseline(value):
+    expected = baseline_xlookup(value, WEEKS, RATES, 0)
+    assert LookupIndex(WEEKS, RATES).get(value, 0) == expected
+    assert xlookup(value, WEEKS, RATES, 0) == expected
+
+
+def test_datetime_key_column_get_many_matches_baseline():
+    index = LookupIndex(WEEKS, RATES)
+    assert list(index.get_many(DATE_LOOKUPS, 0)) == [baseline_xlookup(v, WEEKS, RATES, 0) for v in DATE_LOOKUPS]
+
+
+def test_week_lookup_finds_rate():
+    assert xlookup('24/Jun/2024', WEEKS, RATES, 0) == 31.2
+
+
+@pytest.mark.parametrize('value', ['24/Jun/2024', 'a b', 'A  B', 905264, 905264.0, '905264', 'x', ''], ids=repr)
+def test_mixed_key_column_matches_baseline(value):
+    keys = pd.Series(['24/Jun/2024', 'a b', 905264, None, 'x'], dtype=object)
+    returns = pd.Series(['w', 'ab', 'tl', 'none', np.nan])
+    expected = baseline_xlookup(value, keys, returns, 'nf')
+    assert LookupIndex(keys, returns).get(value, 'nf') == expected
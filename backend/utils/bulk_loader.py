@@ -0,0 +1,210 @@
+"""
+Bulk loader for DatabaseRecord rows.
+
+import_all_data used to build one ORM object per DATABASE-sheet row and
+commit them all at once. bulk_insert_records() instead streams plain column
+dicts (DatabaseRecord.row_values) in fixed-size batches:
+  * PostgreSQL (psycopg2): COPY ... FROM STDIN via cursor.copy_expert
+  * anything else (SQLite in development): executemany INSERT per batch
+sync_records() is the incremental variant: it diffs the incoming rows against
+the stored ones (natural_key + row_hash) and writes only the delta.
+upsert_rows() writes reference tables (users, Info, Hourly Rates) with
+INSERT ... ON CONFLICT DO UPDATE in batches (PostgreSQL, SQLite), or with
+batched UPDATE-by-id and INSERT against prefetched keys on other databases.
+Nothing is committed here; the caller owns the transaction.
+"""
+
+import csv
+import io
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import delete, insert, update
+
+from models import db
+from models.database_record import DatabaseRecord
+
+
+BATCH_SIZE = 5000
+UPSERT_BATCH_SIZE = 1000   # multi-row VALUES; keeps bind params under SQLite's limit
+_NULL = '\\N'
+
+
+def _batches(rows, size):
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _copy_batch(cursor, columns, batch):
+    """Write one batch through COPY (CSV, with None written as an unquoted \\N → NULL)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    for values in batch:
+        writer.writerow([_NULL if v is None else v for v in (values.get(c) for c in columns)])
+    buf.seek(0)
+    cursor.copy_expert(
+        f'COPY {DatabaseRecord.__tablename__} ({", ".join(columns)}) '
+        f"FROM STDIN WITH (FORMAT csv, NULL '{_NULL}')",
+        buf,
+    )
+
+
+def bulk_insert_records(rows, batch_size=BATCH_SIZE, on_batch=None):
+    """
+    Insert DatabaseRecord rows given as column dicts (see DatabaseRecord.row_values).
+
+    rows:       iterable of dicts; consumed lazily, batch_size at a time.
+    on_batch:   optional callback(rows_so_far) after every batch.
+
+    Returns {'rows', 'seconds', 'rows_per_sec', 'method'}.
+    """
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    conn = db.session.connection()
+    use_copy = conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2'
+    method = 'copy' if use_copy else 'executemany'
+
+    columns = None
+    cursor = conn.connection.cursor() if use_copy else None
+    total = 0
+    try:
+        for batch in _batches(rows, batch_size):
+            for values in batch:
+                values.setdefault('created_at', now)
+                values.setdefault('updated_at', now)
+            if use_copy:
+                if columns is None:
+                    columns = list(batch[0].keys())
+                _copy_batch(cursor, columns, batch)
+            else:
+                db.session.execute(insert(DatabaseRecord), batch)
+            total += len(batch)
+            if on_batch:
+                on_batch(total)
+    finally:
+        if cursor is not None:
+            cursor.close()
+
+    seconds = time.perf_counter() - started
+    rate = total / seconds if seconds > 0 else float(total)
+    print(f'[IMPORT] Bulk-loaded {total} records in {seconds:.1f}s '
+          f'({rate:,.0f} rows/s, {method})')
+    return {'rows': total, 'seconds': round(seconds, 2), 'rows_per_sec': round(rate), 'method': method}
+
+
+def sync_records(rows, batch_size=BATCH_SIZE):
+    """
+    Incremental import: bring database_record in line with *rows* (column dicts,
+    see DatabaseRecord.row_values) by inserting, updating and deleting only what changed.
+
+    Rows are matched on natural_key (ID + week + project + scope); when a key occurs
+    several times, occurrences are paired in order. A matched row is rewritten only
+    if its row_hash differs, so updated_at keeps meaning "content changed".
+
+    Returns {'inserted', 'updated', 'deleted', 'unchanged', 'seconds'}.
+    """
+    started = time.perf_counter()
+    now = datetime.utcnow()
+
+    # natural_key → deque of (id, row_hash) in id order
+    existing = defaultdict(deque)
+    for rec_id, key, row_hash in (db.session.query(DatabaseRecord.id, DatabaseRecord.natural_key,
+                                                   DatabaseRecord.row_hash)
+                                  .order_by(DatabaseRecord.id)):
+        existing[key].append((rec_id, row_hash))
+
+    summary = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    updates = []
+
+    def flush_updates():
+        if updates:
+            db.session.execute(update(DatabaseRecord), updates)
+            summary['updated'] += len(updates)
+            updates.clear()
+
+    def new_rows():
+        for values in rows:
+            matches = existing.get(values['natural_key'])
+            if not matches:
+                yield values
+                continue
+            rec_id, row_hash = matches.popleft()
+            if row_hash == values['row_hash']:
+                summary['unchanged'] += 1
+                continue
+            values['id'] = rec_id
+            values['updated_at'] = now
+            updates.append(values)
+            if len(updates) >= batch_size:
+                flush_updates()
+
+    summary['inserted'] = bulk_insert_records(new_rows(), batch_size)['rows']
+    flush_updates()
+
+    stale = [rec_id for matches in existing.values() for rec_id, _ in matches]
+    for i in range(0, len(stale), batch_size):
+        db.session.execute(delete(DatabaseRecord).where(DatabaseRecord.id.in_(stale[i:i + batch_size])))
+    summary['deleted'] = len(stale)
+
+    summary['seconds'] = round(time.perf_counter() - started, 2)
+    print(f"[IMPORT] Incremental sync: {summary['inserted']} inserted, {summary['updated']} updated, "
+          f"{summary['deleted']} deleted, {summary['unchanged']} unchanged in {summary['seconds']}s")
+    return summary
+
+
+def upsert_rows(model, rows, key_cols, update_cols, batch_size=UPSERT_BATCH_SIZE):
+    """
+    INSERT ... ON CONFLICT (key_cols) DO UPDATE SET update_cols, batch_size rows per statement.
+
+    rows must all have the same keys and be unique on key_cols (PostgreSQL refuses to
+    update one row twice in a statement); key_cols needs a unique constraint.
+    Databases without ON CONFLICT go through _upsert_prefetched() instead.
+    Returns the number of rows written.
+    """
+    dialect = db.session.connection().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return _upsert_prefetched(model, rows, key_cols, update_cols, batch_size)
+
+    total = 0
+    for batch in _batches(rows, batch_size):
+        stmt = dialect_insert(model).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_cols),
+            set_={c: stmt.excluded[c] for c in update_cols},
+        )
+        db.session.execute(stmt)
+        total += len(batch)
+    return total
+
+
+def _upsert_prefetched(model, rows, key_cols, update_cols, batch_size=UPSERT_BATCH_SIZE):
+    """
+    upsert_rows() without ON CONFLICT: prefetch {key: id} with one query, then
+    UPDATE the matched rows by primary key and INSERT the rest, in batches.
+    """
+    ids = {tuple(key): rec_id for rec_id, *key in
+           db.session.query(model.id, *(getattr(model, c) for c in key_cols))}
+
+    updates, inserts = [], []
+    for row in rows:
+        rec_id = ids.get(tuple(row[c] for c in key_cols))
+        if rec_id is None:
+            inserts.append(row)
+        else:
+            updates.append({'id': rec_id, **{c: row[c] for c in update_cols}})
+
+    for batch in _batches(updates, batch_size):
+        db.session.execute(update(model), batch)
+    for batch in _batches(inserts, batch_size):
+        db.session.execute(insert(model), batch)
+    return len(updates) + len(inserts)
@@ -0,0 +1,124 @@
+"""
+Dependency tracking for incremental recalculation.
+
+The calculated fields of a record depend on the reference sheets (Info,
+Hourly Rates, Summary) only through four of its inputs:
+
+    person   ID             → Hourly Rates currency/base/additional rates, Info 517-A and TM rows
+    scope    Scope          → Info North/South and NO-1/2/3 (and NO-10 / Summary rates via NO-1/2)
+    projects Projects       → Info Projects/Group, Control-1, TM Kod, Konrol-1
+    week     (Week / Month) → Info TCMB USD/TRY and EUR/USD rates
+
+The lookups per input are taken from the formula rules (utils.formula_rules),
+so a formula change cannot leave a dependency untracked. For every distinct
+input value a signature of everything it resolves to in the reference sheets
+is kept in SystemInfo. After new reference data is loaded, only
+keys whose signature changed need recalculating, and the inverted index
+(DependencyIndex) maps those keys back to record ids.
+"""
+
+import hashlib
+import json
+
+from models import db
+from models.system_info import SystemInfo
+from utils.calculations import _record_inputs, _reference_sheets
+from utils.formula_rules import FORMULA_RULES
+
+
+DIMENSIONS = ('person', 'scope', 'projects', 'week')
+SIGNATURES_KEY = 'calc_reference_signatures'
+
+# Formula input behind each dimension
+_DIMENSION_INPUTS = {'person': 'person_id', 'scope': 'scope', 'projects': 'projects', 'week': 'week_month'}
+
+# Every XLOOKUP of the formula rules, grouped by the input its key derives from
+_LOOKUPS = {name: [(lookup, lookup.scalar()) for lookup in lookups]
+            for name, lookups in FORMULA_RULES.lookups_by_input().items()}
+_untracked = {name for name, lookups in _LOOKUPS.items() if lookups} - set(_DIMENSION_INPUTS.values())
+if _untracked:
+    raise RuntimeError(f'Formula lookups keyed on untracked inputs: {sorted(_untracked)}')
+
+
+def record_inputs(data):
+    """(person, scope, projects, week) reference keys of a record dict, extracted as calculate_auto_fields does."""
+    values = _record_inputs(data)
+    return tuple(values[_DIMENSION_INPUTS[dim]] for dim in DIMENSIONS)
+
+
+def _bundle(dimension, key):
+    """What *key* resolves to: the result of every formula lookup keyed on it."""
+    sheets = _reference_sheets()
+    values = {_DIMENSION_INPUTS[dimension]: key}
+    bundle = []
+    for lookup, run in _LOOKUPS[_DIMENSION_INPUTS[dimension]]:
+        try:
+            # Rules the lookup key is derived from (NO-10 is keyed on NO-1, ...)
+            FORMULA_RULES.evaluate(values, sheets, targets=lookup.key.refs())
+            bundle.append(run(values, sheets))
+        except Exception as e:
+            bundle.append(['error', str(e)])
+    return bundle
+
+
+def _signature(dimension, key):
+    """Short hash of what *key* resolves to in the currently loaded reference data."""
+    bundle = _bundle(dimension, key)
+    payload = json.dumps(bundle, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class DependencyIndex:
+    """Inverted index: reference key → ids of the records whose inputs use it, per dimension."""
+
+    def __init__(self):
+        self.keys = {dim: {} for dim in DIMENSIONS}   # dim → {repr(key): (key, [record ids])}
+
+    def add(self, record_id, data):
+        for dim, key in zip(DIMENSIONS, record_inputs(data)):
+            entry = self.keys[dim].get(repr(key))
+            if entry is None:
+                entry = self.keys[dim][repr(key)] = (key, [])
+            if record_id is not None:
+                entry[1].append(record_id)
+
+    def signatures(self):
+        """{dim: {repr(key): signature}} against the currently loaded reference data."""
+        return {dim: {name: _signature(dim, key) for name, (key, _) in entries.items()}
+                for dim, entries in self.keys.items()}
+
+    def affected_ids(self, old_signatures, new_signatures):
+        """Ids of records with at least one input whose signature changed (or was never recorded)."""
+        affected = set()
+        for dim in DIMENSIONS:
+            old = old_signatures.get(dim, {})
+            for name, sig in new_signatures[dim].items():
+                if old.get(name) != sig:
+                    affected.update(self.keys[dim][name][1])
+        return affected
+
+    def changed_keys(self, old_signatures, new_signatures):
+        """Number of changed keys per dimension (for logging / job status)."""
+        return {dim: sum(1 for name, sig in new_signatures[dim].items()
+                         if old_signatures.get(dim, {}).get(name) != sig)
+                for dim in DIMENSIONS}
+
+
+def load_signatures():
+    """Signatures the stored records were calculated with, or None if never recorded."""
+    row = SystemInfo.query.filter_by(key=SIGNATURES_KEY).first()
+    if row is None or not row.value:
+        return None
+    try:
+        return json.loads(row.value)
+    except ValueError:
+        return None
+
+
+def save_signatures(signatures):
+    """Record the reference signatures the stored records now match (caller commits)."""
+    row = SystemInfo.query.filter_by(key=SIGNATURES_KEY).first()
+    if row is None:
+        row = SystemInfo(key=SIGNATURES_KEY)
+        db.session.add(row)
+    row.value = json.dumps(signatures, ensure_ascii=False)
@@ -6,9 +6,15 @@ Provides Excel-formula-equivalent calculations for auto-populating record fields
 import os
 import json
 import re
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from utils.schema import WEEK_MONTH, TOTAL_MH, canonical_name
+from utils.sheet_snapshots import read_sheet
+
 # ---------------------------------------------------------------------------
 # Cache
 # ---------------------------------------------------------------------------
@@ -16,9 +22,12 @@ _excel_cache = {
     'info_df': None,
     'hourly_rates_df': None,
     'summary_df': None,
-    'file_path': None
+    'file_path': None,
+    'lookups': {},      # (sheet, key column, return column) → LookupIndex
 }
 
+_REFERENCE_SHEETS = ('info_df', 'hourly_rates_df', 'summary_df')
+
 
 # ---------------------------------------------------------------------------
 # Utility helpers
@@ -83,46 +92,127 @@ def excel_date_to_string(value):
     return str(value)
 
 
-def xlookup(lookup_value, lookup_array, return_array, if_not_found=0):
-    """Python equivalent of Excel XLOOKUP."""
-    try:
-        if not isinstance(lookup_array, pd.Series):
-            lookup_array = pd.Series(lookup_array)
-        if not isinstance(return_array, pd.Series):
-            return_array = pd.Series(return_array)
+def _normalise_key(value):
+    return ' '.join(value.strip().upper().split())
 
-        if pd.isna(lookup_value):
-            return if_not_found
 
-        mask = lookup_array == lookup_value
+class LookupIndex:
+    """
+    Hash index over one (lookup column, return column) pair with XLOOKUP semantics:
+    exact match first, then a whitespace/case-normalised string match; the first
+    matching row wins and an empty (NaN) result counts as not found.
+
+    On a datetime key column a string or datetime lookup value is matched as the
+    Timestamp it parses to, as pandas' column == value comparison does (the TCMB
+    rate columns of Info are looked up with 'DD/Mon/YYYY' week strings).
 
-        # Normalised string fallback
-        if not mask.any() and isinstance(lookup_value, str):
+    The exact-match dict is built up front, the normalised one on the first
+    string miss. Use lookup_index() to get the cached instance for a reference sheet.
+    """
+
+    def __init__(self, lookup_array, return_array):
+        self._keys = pd.Series(lookup_array).reset_index(drop=True)
+        self._returns = pd.Series(return_array).to_numpy()
+        self._dates = self._keys.dtype.kind == 'M'
+        self._exact = {}
+        # Iterating a datetime Series yields Timestamps (its ndarray holds np.datetime64)
+        keys = self._keys if self._dates else self._keys.to_numpy()
+        for pos, v in enumerate(keys):
+            if v == v:                              # NaN never matches
+                try:
+                    self._exact.setdefault(v, pos)
+                except TypeError:
+                    pass
+        self._normalised = None
+
+    def _exact_key(self, value):
+        if self._dates and isinstance(value, (str, datetime, np.datetime64)):
             try:
-                norm_lv = ' '.join(str(lookup_value).strip().upper().split())
-                norm_arr = lookup_array.astype(str).str.strip().str.upper().apply(
-                    lambda x: ' '.join(x.split()))
-                mask = norm_arr == norm_lv
-            except Exception:
-                pass
-
-        if mask.any():
-            idx = mask.idxmax()
-            result = (return_array.iloc[idx] if isinstance(return_array, pd.Series)
-                      else return_array[idx])
-            return result if pd.notna(result) else if_not_found
+                stamp = pd.Timestamp(value)
+            except (ValueError, TypeError, OverflowError):
+                return None
+            return None if pd.isna(stamp) else stamp
+        return value
 
-        return if_not_found
+    def _position(self, value):
+        try:
+            key = self._exact_key(value)
+            pos = None if key is None else self._exact.get(key)
+        except TypeError:
+            pos = None
+        if pos is None and isinstance(value, str):
+            if self._normalised is None:
+                self._normalised = {}
+                for p, v in enumerate(self._keys.astype(str)):
+                    self._normalised.setdefault(_normalise_key(v), p)
+            pos = self._normalised.get(_normalise_key(value))
+        return pos
+
+    def _result(self, pos, if_not_found):
+        if pos is None:
+            return if_not_found
+        result = self._returns[pos]
+        return result if pd.notna(result) else if_not_found
+
+    def get(self, lookup_value, if_not_found=0):
+        """Scalar XLOOKUP."""
+        try:
+            if pd.isna(lookup_value):
+                return if_not_found
+        except (TypeError, ValueError):
+            return if_not_found
+        return self._result(self._position(lookup_value), if_not_found)
+
+    def get_many(self, lookup_values, if_not_found=0):
+        """XLOOKUP for a whole column; each distinct value is resolved once. Returns an object ndarray."""
+        codes, uniques = pd.factorize(np.asarray(lookup_values, dtype=object))
+        resolved = np.empty(len(uniques) + 1, dtype=object)
+        resolved[-1] = if_not_found                 # code -1: NaN/None
+        for i, value in enumerate(uniques):
+            resolved[i] = self._result(self._position(value), if_not_found)
+        return resolved[codes]
+
+
+def lookup_index(df, key_col, return_col):
+    """
+    LookupIndex for positional columns of *df*. Indexes over the cached reference
+    sheets are built once and kept in _excel_cache until the sheets are replaced.
+    """
+    # Taken before the identity check, so an index of replaced sheets never lands in the new dict
+    lookups = _excel_cache['lookups']
+    for sheet in _REFERENCE_SHEETS:
+        if df is _excel_cache[sheet]:
+            key = (sheet, key_col, return_col)
+            index = lookups.get(key)
+            if index is None:
+                index = lookups[key] = LookupIndex(df.iloc[:, key_col], df.iloc[:, return_col])
+            return index
+    return LookupIndex(df.iloc[:, key_col], df.iloc[:, return_col])
+
+
+def xlookup(lookup_value, lookup_array, return_array, if_not_found=0):
+    """Python equivalent of Excel XLOOKUP (one-off; use lookup_index() for repeated lookups)."""
+    try:
+        return LookupIndex(lookup_array, return_array).get(lookup_value, if_not_found)
     except Exception as e:
         print(f'[CALC] xlookup error: {e}')
         return if_not_found
 
 
 def find_column(df, *possible_names):
-    """Return the first column name in possible_names that exists in df, else None."""
+    """
+    Return the first column name in possible_names that exists in df, else None.
+    Falls back to matching by canonical name (utils.schema), so any spelling of a
+    registered column is found.
+    """
     for name in possible_names:
         if name in df.columns:
             return name
+    by_canonical = {canonical_name(c): c for c in df.columns}
+    for name in possible_names:
+        found = by_canonical.get(canonical_name(name))
+        if found is not None:
+            return found
     return None
 
 
@@ -144,13 +234,14 @@ def set_if_empty(df, idx, col, value, debug=False):
 # Reference data loader
 # ---------------------------------------------------------------------------
 
-def load_excel_reference_data(file_path=None, upload_dir=None):
+def load_excel_reference_data(file_path=None, upload_dir=None, reload=False):
     """
     Load Info, Hourly Rates and Summary sheets from the Excel file into cache.
+    The sheets are read first and swapped in together, so requests running
+    meanwhile keep using the previous ones. reload=True reads the file even if
+    it is the one already cached (the recalculation job wants current data).
     Returns True on success, False on failure.
     """
-    global _excel_cache
-
     if upload_dir is None:
         upload_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads')
 
@@ -163,41 +254,33 @@ def load_excel_reference_data(file_path=None, upload_dir=None):
         file_path = os.path.join(upload_dir, candidates[0])
 
     # Use cache if same file
-    if _excel_cache['file_path'] == file_path and _excel_cache['info_df'] is not None:
+    if not reload and _excel_cache['file_path'] == file_path and _excel_cache['info_df'] is not None:
         return True
 
     try:
         ext = os.path.splitext(file_path)[1].lower()
         engine = 'pyxlsb' if ext == '.xlsb' else None
 
-        # Info sheet
-        df_info = pd.read_excel(file_path, sheet_name='Info',
-                                engine=engine) if engine else pd.read_excel(
-            file_path, sheet_name='Info')
+        # Info sheet (sheets come from the upload's Parquet snapshots once converted)
+        df_info = read_sheet(file_path, 'Info', engine=engine)
 
         # Normalise the Weeks/Month column (index 20) from Excel serial dates
         if len(df_info.columns) > 20:
             df_info.iloc[:, 20] = df_info.iloc[:, 20].apply(excel_date_to_string)
 
-        _excel_cache['info_df'] = df_info
-
         # Hourly Rates sheet (header on row 2)
-        df_rates = (pd.read_excel(file_path, sheet_name='Hourly Rates',
-                                  engine=engine, header=1)
-                    if engine else
-                    pd.read_excel(file_path, sheet_name='Hourly Rates', header=1))
-        _excel_cache['hourly_rates_df'] = df_rates
+        df_rates = read_sheet(file_path, 'Hourly Rates', header=1, engine=engine)
 
         # Summary sheet (optional)
         try:
-            df_summary = (pd.read_excel(file_path, sheet_name='Summary', engine=engine)
-                          if engine else
-                          pd.read_excel(file_path, sheet_name='Summary'))
-            _excel_cache['summary_df'] = df_summary
+            df_summary = read_sheet(file_path, 'Summary', engine=engine)
         except Exception:
-            _excel_cache['summary_df'] = None
+            df_summary = None
 
-        _excel_cache['file_path'] = file_path
+        # One dict.update: other threads see either the old sheets or the new ones
+        _excel_cache.update(info_df=df_info, hourly_rates_df=df_rates, summary_df=df_summary,
+                            file_path=file_path, lookups={})
+        _formula_memo.clear()
         print(f'[CALC] Loaded Excel reference data from {os.path.basename(file_path)}')
         return True
     except Exception as e:
@@ -207,428 +290,515 @@ def load_excel_reference_data(file_path=None, upload_dir=None):
 
 def invalidate_cache():
     """Clear the in-memory reference data cache (call after a new file upload)."""
-    global _excel_cache
-    _excel_cache = {
-        'info_df': None,
-        'hourly_rates_df': None,
-        'summary_df': None,
-        'file_path': None
-    }
+    # Cleared in place: routes import _excel_cache directly
+    _excel_cache.update(info_df=None, hourly_rates_df=None, summary_df=None,
+                        file_path=None, lookups={})
+    _formula_memo.clear()
+
+
+# ---------------------------------------------------------------------------
+# Formula memo
+# ---------------------------------------------------------------------------
+
+FORMULA_MEMO_SIZE = 50000
+
+
+class FormulaMemo:
+    """
+    Bounded LRU cache for the lookup-derived part of the formulas.
+
+    DATABASE rows repeat the same (ID, Scope, Company, Projects, week, ...) inputs
+    week after week; only the MH arithmetic differs per row. Entries are keyed by
+    the normalised inputs and cleared together with the reference data. Every
+    clear() starts a new epoch; a value computed by a caller that read the
+    reference sheets in an earlier epoch is returned but not stored.
+    """
+
+    def __init__(self, maxsize=FORMULA_MEMO_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.epoch = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, compute, epoch=None):
+        """Cached value for *key*; compute() is called (outside the lock) on a miss."""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        value = compute()
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return value
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.epoch += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_formula_memo = FormulaMemo()
+
+
+def formula_memo_stats():
+    """Hit/miss/eviction counters of the formula memo."""
+    return _formula_memo.stats()
+
+
+def formula_timings():
+    """Per-formula evaluation counts and time (see formula_rules.RuleSet.timings)."""
+    from utils.formula_rules import FORMULA_RULES
+    return FORMULA_RULES.timings()
 
 
 # ---------------------------------------------------------------------------
 # Per-record auto-calculation
 # ---------------------------------------------------------------------------
+# The formulas themselves are declared in utils.formula_rules; this module
+# extracts their inputs from records and writes the results back.
+
+# (record field, formula) in the order calculate_auto_fields writes them
+_RECORD_FIELDS = (
+    ('North/\nSouth', 'north_south'),
+    ('North/South', 'north_south'),
+    ('North/ South', 'north_south'),
+    ('Currency', 'currency'),
+    ('Projects/Group', 'projects_group'),     # only when the record has none
+    ('AP-CB /\nSubcon', 'ap_cb_subcon'),
+    ('LS/Unit Rate', 'ls_unit_rate'),
+    ('Hourly Base Rate', 'hourly_base_rate'),
+    ('Hourly Additional Rates', 'hourly_additional_rate'),
+    ('Hourly\n Rate', 'hourly_rate'),
+    ('Hourly Rate', 'hourly_rate'),
+    ('Cost', 'cost'),
+    ('General Total\n Cost (USD)', 'general_total_cost_usd'),
+    ('General Total Cost (USD)', 'general_total_cost_usd'),
+    ('Hourly Unit Rate (USD)', 'hourly_unit_rate_usd'),
+    ('NO-1', 'no_1'),
+    ('NO-2', 'no_2'),
+    ('NO-3', 'no_3'),
+    ('NO-10', 'no_10'),
+    ('İşveren-Hakediş Birim Fiyat', 'isveren_birim_fiyat'),
+    ('İşveren- Hakediş', 'isveren_hakedis'),
+    ('İşveren- Hakediş (USD)', 'isveren_hakedis_usd'),
+    ('İşveren-Hakediş Birim Fiyat\n(USD)', 'isveren_birim_fiyat_usd'),
+    ('Control-1', 'control_1'),
+    ('TM Liste', 'tm_liste'),
+    ('TM Kod', 'tm_kod'),
+    ('Konrol-1', 'kontrol_1'),
+    ('Knrtol-2', 'kontrol_2'),
+)
+
+# Fields reported as N/A when their formula yields nothing
+_NA_TRACKED = (
+    ('North/South', 'north_south'),
+    ('Currency', 'currency'),
+    ('Control-1', 'control_1'),
+    ('TM Liste', 'tm_liste'),
+    ('TM Kod', 'tm_kod'),
+    ('Konrol-1', 'kontrol_1'),
+    ('NO-1', 'no_1'),
+    ('NO-2', 'no_2'),
+    ('NO-3', 'no_3'),
+    ('NO-10', 'no_10'),
+)
+
+
+def _reference_sheets(info_df=None, rates_df=None, summary_df=None, cached=True):
+    """Sheet mapping the formula Lookups read from (the cached reference data by default)."""
+    if cached:
+        return {'info': _excel_cache['info_df'], 'rates': _excel_cache['hourly_rates_df'],
+                'summary': _excel_cache['summary_df']}
+    return {'info': info_df, 'rates': rates_df, 'summary': summary_df}
+
+
+def _record_inputs(record_data):
+    """Formula inputs (formula_rules.FORMULA_INPUTS) of one record dict."""
+    week_month_raw = record_data.get(WEEK_MONTH, '')
+    return {
+        'person_id': safe_float(record_data.get('ID', 0)),
+        'scope': safe_str(record_data.get('Scope', '')),
+        'company': safe_str(record_data.get('Company', '')),
+        'projects': safe_str(record_data.get('Projects', '')),
+        'week_month': excel_date_to_string(week_month_raw) if week_month_raw else '',
+        'isveren_currency': safe_str(record_data.get('İşveren - Currency', '')),
+        'total_mh': safe_float(record_data.get(TOTAL_MH, 0)),
+        'kuzey_mh_person': safe_float(record_data.get('Kuzey MH-Person', 0)),
+    }
+
 
 def calculate_auto_fields(record_data, file_path=None, upload_dir=None):
     """
     Calculate all auto-populated fields for a single record dict.
 
+    The formulas that only depend on reference data are memoised per distinct
+    input tuple (see FormulaMemo); only the MH-dependent ones run for every record.
+
     Returns:
         (updated_record_data, list_of_na_fields)
     """
+    from utils.formula_rules import FORMULA_RULES, MH_INPUTS, REFERENCE_RULES
+
     if not load_excel_reference_data(file_path, upload_dir):
         print('[CALC] Warning: Could not load Excel reference data')
         return record_data, []
 
-    info_df  = _excel_cache['info_df']
-    rates_df = _excel_cache['hourly_rates_df']
-    summary_df = _excel_cache['summary_df']
-
-    na_fields = []
-
-    # ---- input extraction ------------------------------------------------
-    person_id   = safe_float(record_data.get('ID', 0))
-    scope       = safe_str(record_data.get('Scope', ''))
-    company     = safe_str(record_data.get('Company', ''))
-    projects    = safe_str(record_data.get('Projects', ''))
-    projects_group = safe_str(record_data.get('Projects/Group', ''))
-    nationality    = safe_str(record_data.get('Nationality', ''))
-
-    week_month_raw = (record_data.get('(Week /\nMonth)', '') or
-                      record_data.get('(Week / Month)', '') or
-                      record_data.get('Week / Month', '') or
-                      record_data.get('Week/Month', ''))
-    week_month = excel_date_to_string(week_month_raw) if week_month_raw else ''
-
-    total_mh      = safe_float(record_data.get('TOTAL\n MH', 0) or
-                               record_data.get('TOTAL MH', 0) or
-                               record_data.get('Total MH', 0))
-    kuzey_mh_person = safe_float(record_data.get('Kuzey MH-Person', 0))
-
-    isveren_currency = safe_str(record_data.get('İşveren - Currency', ''))
-
-    # ---- FORMULA 1: North/South ------------------------------------------
-    north_south = xlookup(scope, info_df.iloc[:, 13], info_df.iloc[:, 16], '')
-    record_data['North/\nSouth'] = north_south
-    record_data['North/South']   = north_south
-    record_data['North/ South']  = north_south
-
-    # ---- FORMULA 2: Currency ---------------------------------------------
-    if person_id == 905264:
-        currency = 'TL'
-    else:
-        currency = xlookup(person_id, rates_df.iloc[:, 0], rates_df.iloc[:, 6], 'USD')
-    record_data['Currency'] = currency
-
-    # ---- FORMULA 3: Projects/Group (only if user hasn't provided one) ----
-    if not projects_group:
-        projects_group = xlookup(projects, info_df.iloc[:, 14], info_df.iloc[:, 15], '')
-        record_data['Projects/Group'] = projects_group
-
-    # ---- FORMULA 4: AP-CB/Subcon ----------------------------------------
-    ap_cb_subcon = 'AP-CB' if 'AP-CB' in company else 'Subcon'
-    record_data['AP-CB /\nSubcon'] = ap_cb_subcon
-
-    # ---- FORMULA 5: LS/Unit Rate ----------------------------------------
-    scope_has_lumpsum  = 'lumpsum' in scope.lower() if scope else False
-    company_is_special = company in ['İ4', 'DEGENKOLB', 'Kilci Danışmanlık']
-    ls_unit_rate = 'Lumpsum' if (scope_has_lumpsum or company_is_special) else 'Unit Rate'
-    record_data['LS/Unit Rate'] = ls_unit_rate
-
-    # ---- FORMULA 6: Hourly Base Rate ------------------------------------
-    if ap_cb_subcon == 'Subcon' and ls_unit_rate == 'Unit Rate':
-        hourly_base_rate = safe_float(xlookup(person_id, rates_df.iloc[:, 0], rates_df.iloc[:, 9], 0))
-    else:
-        hourly_base_rate = safe_float(xlookup(person_id, rates_df.iloc[:, 0], rates_df.iloc[:, 7], 0))
-    record_data['Hourly Base Rate'] = hourly_base_rate
-
-    # ---- FORMULA 7: Hourly Additional Rate ------------------------------
-    if ls_unit_rate == 'Lumpsum' or company in ('AP-CB', 'AP-CB / pergel'):
-        hourly_additional_rate = 0
-    else:
-        additional_base = safe_float(xlookup(person_id, rates_df.iloc[:, 0], rates_df.iloc[:, 11], 0))
-        currency_norm = safe_str(currency).strip().upper()
-        if currency_norm == 'USD':
-            hourly_additional_rate = additional_base
-        elif currency_norm == 'TL':
-            tcmb = safe_float(xlookup(week_month, info_df.iloc[:, 20], info_df.iloc[:, 22], 1))
-            hourly_additional_rate = additional_base * tcmb
-        else:
-            hourly_additional_rate = 0
-    record_data['Hourly Additional Rates'] = hourly_additional_rate
-
-    # ---- FORMULA 8: Hourly Rate ----------------------------------------
-    hourly_rate = hourly_base_rate + hourly_additional_rate
-    record_data['Hourly\n Rate'] = hourly_rate
-    record_data['Hourly Rate']   = hourly_rate
-
-    # ---- FORMULA 9: Cost -----------------------------------------------
-    cost = hourly_rate * total_mh
-    record_data['Cost'] = cost
-
-    # ---- FORMULA 10: General Total Cost (USD) --------------------------
-    currency_norm = safe_str(currency).strip().upper()
-    if currency_norm == 'TL':
-        tcmb_usd_try = safe_float(xlookup(week_month, info_df.iloc[:, 20], info_df.iloc[:, 22], 1))
-        general_total_cost_usd = cost / tcmb_usd_try if tcmb_usd_try != 0 else 0
-    elif currency_norm == 'EURO':
-        tcmb_eur_usd = safe_float(xlookup(week_month, info_df.iloc[:, 20], info_df.iloc[:, 23], 1))
-        general_total_cost_usd = cost * tcmb_eur_usd
-    else:
-        general_total_cost_usd = cost
-    record_data['General Total\n Cost (USD)'] = general_total_cost_usd
-    record_data['General Total Cost (USD)']   = general_total_cost_usd
-
-    # ---- FORMULA 11: Hourly Unit Rate (USD) ----------------------------
-    hourly_unit_rate_usd = general_total_cost_usd / total_mh if total_mh != 0 else 0
-    record_data['Hourly Unit Rate (USD)'] = hourly_unit_rate_usd
-
-    # ---- NO-1..NO-10 lookups -------------------------------------------
-    no_1  = xlookup(scope, info_df.iloc[:, 13], info_df.iloc[:, 9],  0)
-    no_2  = xlookup(scope, info_df.iloc[:, 13], info_df.iloc[:, 11], '')
-    no_3  = xlookup(scope, info_df.iloc[:, 13], info_df.iloc[:, 12], '')
-    no_10 = xlookup(no_1,  info_df.iloc[:, 9],  info_df.iloc[:, 10], '')
-    record_data['NO-1']  = no_1
-    record_data['NO-2']  = no_2
-    record_data['NO-3']  = no_3
-    record_data['NO-10'] = no_10
-
-    # ---- FORMULA 12: İşveren Hakediş Birim Fiyat ------------------------
-    no_1_num = safe_float(no_1, 0)
-    no_2_str = safe_str(no_2, '')
-
-    if no_2_str in ('999-A', '999-C', '414-C') or no_1_num == 313:
-        isveren_birim_fiyat = hourly_rate
-    elif no_1_num in (312, 314, 316) or no_2_str == '360-T':
-        isveren_birim_fiyat = hourly_rate * 1.02
-    elif no_2_str == '517-A':
-        isveren_birim_fiyat = safe_float(xlookup(person_id, info_df.iloc[:, 28], info_df.iloc[:, 33], 0))
-    else:
-        if summary_df is not None:
-            v1 = safe_float(xlookup(no_1, summary_df.iloc[:, 2], summary_df.iloc[:, 26], 0))
-            v2 = safe_float(xlookup(no_2, summary_df.iloc[:, 2], summary_df.iloc[:, 26], 0))
-            isveren_birim_fiyat = v1 + v2
-        else:
-            isveren_birim_fiyat = 0
-    record_data['İşveren-Hakediş Birim Fiyat'] = isveren_birim_fiyat
-
-    # ---- FORMULA 13: İşveren-Hakediş ------------------------------------
-    isveren_hakedis = (kuzey_mh_person * isveren_birim_fiyat
-                       if kuzey_mh_person > 0
-                       else isveren_birim_fiyat * total_mh)
-    record_data['İşveren- Hakediş'] = isveren_hakedis
-
-    # ---- FORMULA 14: İşveren- Hakediş (USD) ----------------------------
-    if isveren_currency == 'EURO':
-        eur_usd = safe_float(xlookup(week_month, info_df.iloc[:, 20], info_df.iloc[:, 23], 1))
-        isveren_hakedis_usd = isveren_hakedis * eur_usd
-    else:
-        isveren_hakedis_usd = isveren_hakedis
-    record_data['İşveren- Hakediş (USD)'] = isveren_hakedis_usd
-
-    # ---- FORMULA 15: İşveren- Hakediş Birim Fiyat (USD) ----------------
-    denom = kuzey_mh_person if kuzey_mh_person > 0 else total_mh
-    record_data['İşveren-Hakediş Birim Fiyat\n(USD)'] = (
-        isveren_hakedis_usd / denom if denom != 0 else 0)
-
-    # ---- Control & TM fields -------------------------------------------
-    control_1 = xlookup(projects, info_df.iloc[:, 14], info_df.iloc[:, 18], '')
-    record_data['Control-1'] = control_1
+    values = _record_inputs(record_data)
+    epoch = _formula_memo.epoch     # read before the sheets, see FormulaMemo
+    sheets = _reference_sheets()
+    key = tuple(v for name, v in values.items() if name not in MH_INPUTS)
+    values.update(_formula_memo.get(key, lambda: FORMULA_RULES.evaluate(
+        {name: v for name, v in values.items() if name not in MH_INPUTS},
+        sheets, targets=REFERENCE_RULES), epoch))
+    FORMULA_RULES.evaluate(values, sheets)
+
+    group_empty = not safe_str(record_data.get('Projects/Group', ''))
+    for field, name in _RECORD_FIELDS:
+        if field != 'Projects/Group' or group_empty:
+            record_data[field] = values[name]
+
+    na_fields = [field for field, name in _NA_TRACKED
+                 if not values[name] or values[name] == 'N/A']
+    return record_data, na_fields
 
-    try:
-        tm_liste = xlookup(person_id, info_df.iloc[:, 58], info_df.iloc[:, 60], '')
-    except Exception:
-        tm_liste = ''
-    record_data['TM Liste'] = tm_liste
 
-    tm_kod = xlookup(projects, info_df.iloc[:, 14], info_df.iloc[:, 17], '')
-    record_data['TM Kod'] = tm_kod
+# ---------------------------------------------------------------------------
+# Batch auto-calculation (whole DataFrame at once)
+# ---------------------------------------------------------------------------
+
+def _floats(values):
+    return np.fromiter((safe_float(v) for v in values), dtype=float, count=len(values))
+
+
+def _objects(values):
+    out = np.empty(len(values), dtype=object)
+    out[:] = values
+    return out
+
+
+def _week_strings(raw_values):
+    """excel_date_to_string over a column, converting each distinct value once."""
+    cache = {}
+    week_month = []
+    for v in raw_values:
+        try:
+            w = cache[(type(v), v)]
+        except KeyError:
+            w = cache[(type(v), v)] = excel_date_to_string(v) if v else ''
+        except TypeError:
+            w = excel_date_to_string(v) if v else ''
+        week_month.append(w)
+    return _objects(week_month)
+
+
+def calculate_auto_fields_df(df, info_df, rates_df, summary_df):
+    """
+    Batch version of calculate_auto_fields for a DataFrame of records.
+
+    Runs the vectorised evaluator of the formula rules: the XLOOKUPs become hash
+    joins (LookupIndex.get_many) and the branches masks over whole columns, so a
+    batch costs a few passes instead of rows × reference-rows comparisons.
 
-    kontrol_1 = xlookup(projects, info_df.iloc[:, 14], info_df.iloc[:, 9], '')
-    record_data['Konrol-1'] = kontrol_1
-    record_data['Knrtol-2'] = bool(no_1 == kontrol_1)
+    Returns (calc_df, na_fields): calc_df holds the fields calculate_auto_fields
+    writes, aligned on df.index; na_fields is the per-row list of N/A fields.
+    """
+    from utils.formula_rules import FORMULA_RULES
+
+    n = len(df)
+
+    def column(name, default):
+        if name in df.columns:
+            return df[name]
+        return pd.Series([default] * n, index=df.index, dtype=object)
+
+    values = {
+        'person_id': column('ID', 0).map(safe_float).to_numpy(dtype=float),
+        'scope': column('Scope', '').map(safe_str).to_numpy(dtype=object),
+        'company': column('Company', '').map(safe_str).to_numpy(dtype=object),
+        'projects': column('Projects', '').map(safe_str).to_numpy(dtype=object),
+        'week_month': _week_strings(column(WEEK_MONTH, '')),
+        'isveren_currency': column('İşveren - Currency', '').map(safe_str).to_numpy(dtype=object),
+        'total_mh': column(TOTAL_MH, 0).map(safe_float).to_numpy(dtype=float),
+        'kuzey_mh_person': column('Kuzey MH-Person', 0).map(safe_float).to_numpy(dtype=float),
+    }
+    FORMULA_RULES.evaluate_arrays(values, _reference_sheets(info_df, rates_df, summary_df, cached=False), n)
+
+    projects_group_raw = column('Projects/Group', '')
+    group_empty = (projects_group_raw.map(safe_str) == '').to_numpy()
+    calc = {}
+    for field, name in _RECORD_FIELDS:
+        value = values[name]
+        if field == 'Projects/Group':
+            value = np.where(group_empty, value, projects_group_raw.to_numpy(dtype=object))
+        elif value.dtype == bool:
+            value = value.astype(object)    # Python bools, as in the per-record path
+        calc[field] = value
+    calc_df = pd.DataFrame(calc, index=df.index)
 
     # ---- N/A tracking --------------------------------------------------
-    for fname, fval in {
-        'North/South': north_south,
-        'Currency': currency,
-        'Control-1': control_1,
-        'TM Liste': tm_liste,
-        'TM Kod': tm_kod,
-        'Konrol-1': kontrol_1,
-        'NO-1': no_1,
-        'NO-2': no_2,
-        'NO-3': no_3,
-        'NO-10': no_10,
-    }.items():
-        if not fval or fval == 'N/A':
-            na_fields.append(fname)
+    na_fields = [[] for _ in range(n)]
+    for fname, name in _NA_TRACKED:
+        for i, fval in enumerate(values[name]):
+            if not fval or fval == 'N/A':
+                na_fields[i].append(fname)
 
-    return record_data, na_fields
+    return calc_df, na_fields
+
+
+def calculate_auto_fields_batch(records, file_path=None, upload_dir=None):
+    """
+    calculate_auto_fields for a list of record dicts in one calculate_auto_fields_df
+    pass. The dicts are updated in place; returns (records, na_fields per record).
+    """
+    if not load_excel_reference_data(file_path, upload_dir):
+        print('[CALC] Warning: Could not load Excel reference data')
+        return records, [[] for _ in records]
+    if not records:
+        return records, []
+
+    # dtype=object keeps cell values as stored (no int → float upcasting)
+    df = pd.DataFrame(records, dtype=object)
+    calc_df, na_fields = calculate_auto_fields_df(
+        df, _excel_cache['info_df'], _excel_cache['hourly_rates_df'], _excel_cache['summary_df'])
+
+    columns = list(calc_df.columns)
+    values = [calc_df[c].to_numpy() for c in columns]
+    for record, row in zip(records, zip(*values)):
+        record.update(zip(columns, row))
+    return records, na_fields
 
 
 # ---------------------------------------------------------------------------
 # Bulk fill-empty-cells for DataFrame rows
 # ---------------------------------------------------------------------------
 
-def fill_empty_cells_with_formulas(df, info_df, rates_df, summary_df):
+FILL_CHUNK_ROWS = 20000
+
+
+def _is_empty(value):
+    """set_if_empty's notion of an empty cell."""
+    return (value is None or
+            (isinstance(value, float) and pd.isna(value)) or
+            (isinstance(value, str) and value.strip() == ''))
+
+
+def _float_compatible(value):
+    """Values pandas stores into a float64 column without upcasting it to object."""
+    return (value is None or
+            (isinstance(value, (int, float, np.integer, np.floating)) and
+             not isinstance(value, (bool, np.bool_))))
+
+
+def _kontrol2_blank(value):
+    """Kontrol-2 cells fill_empty_cells_with_formulas overwrites (blank, or a 0/1 placeholder)."""
+    return (pd.isna(value) or value in (0, 0.0, 1, 1.0) or
+            (isinstance(value, str) and value.strip() == ''))
+
+
+def _row_dtype(df):
+    """dtype of the row Series DataFrame.iterrows() yields (what the per-row formulas read)."""
+    dtypes = set(df.dtypes)
+    if len(dtypes) == 1:
+        return dtypes.pop()
+    if all(pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d) for d in dtypes):
+        return np.result_type(*dtypes)
+    return np.dtype(object)
+
+
+class _FilledColumn:
+    """
+    Chunk-by-chunk set_if_empty writes into one column.
+
+    Writing cell by cell, a float64 column stays float64 (values coerced to float)
+    until the first value it cannot hold, then becomes object for the remaining
+    rows. fill() reproduces that, so the result matches the per-row loop dtype and all.
+    """
+
+    def __init__(self, series):
+        self.series = series
+        self.is_float = series.dtype.kind == 'f'
+        self.is_object = series.dtype == object
+        self.upcast = False
+        self.written = False
+        self.chunks = []
+
+    def fill(self, rows, values, mask=None, empty=_is_empty):
+        """Write values into the cells of rows that are empty (and in mask); returns the stored cells."""
+        stored = self.series.iloc[rows].to_numpy(dtype=object, copy=True)
+        write = np.fromiter((empty(c) for c in stored), dtype=bool, count=len(stored))
+        if mask is not None:
+            write &= mask
+        if write.any():
+            self.written = True
+            values = np.asarray(values, dtype=object)
+            if self.is_float and not self.upcast:
+                bad = write & ~np.fromiter((_float_compatible(v) for v in values), dtype=bool,
+                                           count=len(values))
+                first = int(bad.argmax()) if bad.any() else len(values)
+                coerced = write.copy()
+                coerced[first:] = False
+                stored[coerced] = [np.nan if v is None else float(v) for v in values[coerced]]
+                if first < len(values):
+                    self.upcast = True
+                    write[:first] = False
+                    stored[write] = values[write]
+            else:
+                if not self.is_object:
+                    self.upcast = True
+                stored[write] = values[write]
+        self.chunks.append(stored)
+        return stored
+
+    def result(self):
+        if not self.written:
+            return self.series
+        data = np.concatenate(self.chunks)
+        return pd.Series(data, index=self.series.index, name=self.series.name,
+                         dtype=object if self.upcast else self.series.dtype)
+
+
+def fill_empty_cells_with_formulas(df, info_df, rates_df, summary_df, chunk_size=FILL_CHUNK_ROWS):
     """
     Fill empty calculated columns in a DATABASE-sheet DataFrame using the
-    same formulas as calculate_auto_fields.
+    same formula rules as calculate_auto_fields.
     Only writes to cells that are currently empty/NaN (non-destructive).
+
+    Works column-wise on chunk_size rows at a time: only the formulas behind
+    the columns present are evaluated (vectorised) for the whole chunk, and
+    cells are written as set_if_empty would, row by row (dtypes included).
+    Currency, AP-CB/Subcon and LS/Unit Rate cells the sheet already has
+    override the calculated ones; formulas downstream of them are re-evaluated.
     """
+    from utils.formula_rules import FORMULA_RULES
+
     result_df = df.copy()
 
     # Discover column names
     col = lambda *names: find_column(result_df, *names)
-    col_north_south       = col('North/South', 'North/\nSouth', 'North/ South')
     col_currency          = col('Currency')
     col_ap_cb_subcon      = col('AP-CB / \nSubcon', 'AP-CB/Subcon', 'AP-CB / Subcon',
                                 'AP-CB/\nSubcon', 'APCB/Subcon')
     col_ls_unit_rate      = col('LS/Unit Rate')
-    col_hourly_base_rate  = col('Hourly Base Rate')
-    col_hourly_add_rate   = col('Hourly Additional Rates', 'Hourly Additional Rate')
-    col_hourly_rate       = col('Hourly Rate', 'Hourly\n Rate')
-    col_cost              = col('Cost')
-    col_gen_cost_usd      = col('General Total Cost (USD)', 'General Total\n Cost (USD)')
-    col_hur_unit_usd      = col('Hourly Unit Rate (USD)')
-    col_no_1  = col('NO-1')
-    col_no_2  = col('NO-2')
-    col_no_3  = col('NO-3')
-    col_no_10 = col('NO-10')
-    col_isv_birim       = col('İşveren-Hakediş Birim Fiyat')
-    col_isv_hakedis     = col('İşveren- Hakediş')
-    col_isv_hakedis_usd = col('İşveren- Hakediş (USD)')
-    col_isv_birim_usd   = col('İşveren-Hakediş Birim Fiyat\n(USD)',
-                               'İşveren-Hakediş Birim Fiyat (USD)')
-    col_ctrl1    = col('Control-1')
-    col_tm_liste = col('TM Liste')
-    col_tm_kod   = col('TM Kod')
-    col_kontrol1 = col('Konrol-1', 'Kontrol-1')
-    col_kontrol2 = col('Knrtol-2', 'Kontrol-2')
+    col_tm_liste          = col('TM Liste')
+    col_kontrol2          = col('Knrtol-2', 'Kontrol-2')
+    col_week_month = col(WEEK_MONTH)
+    col_total_mh   = col(TOTAL_MH)
+
+    # (column, formula) for the remaining calculated columns, in fill order
+    formula_columns = [
+        (c, name) for c, name in (
+            (col('North/South', 'North/\nSouth', 'North/ South'), 'north_south'),
+            (col('Hourly Base Rate'), 'hourly_base_rate'),
+            (col('Hourly Additional Rates', 'Hourly Additional Rate'), 'hourly_additional_rate'),
+            (col('Hourly Rate', 'Hourly\n Rate'), 'hourly_rate'),
+            (col('Cost'), 'cost'),
+            (col('General Total Cost (USD)', 'General Total\n Cost (USD)'), 'general_total_cost_usd'),
+            (col('Hourly Unit Rate (USD)'), 'hourly_unit_rate_usd'),
+            (col('NO-1'), 'no_1'),
+            (col('NO-2'), 'no_2'),
+            (col('NO-3'), 'no_3'),
+            (col('NO-10'), 'no_10'),
+            (col('İşveren-Hakediş Birim Fiyat'), 'isveren_birim_fiyat'),
+            (col('İşveren- Hakediş'), 'isveren_hakedis'),
+            (col('İşveren- Hakediş (USD)'), 'isveren_hakedis_usd'),
+            (col('İşveren-Hakediş Birim Fiyat\n(USD)', 'İşveren-Hakediş Birim Fiyat (USD)'),
+             'isveren_birim_fiyat_usd'),
+            (col('Control-1'), 'control_1'),
+            (col_tm_liste, 'tm_liste'),
+            (col('TM Kod'), 'tm_kod'),
+            (col('Konrol-1', 'Kontrol-1'), 'kontrol_1'),
+            (col_kontrol2, 'kontrol_2'),
+        ) if c
+    ]
+    # Cells the sheet already has for these take precedence over the formula
+    overridable = [(c, name, default) for c, name, default in (
+        (col_currency, 'currency', 'USD'),
+        (col_ap_cb_subcon, 'ap_cb_subcon', None),
+        (col_ls_unit_rate, 'ls_unit_rate', None),
+    ) if c]
+    targets = [name for _, name in formula_columns]
+    if col_tm_liste:
+        targets.append('has_tm_columns')
 
     print(f'[CALC] Filling empty cells for {len(result_df)} rows …')
 
-    for idx, row in result_df.iterrows():
-        person_id = safe_float(row.get('ID', 0))
-        scope     = safe_str(row.get('Scope', ''))
-        company   = safe_str(row.get('Company', ''))
-        projects  = safe_str(row.get('Projects', ''))
-        isveren_currency = safe_str(row.get('İşveren - Currency', '') or
-                                    row.get('İşveren-Currency', ''))
-
-        week_month_raw = (row.get('(Week / Month)', '') or
-                          row.get('(Week /\nMonth)', '') or
-                          row.get('Week / Month', '') or
-                          row.get('Week/Month', ''))
-        week_month = excel_date_to_string(week_month_raw) if week_month_raw else ''
-
-        total_mh        = safe_float(row.get('TOTAL MH', 0) or
-                                     row.get('TOTAL\n MH', 0) or
-                                     row.get('Total MH', 0))
-        kuzey_mh_person = safe_float(row.get('Kuzey MH-Person', 0))
-
-        # 1. North/South
-        if col_north_south:
-            set_if_empty(result_df, idx, col_north_south,
-                         xlookup(scope, info_df.iloc[:, 13], info_df.iloc[:, 16], ''))
-
-        # 2. Currency
-        currency = ('TL' if person_id == 905264 else
-                    xlookup(person_id, rates_df.iloc[:, 0], rates_df.iloc[:, 6], 'USD'))
-        if col_currency:
-            set_if_empty(result_df, idx, col_currency, currency)
-        currency = safe_str(result_df.at[idx, col_currency], 'USD') if col_currency else currency
-
-        # 3. AP-CB/Subcon
-        ap_cb_subcon = 'AP-CB' if 'AP-CB' in company.upper() else 'Subcon'
-        if col_ap_cb_subcon:
-            set_if_empty(result_df, idx, col_ap_cb_subcon, ap_cb_subcon)
-        ap_cb_subcon = safe_str(result_df.at[idx, col_ap_cb_subcon], ap_cb_subcon) if col_ap_cb_subcon else ap_cb_subcon
-
-        # 4. LS/Unit Rate
-        lumpsum = ('lumpsum' in scope.lower() if scope else False) or company in ('İ4', 'DEGENKOLB', 'Kilci Danışmanlık')
-        ls_unit_rate = 'Lumpsum' if lumpsum else 'Unit Rate'
-        if col_ls_unit_rate:
-            set_if_empty(result_df, idx, col_ls_unit_rate, ls_unit_rate)
-        ls_unit_rate = safe_str(result_df.at[idx, col_ls_unit_rate], ls_unit_rate) if col_ls_unit_rate else ls_unit_rate
-
-        # 5. Hourly Base Rate
-        if ap_cb_subcon == 'Subcon' and ls_unit_rate == 'Unit Rate':
-            hourly_base_rate = safe_float(xlookup(person_id, rates_df.iloc[:, 0], rates_df.iloc[:, 9], 0))
-        else:
-            hourly_base_rate = safe_float(xlookup(person_id, rates_df.iloc[:, 0], rates_df.iloc[:, 7], 0))
-        if col_hourly_base_rate:
-            set_if_empty(result_df, idx, col_hourly_base_rate, hourly_base_rate)
-
-        # 6. Hourly Additional Rate
-        if ls_unit_rate == 'Lumpsum' or company in ('AP-CB', 'AP-CB / pergel'):
-            hourly_add_rate = 0
-        else:
-            add_base = safe_float(xlookup(person_id, rates_df.iloc[:, 0], rates_df.iloc[:, 11], 0))
-            c_norm = currency.strip().upper()
-            if c_norm == 'USD':
-                hourly_add_rate = add_base
-            elif c_norm == 'TL':
-                tcmb = safe_float(xlookup(week_month, info_df.iloc[:, 20], info_df.iloc[:, 22], 1))
-                hourly_add_rate = add_base * tcmb
-            else:
-                hourly_add_rate = 0
-        if col_hourly_add_rate:
-            set_if_empty(result_df, idx, col_hourly_add_rate, hourly_add_rate)
-
-        # 7. Hourly Rate
-        hourly_rate = hourly_base_rate + hourly_add_rate
-        if col_hourly_rate:
-            set_if_empty(result_df, idx, col_hourly_rate, hourly_rate)
-
-        # 8. Cost
-        cost = hourly_rate * total_mh
-        if col_cost:
-            set_if_empty(result_df, idx, col_cost, cost)
-
-        # 9. General Total Cost (USD)
-        c_norm = currency.strip().upper()
-        if c_norm == 'TL':
-            r = safe_float(xlookup(week_month, info_df.iloc[:, 20], info_df.iloc[:, 22], 1))
-            gen_cost_usd = cost / r if r else 0
-        elif c_norm == 'EURO':
-            r = safe_float(xlookup(week_month, info_df.iloc[:, 20], info_df.iloc[:, 23], 1))
-            gen_cost_usd = cost * r
-        else:
-            gen_cost_usd = cost
-        if col_gen_cost_usd:
-            set_if_empty(result_df, idx, col_gen_cost_usd, gen_cost_usd)
-
-        # 10. Hourly Unit Rate (USD)
-        if col_hur_unit_usd:
-            set_if_empty(result_df, idx, col_hur_unit_usd,
-                         gen_cost_usd / total_mh if total_mh else 0)
-
-        # NO lookups
-        no_1  = xlookup(scope, info_df.iloc[:, 13], info_df.iloc[:, 9],  0)
-        no_2  = xlookup(scope, info_df.iloc[:, 13], info_df.iloc[:, 11], '')
-        no_3  = xlookup(scope, info_df.iloc[:, 13], info_df.iloc[:, 12], '')
-        no_10 = xlookup(no_1,  info_df.iloc[:, 9],  info_df.iloc[:, 10], '')
-        if col_no_1:  set_if_empty(result_df, idx, col_no_1,  no_1)
-        if col_no_2:  set_if_empty(result_df, idx, col_no_2,  no_2)
-        if col_no_3:  set_if_empty(result_df, idx, col_no_3,  no_3)
-        if col_no_10: set_if_empty(result_df, idx, col_no_10, no_10)
-
-        # İşveren birim fiyat
-        n1 = safe_float(no_1, 0)
-        n2 = safe_str(no_2, '')
-        if n2 in ('999-A', '999-C', '414-C') or n1 == 313:
-            isv_birim = hourly_rate
-        elif n1 in (312, 314, 316) or n2 == '360-T':
-            isv_birim = hourly_rate * 1.02
-        elif n2 == '517-A':
-            isv_birim = safe_float(xlookup(person_id, info_df.iloc[:, 28], info_df.iloc[:, 33], 0))
-        else:
-            if summary_df is not None:
-                isv_birim = (safe_float(xlookup(no_1, summary_df.iloc[:, 2], summary_df.iloc[:, 26], 0)) +
-                             safe_float(xlookup(no_2, summary_df.iloc[:, 2], summary_df.iloc[:, 26], 0)))
+    n = len(result_df)
+    row_dtype = _row_dtype(result_df)
+    sheets = _reference_sheets(info_df, rates_df, summary_df, cached=False)
+    filled = {}   # column → _FilledColumn
+
+    def fill(column, rows, values, mask=None, empty=_is_empty):
+        if column not in filled:
+            filled[column] = _FilledColumn(result_df[column])
+        return filled[column].fill(rows, values, mask, empty)
+
+    for start in range(0, n, chunk_size):
+        rows = slice(start, min(start + chunk_size, n))
+        chunk = result_df.iloc[rows]
+        m = len(chunk)
+
+        def column(name, default):
+            # Cell values as a per-row loop over iterrows() would see them
+            if name and name in chunk.columns:
+                return chunk[name].to_numpy(dtype=row_dtype)
+            return np.full(m, default, dtype=object)
+
+        values = {
+            'person_id': _floats(column('ID', 0)),
+            'scope': _objects([safe_str(v) for v in column('Scope', '')]),
+            'company': _objects([safe_str(v) for v in column('Company', '')]),
+            'projects': _objects([safe_str(v) for v in column('Projects', '')]),
+            'week_month': _week_strings(column(col_week_month, '')),
+            'isveren_currency': _objects([safe_str(a or b) for a, b in zip(
+                column('İşveren - Currency', ''), column('İşveren-Currency', ''))]),
+            'total_mh': _floats(column(col_total_mh, 0)),
+            'kuzey_mh_person': _floats(column('Kuzey MH-Person', 0)),
+        }
+
+        # Currency / AP-CB/Subcon / LS/Unit Rate: fill, then continue with the cell values
+        FORMULA_RULES.evaluate_arrays(values, sheets, m, targets=[name for _, name, _ in overridable])
+        for c, name, default in overridable:
+            stored = fill(c, rows, values[name])
+            values[name] = _objects([safe_str(v, d if default is None else default)
+                                     for v, d in zip(stored, values[name])])
+
+        FORMULA_RULES.evaluate_arrays(values, sheets, m, targets=targets,
+                                      changed=[name for _, name, _ in overridable])
+
+        for c, name in formula_columns:
+            if name == 'tm_liste':
+                # Info sheet without the TM columns: leave the cells alone
+                fill(c, rows, values[name], mask=values['has_tm_columns'])
+            elif name == 'kontrol_2':
+                fill(c, rows, np.where(values[name], 'TRUE', 'FALSE').astype(object),
+                     empty=_kontrol2_blank)
             else:
-                isv_birim = 0
-        if col_isv_birim:
-            set_if_empty(result_df, idx, col_isv_birim, isv_birim)
-
-        isv_hakedis = kuzey_mh_person * isv_birim if kuzey_mh_person > 0 else isv_birim * total_mh
-        if col_isv_hakedis:
-            set_if_empty(result_df, idx, col_isv_hakedis, isv_hakedis)
-
-        if isveren_currency == 'EURO':
-            eur_r = safe_float(xlookup(week_month, info_df.iloc[:, 20], info_df.iloc[:, 23], 1))
-            isv_hakedis_usd = isv_hakedis * eur_r
-        else:
-            isv_hakedis_usd = isv_hakedis
-        if col_isv_hakedis_usd:
-            set_if_empty(result_df, idx, col_isv_hakedis_usd, isv_hakedis_usd)
-
-        denom = kuzey_mh_person if kuzey_mh_person > 0 else total_mh
-        if col_isv_birim_usd:
-            set_if_empty(result_df, idx, col_isv_birim_usd,
-                         isv_hakedis_usd / denom if denom else 0)
-
-        # Control/TM
-        if col_ctrl1:
-            set_if_empty(result_df, idx, col_ctrl1,
-                         xlookup(projects, info_df.iloc[:, 14], info_df.iloc[:, 18], ''))
-        if col_tm_liste:
-            try:
-                set_if_empty(result_df, idx, col_tm_liste,
-                             xlookup(person_id, info_df.iloc[:, 58], info_df.iloc[:, 60], ''))
-            except Exception:
-                pass
-        if col_tm_kod:
-            set_if_empty(result_df, idx, col_tm_kod,
-                         xlookup(projects, info_df.iloc[:, 14], info_df.iloc[:, 17], ''))
-
-        if col_kontrol1:
-            k1 = xlookup(projects, info_df.iloc[:, 14], info_df.iloc[:, 9], '')
-            set_if_empty(result_df, idx, col_kontrol1, k1)
-        else:
-            k1 = ''
-
-        if col_kontrol2:
-            k2 = 'TRUE' if no_1 == k1 else 'FALSE'
-            cur_k2 = result_df.at[idx, col_kontrol2]
-            if (pd.isna(cur_k2) or cur_k2 in (0, 0.0, 1, 1.0) or
-                    (isinstance(cur_k2, str) and cur_k2.strip() == '')):
-                if result_df[col_kontrol2].dtype in ('float64', 'int64'):
-                    result_df[col_kontrol2] = result_df[col_kontrol2].astype(object)
-                result_df.at[idx, col_kontrol2] = k2
-
-    print(f'[CALC] Finished filling empty cells.')
+                fill(c, rows, values[name])
+
+    for column, values in filled.items():
+        result_df[column] = values.result()
+
+    print('[CALC] Finished filling empty cells.')
     return result_df
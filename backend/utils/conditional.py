@@ -0,0 +1,90 @@
+"""
+Conditional GET for the read endpoints.
+
+Pages re-fetch the dashboard, Excel-data and hakedis lists every time they
+mount, and each request used to reload and re-aggregate the records even
+though nothing had changed. @conditional_get() tags a GET response with a weak
+ETag computed, before the view runs, from
+
+  * the endpoint and its query args
+  * who is asking (Authorization header, session user), so a tag never
+    validates a copy fetched by another user
+  * the record data generation (utils.record_store)
+  * the uploaded reference files (name, size and mtime of every file in uploads/)
+  * any extra version sources the route depends on, e.g. table_version(User)
+
+A request whose If-None-Match carries the current tag gets 304 Not Modified
+without any record loading. Responses say Cache-Control: private, no-cache, so
+the browser revalidates every time and keeps serving its copy on 304, and
+Vary: Authorization, Cookie.
+"""
+
+import hashlib
+import os
+from functools import wraps
+
+from flask import current_app, request, session
+from sqlalchemy import func
+
+from models import db
+from utils.record_store import current_generation
+
+
+UPLOAD_DIR = os.path.join(os.path.dirname(__file__), '..', 'uploads')
+CACHE_CONTROL = 'private, no-cache'
+VARY = ('Authorization', 'Cookie')
+
+
+def reference_files_version(directory=None):
+    """(name, size, mtime_ns) of every uploaded file, sorted by name."""
+    try:
+        entries = [(e.name, e.stat().st_size, e.stat().st_mtime_ns)
+                   for e in os.scandir(directory or UPLOAD_DIR) if e.is_file()]
+    except FileNotFoundError:
+        return []
+    return sorted(entries)
+
+
+def table_version(*models):
+    """Version source for routes reading other tables: row count, max id and last update per model."""
+    def version():
+        return [tuple(db.session.query(func.count(m.id), func.max(m.id), func.max(m.updated_at)).one())
+                for m in models]
+    return version
+
+
+def _identity():
+    """The credentials of the request (bearer token, session user); only ever hashed."""
+    return request.headers.get('Authorization', ''), session.get('user_id'), session.get('role')
+
+
+def _etag(versions):
+    parts = [
+        request.endpoint,
+        sorted(request.args.items(multi=True)),
+        _identity(),
+        current_generation(),
+        reference_files_version(),
+        [version() for version in versions],
+    ]
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def conditional_get(*versions):
+    """Weak-ETag the view's responses and answer a matching If-None-Match with 304 (place below auth decorators)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = _etag(versions)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = CACHE_CONTROL
+            response.vary.update(VARY)
+            return response
+        return wrapper
+    return decorator
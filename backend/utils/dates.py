@@ -0,0 +1,83 @@
+"""
+Canonical parser for the DATABASE sheet's (Week / Month) values.
+
+Used once per record at import (models.database_record stores the result in
+work_date / work_year / work_month / work_week) and by the few readers that
+still work on raw rows, so every code path agrees on what a date cell means.
+"""
+
+import re
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+
+
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+# Serial numbers outside this range are not treated as Excel dates (1954–2119)
+_SERIAL_MIN, _SERIAL_MAX = 20000, 80000
+
+# Tried in order; day-first before month-first, as in the source workbooks
+_FORMATS = (
+    ('%d/%b/%Y', 11),   # 01/Dec/2024
+    ('%d/%B/%Y', 20),   # 01/December/2024
+    ('%Y-%m-%d', 10),   # 2024-12-01, 2024-12-01T00:00:00, 2024-12-01 00:00:00
+    ('%Y/%m/%d', 10),
+    ('%d.%m.%Y', 10),
+    ('%d/%m/%Y', 10),
+    ('%d-%m-%Y', 10),
+    ('%m/%d/%Y', 10),
+)
+
+_YEAR_RE = re.compile(r'(\d{4})')
+
+
+def _from_serial(n):
+    if _SERIAL_MIN <= n <= _SERIAL_MAX:
+        return _EXCEL_EPOCH + timedelta(days=int(n))
+    return None
+
+
+@lru_cache(maxsize=8192)
+def _parse_text(s):
+    for fmt, width in _FORMATS:
+        try:
+            return datetime.strptime(s[:width].strip(), fmt).date()
+        except ValueError:
+            continue
+    try:
+        return _from_serial(float(s))
+    except ValueError:
+        return None
+
+
+def parse_work_date(value):
+    """Parse a (Week / Month) cell → datetime.date, or None when it is empty/unparseable."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):              # includes pandas Timestamp / NaT
+        return value.date() if value == value else None
+    if isinstance(value, date):
+        return value
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return _from_serial(value) if value == value else None
+    s = str(value).strip()
+    if not s or s in ('nan', 'NaT', 'None'):
+        return None
+    return _parse_text(s)
+
+
+def work_period(value):
+    """
+    (work_date, year, month, iso_week) for a (Week / Month) cell.
+    When no full date can be parsed, a four-digit year in the text is still returned.
+    """
+    d = parse_work_date(value)
+    if d is not None:
+        return d, d.year, d.month, d.isocalendar()[1]
+    if isinstance(value, str):
+        m = _YEAR_RE.search(value)
+        if m:
+            return None, int(m.group(1)), None, None
+    return None, None, None, None
@@ -9,7 +9,11 @@ from models import db
 from models.database_record import DatabaseRecord
 from models.employee_info import EmployeeInfo
 from models.hourly_rate import HourlyRate
-import json
+from utils.schema import WEEK_MONTH, TOTAL_MH, GENERAL_TOTAL_COST_USD, normalize_columns
+from utils.dates import parse_work_date
+from utils.bulk_loader import bulk_insert_records, sync_records
+from utils.record_store import bump_generation
+from utils.sheet_snapshots import read_sheet
 
 class ExcelDataService:
     def __init__(self):
@@ -37,14 +41,16 @@ class ExcelDataService:
                 print(f"[WARNING] Excel file not found: {filepath}")
                 return {}
             
-            xls = pd.ExcelFile(filepath, engine=self.engine)
-            
+            # Parsed once per workbook content, then read from Parquet snapshots
             cache = {
-                'database': pd.read_excel(xls, 'DATABASE', engine=self.engine),
-                'info': pd.read_excel(xls, 'Info', engine=self.engine),
-                'hourly_rates': pd.read_excel(xls, 'Hourly Rates', engine=self.engine)
+                'database': read_sheet(filepath, 'DATABASE', engine=self.engine),
+                'info': read_sheet(filepath, 'Info', engine=self.engine),
+                'hourly_rates': read_sheet(filepath, 'Hourly Rates', engine=self.engine)
             }
             
+            # One spelling per DATABASE column (see utils.schema)
+            cache['database'] = normalize_columns(cache['database'])
+
             # Clean data
             for sheet_name, df in cache.items():
                 # Replace NaN with None/empty strings
@@ -157,8 +163,8 @@ class ExcelDataService:
         
         # Calculate statistics
         total_records = len(records)
-        total_cost = sum(float(r.get('General Total\n Cost (USD)', 0) or 0) for r in records)
-        total_hours = sum(float(r.get('TOTAL\n MH', 0) or 0) for r in records)
+        total_cost = sum(float(r.get(GENERAL_TOTAL_COST_USD, 0) or 0) for r in records)
+        total_hours = sum(float(r.get(TOTAL_MH, 0) or 0) for r in records)
         
         # Get unique values
         projects = list(set(r.get('Projects', '') for r in records if r.get('Projects')))
@@ -181,41 +187,36 @@ class ExcelDataService:
         monthly_data = [0] * 12
         
         for record in records:
-            date_str = record.get('(Week / \nMonth)') or ''
-            cost = float(record.get('General Total\n Cost (USD)', 0) or 0)
+            date_str = record.get(WEEK_MONTH) or ''
+            cost = float(record.get(GENERAL_TOTAL_COST_USD, 0) or 0)
             
             if date_str and cost:
-                try:
-                    # Try to parse the date and extract month/year
-                    for fmt in ("%Y-%m-%d", "%d.%m.%Y", "%Y/%m/%d", "%d/%m/%Y"):
-                        try:
-                            dt = datetime.strptime(str(date_str)[:10], fmt)
-                            if dt.year == year:
-                                monthly_data[dt.month - 1] += cost
-                            break
-                        except:
-                            continue
-                except:
-                    continue
+                dt = parse_work_date(date_str)
+                if dt and dt.year == year:
+                    monthly_data[dt.month - 1] += cost
         
         return monthly_data
     
-    def sync_to_database(self):
-        """Sync Excel data to database tables"""
+    def sync_to_database(self, mode='full'):
+        """
+        Sync Excel data to database tables.
+
+        mode='full' replaces every DATABASE row; mode='incremental' writes only
+        the rows that changed (see utils.bulk_loader.sync_records).
+        """
         try:
-            # Clear existing data
-            DatabaseRecord.query.delete()
-            
             # Get all database records
             records = self.get_all_database_records()
+            rows = (DatabaseRecord.row_values(record, record.get('Name Surname', ''))
+                    for record in records)
             
-            for record in records:
-                # Create database record entry
-                db_record = DatabaseRecord(
-                    personel=record.get('Name Surname', ''),
-                    data=json.dumps(record)
-                )
-                db.session.add(db_record)
+            if mode == 'full':
+                # Clear existing data
+                DatabaseRecord.query.delete()
+                bulk_insert_records(rows)
+            else:
+                sync_records(rows)
+            bump_generation()
             
             # Sync employee info
             employee_data = self.get_employee_info()
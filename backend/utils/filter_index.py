@@ -0,0 +1,100 @@
+"""
+Inverted index over the record frame, for filters and cascading filter options.
+
+The analytics filter bar asks on every change which values of each of its
+dimensions remain under the other active filters, and how many records carry
+each. FilterIndex answers that without touching the records:
+
+  * per dimension (a tuple of record fields, see RecordFrame.dimension) the
+    positions of the records carrying each value, grouped by value: the
+    compressed form of one bitmap per value
+  * a filter ("any of these values") is the union of its values' positions,
+    held as a packed bitmap (one bit per record)
+  * several filters combine by AND-ing their bitmaps, and the per-value counts
+    under a bitmap are a bincount of the value codes at its set bits
+
+It is built once per data generation with the frame, and dimensions are
+indexed on first use.
+"""
+
+import threading
+
+import numpy as np
+
+from utils.record_frame import RecordFrame
+from utils.record_store import get_snapshot
+
+
+class _Postings:
+    """Record positions per value of one dimension (values are the frame's categories)."""
+
+    def __init__(self, series):
+        self.values = series.cat.categories.to_numpy(dtype=object)
+        self.codes = series.cat.codes.to_numpy()
+        self.totals = np.bincount(self.codes, minlength=len(self.values))
+        self.order = np.argsort(self.codes, kind='stable').astype(np.int32)
+        self.starts = np.concatenate(([0], np.cumsum(self.totals)[:-1])).astype(np.int64)
+        self.upper = {}   # upper-cased value → codes, filters match case-insensitively
+        for code, value in enumerate(self.values):
+            self.upper.setdefault(value.upper(), []).append(code)
+
+    def positions(self, code):
+        start = self.starts[code]
+        return self.order[start:start + self.totals[code]]
+
+
+class FilterIndex:
+    """Inverted index over one RecordFrame (see module docstring)."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.size = len(frame)
+        self._postings = {}
+        self._lock = threading.Lock()
+
+    def postings(self, fields):
+        entry = self._postings.get(fields)
+        if entry is None:
+            entry = _Postings(self.frame.dimension(*fields))
+            with self._lock:
+                entry = self._postings.setdefault(fields, entry)
+        return entry
+
+    def bitmap(self, fields, values):
+        """Packed bitmap of the records whose *fields* value is one of *values* (case-insensitive)."""
+        postings = self.postings(fields)
+        bits = np.zeros(self.size, dtype=bool)
+        for wanted in {str(v).strip().upper() for v in values if v}:
+            for code in postings.upper.get(wanted, ()):
+                bits[postings.positions(code)] = True
+        return np.packbits(bits, bitorder='little')
+
+    @staticmethod
+    def intersect(bitmaps):
+        """AND of packed bitmaps; None (every record) for no bitmaps."""
+        bitmaps = list(bitmaps)
+        if not bitmaps:
+            return None
+        return np.bitwise_and.reduce(bitmaps) if len(bitmaps) > 1 else bitmaps[0]
+
+    def mask(self, bitmap):
+        """Boolean mask of a packed bitmap (None → every record)."""
+        if bitmap is None:
+            return np.ones(self.size, dtype=bool)
+        return np.unpackbits(bitmap, count=self.size, bitorder='little').view(bool)
+
+    def counts(self, fields, bitmap=None):
+        """[(value, records)] of the non-empty *fields* values present under *bitmap*, sorted by value."""
+        postings = self.postings(fields)
+        if bitmap is None:
+            totals = postings.totals
+        else:
+            totals = np.bincount(postings.codes[self.mask(bitmap)], minlength=len(postings.values))
+        return [(value, int(n)) for value, n in zip(postings.values, totals) if n and value]
+
+
+def get_filter_index():
+    """FilterIndex of the current store snapshot (built once per data generation)."""
+    snapshot = get_snapshot()
+    frame = snapshot.derived('frame', RecordFrame)
+    return snapshot.derived('filter_index', lambda _: FilterIndex(frame))
@@ -0,0 +1,765 @@
+"""
+Declarative definition of the DATABASE-sheet formulas.
+
+The Excel-equivalent formulas used to be hand-coded twice (calculate_auto_fields
+and fill_empty_cells_with_formulas) and had drifted apart. Here every formula
+is a Rule: an output name and an expression tree built from a few node types
+
+    Ref / constants       inputs, other rules' values, literals
+    Lookup                XLOOKUP against a reference sheet ('info', 'rates', 'summary')
+    Case                  first matching branch (IF / IFS)
+    Eq, Ne, Gt, In, And, Or, Contains, Lower, Upper, Str, Float, Add, Mul, Div
+
+RuleSet compiles the rules once into a scalar evaluator (one record, values in
+a dict) and a vectorised one (NumPy arrays, one element per record) with the
+same semantics, orders them by their dependencies (a DAG, cycles rejected) and
+evaluates only what is asked for:
+  * targets   only the rules the requested outputs depend on
+  * changed   rules downstream of values that were replaced (e.g. by cells the
+              user already filled in); everything else is reused
+Time spent per rule is accumulated and reported by RuleSet.timings().
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from utils.calculations import lookup_index, safe_float, safe_str
+
+
+# ---------------------------------------------------------------------------
+# Expression nodes
+# ---------------------------------------------------------------------------
+
+def _node(value):
+    return value if isinstance(value, Expr) else Const(value)
+
+
+def _full(value, n):
+    """Broadcast a scalar produced by the vectorised evaluator to an array of n."""
+    if isinstance(value, np.ndarray):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return np.full(n, bool(value), dtype=bool)
+    if isinstance(value, float):
+        return np.full(n, value, dtype=float)
+    out = np.empty(n, dtype=object)
+    out[:] = [value] * n
+    return out
+
+
+def _mask(value, n):
+    if isinstance(value, np.ndarray):
+        return value.astype(bool, copy=False)
+    return np.full(n, bool(value), dtype=bool)
+
+
+def _numbers(value):
+    """Operand of vectorised arithmetic: object arrays (int 0 / float mixes) become float64."""
+    if isinstance(value, np.ndarray) and value.dtype != float:
+        return value.astype(float)
+    return value
+
+
+class Expr:
+    """Expression node. scalar()/vector() return the compiled evaluators."""
+
+    children = ()
+
+    def refs(self):
+        names = set()
+        for child in self.children:
+            names |= child.refs()
+        return names
+
+    def lookups(self):
+        found = []
+        for child in self.children:
+            found += child.lookups()
+        return found
+
+    def scalar(self):
+        """fn(values, sheets) → value for one record."""
+        raise NotImplementedError
+
+    def vector(self):
+        """fn(values, sheets, n) → ndarray of n values (or a scalar, broadcast by the consumer)."""
+        raise NotImplementedError
+
+
+class Const(Expr):
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        value = self.value
+        return lambda values, sheets: value
+
+    def vector(self):
+        value = self.value
+        return lambda values, sheets, n: value
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+class Ref(Expr):
+    """Value of an input or of another rule."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def refs(self):
+        return {self.name}
+
+    def scalar(self):
+        name = self.name
+        return lambda values, sheets: values[name]
+
+    def vector(self):
+        name = self.name
+        return lambda values, sheets, n: values[name]
+
+    def __repr__(self):
+        return self.name
+
+
+class Lookup(Expr):
+    """
+    XLOOKUP(key, sheet[key_col], sheet[return_col], default) over a reference sheet.
+    When the lookup itself fails (sheet missing, too few columns) the value is
+    on_error, or the exception propagates if on_error is not given.
+    """
+
+    _RAISE = object()
+
+    def __init__(self, sheet, key_col, return_col, key, default, on_error=_RAISE):
+        self.sheet = sheet
+        self.key_col = key_col
+        self.return_col = return_col
+        self.key = _node(key)
+        self.default = default
+        self.on_error = on_error
+        self.children = (self.key,)
+
+    def lookups(self):
+        return [self] + self.key.lookups()
+
+    def scalar(self):
+        key = self.key.scalar()
+        sheet, key_col, return_col = self.sheet, self.key_col, self.return_col
+        default, on_error = self.default, self.on_error
+
+        def run(values, sheets):
+            try:
+                index = lookup_index(sheets[sheet], key_col, return_col)
+            except Exception:
+                if on_error is Lookup._RAISE:
+                    raise
+                return on_error
+            return index.get(key(values, sheets), default)
+        return run
+
+    def vector(self):
+        key = self.key.vector()
+        sheet, key_col, return_col = self.sheet, self.key_col, self.return_col
+        default, on_error = self.default, self.on_error
+
+        def run(values, sheets, n):
+            try:
+                index = lookup_index(sheets[sheet], key_col, return_col)
+            except Exception:
+                if on_error is Lookup._RAISE:
+                    raise
+                return _full(on_error, n)
+            return index.get_many(_full(key(values, sheets, n), n), default)
+        return run
+
+    def __repr__(self):
+        return f'XLOOKUP({self.key!r}, {self.sheet}[{self.key_col}], {self.sheet}[{self.return_col}])'
+
+
+class Loaded(Expr):
+    """True when the reference sheet is available (and has the given positional columns)."""
+
+    def __init__(self, sheet, columns=()):
+        self.sheet = sheet
+        self.width = max(columns, default=-1) + 1
+
+    def _test(self, sheets):
+        df = sheets.get(self.sheet)
+        return df is not None and df.shape[1] >= self.width
+
+    def scalar(self):
+        return lambda values, sheets: self._test(sheets)
+
+    def vector(self):
+        return lambda values, sheets, n: self._test(sheets)
+
+
+class _Unary(Expr):
+    """Element-wise function of one operand (applied per element when vectorised)."""
+
+    def __init__(self, operand):
+        self.operand = _node(operand)
+        self.children = (self.operand,)
+
+    def apply(self, value):
+        raise NotImplementedError
+
+    def scalar(self):
+        operand, apply = self.operand.scalar(), self.apply
+        return lambda values, sheets: apply(operand(values, sheets))
+
+    def vector(self):
+        operand, apply = self.operand.vector(), self.apply
+
+        def run(values, sheets, n):
+            value = operand(values, sheets, n)
+            if not isinstance(value, np.ndarray):
+                return apply(value)
+            out = np.empty(len(value), dtype=object)
+            out[:] = [apply(v) for v in value]
+            return out
+        return run
+
+
+class Str(_Unary):
+    """safe_str (stripped text, '' for empty/NaN)."""
+
+    def apply(self, value):
+        return safe_str(value)
+
+
+class Lower(_Unary):
+    def apply(self, value):
+        return value.lower()
+
+
+class Upper(_Unary):
+    def apply(self, value):
+        return value.upper()
+
+
+class Float(_Unary):
+    """safe_float (0.0 for empty/NaN/non-numeric)."""
+
+    def apply(self, value):
+        return safe_float(value)
+
+    def vector(self):
+        operand = self.operand.vector()
+
+        def run(values, sheets, n):
+            value = operand(values, sheets, n)
+            if not isinstance(value, np.ndarray):
+                return safe_float(value)
+            if value.dtype == float:
+                return np.where(np.isnan(value), 0.0, value)
+            return np.fromiter((safe_float(v) for v in value), dtype=float, count=len(value))
+        return run
+
+
+class _Predicate(Expr):
+    """Boolean test; vectorised it yields a bool array."""
+
+    def __init__(self, left, right):
+        self.left = _node(left)
+        self.right = _node(right)
+        self.children = (self.left, self.right)
+
+    def test(self, left, right):
+        raise NotImplementedError
+
+    def scalar(self):
+        left, right, test = self.left.scalar(), self.right.scalar(), self.test
+        return lambda values, sheets: bool(test(left(values, sheets), right(values, sheets)))
+
+    def vector(self):
+        left, right, test = self.left.vector(), self.right.vector(), self.test
+
+        def run(values, sheets, n):
+            result = test(left(values, sheets, n), right(values, sheets, n))
+            return _mask(result, n)
+        return run
+
+
+class Eq(_Predicate):
+    def test(self, left, right):
+        return left == right
+
+
+class Ne(_Predicate):
+    def test(self, left, right):
+        return left != right
+
+
+class Gt(_Predicate):
+    def test(self, left, right):
+        return left > right
+
+
+class _Membership(Expr):
+    """Per-element Python membership test (`needle in value` / `value in choices`)."""
+
+    def __init__(self, operand, other):
+        self.operand = _node(operand)
+        self.other = other
+        self.children = (self.operand,)
+
+    def test(self, value):
+        raise NotImplementedError
+
+    def scalar(self):
+        operand, test = self.operand.scalar(), self.test
+        return lambda values, sheets: test(operand(values, sheets))
+
+    def vector(self):
+        operand, test = self.operand.vector(), self.test
+
+        def run(values, sheets, n):
+            value = operand(values, sheets, n)
+            if not isinstance(value, np.ndarray):
+                return _mask(test(value), n)
+            return np.fromiter((test(v) for v in value), dtype=bool, count=len(value))
+        return run
+
+
+class In(_Membership):
+    """operand in choices."""
+
+    def test(self, value):
+        return value in self.other
+
+
+class Contains(_Membership):
+    """needle in operand (substring)."""
+
+    def test(self, value):
+        return self.other in value
+
+
+class _Logical(Expr):
+    def __init__(self, *operands):
+        self.children = tuple(_node(o) for o in operands)
+
+
+class And(_Logical):
+    def scalar(self):
+        operands = [c.scalar() for c in self.children]
+        return lambda values, sheets: all(o(values, sheets) for o in operands)
+
+    def vector(self):
+        operands = [c.vector() for c in self.children]
+
+        def run(values, sheets, n):
+            result = np.ones(n, dtype=bool)
+            for o in operands:
+                result &= _mask(o(values, sheets, n), n)
+            return result
+        return run
+
+
+class Or(_Logical):
+    def scalar(self):
+        operands = [c.scalar() for c in self.children]
+        return lambda values, sheets: any(o(values, sheets) for o in operands)
+
+    def vector(self):
+        operands = [c.vector() for c in self.children]
+
+        def run(values, sheets, n):
+            result = np.zeros(n, dtype=bool)
+            for o in operands:
+                result |= _mask(o(values, sheets, n), n)
+            return result
+        return run
+
+
+class _Arithmetic(Expr):
+    """
+    Binary arithmetic. Scalar evaluation uses plain Python operators; vectorised
+    operands are converted to float64 (every formula has a float operand, so the
+    scalar result is a float as well).
+    """
+
+    def __init__(self, left, right):
+        self.left = _node(left)
+        self.right = _node(right)
+        self.children = (self.left, self.right)
+
+    @staticmethod
+    def op(left, right):
+        raise NotImplementedError
+
+    def scalar(self):
+        left, right, op = self.left.scalar(), self.right.scalar(), self.op
+        return lambda values, sheets: op(left(values, sheets), right(values, sheets))
+
+    def vector(self):
+        left, right, op = self.left.vector(), self.right.vector(), self.op
+
+        def run(values, sheets, n):
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                return op(_numbers(left(values, sheets, n)), _numbers(right(values, sheets, n)))
+        return run
+
+
+class Add(_Arithmetic):
+    op = staticmethod(lambda a, b: a + b)
+
+
+class Mul(_Arithmetic):
+    op = staticmethod(lambda a, b: a * b)
+
+
+class Div(_Arithmetic):
+    """a / b; guard zero divisors with a Case (the scalar evaluator raises on them)."""
+    op = staticmethod(lambda a, b: a / b)
+
+
+class Case(Expr):
+    """
+    Case((condition, value), ..., default=value): the value of the first branch
+    whose condition holds. Vectorised, a branch value is only evaluated when at
+    least one row takes that branch; int constants (the formulas' 0 results)
+    keep the result an object array so they stay ints as in the scalar path.
+    """
+
+    def __init__(self, *branches, default):
+        self.branches = [(_node(c), _node(v)) for c, v in branches]
+        self.default = _node(default)
+        self.children = tuple(e for branch in self.branches for e in branch) + (self.default,)
+
+    def scalar(self):
+        branches = [(c.scalar(), v.scalar()) for c, v in self.branches]
+        default = self.default.scalar()
+
+        def run(values, sheets):
+            for condition, value in branches:
+                if condition(values, sheets):
+                    return value(values, sheets)
+            return default(values, sheets)
+        return run
+
+    def vector(self):
+        branches = [(c.vector(), v.vector()) for c, v in self.branches]
+        default = self.default.vector()
+
+        def run(values, sheets, n):
+            remaining = np.ones(n, dtype=bool)
+            parts = []
+            for condition, value in branches:
+                hit = remaining & _mask(condition(values, sheets, n), n)
+                if hit.any():
+                    parts.append((hit, value(values, sheets, n)))
+                    remaining &= ~hit
+                    if not remaining.any():
+                        break
+            if remaining.any():
+                parts.append((remaining, default(values, sheets, n)))
+            return _merge(parts, n)
+        return run
+
+
+def _merge(parts, n):
+    """Assemble a Case result from (mask, value) parts, keeping float64 when every part is float."""
+    if len(parts) == 1 and isinstance(parts[0][1], np.ndarray) and parts[0][0].all():
+        return parts[0][1]
+
+    def is_float(v):
+        return (v.dtype == float) if isinstance(v, np.ndarray) else isinstance(v, float)
+
+    out = np.zeros(n) if all(is_float(v) for _, v in parts) else np.empty(n, dtype=object)
+    for mask, value in parts:
+        out[mask] = value[mask] if isinstance(value, np.ndarray) else value
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Rules and the compiled rule set
+# ---------------------------------------------------------------------------
+
+class Rule:
+    def __init__(self, name, expr, description=''):
+        self.name = name
+        self.expr = _node(expr)
+        self.description = description
+
+
+class RuleSet:
+    """
+    Compiled rules over the given input names. Both evaluators take a dict of
+    values (inputs, plus any rule values already known) and add the computed
+    rule values to it.
+    """
+
+    def __init__(self, inputs, rules):
+        self.inputs = tuple(inputs)
+        self.rules = {}
+        for rule in rules:
+            if rule.name in self.rules or rule.name in self.inputs:
+                raise ValueError(f'Duplicate formula name: {rule.name}')
+            self.rules[rule.name] = rule
+
+        self.depends = {name: rule.expr.refs() for name, rule in self.rules.items()}
+        known = set(self.inputs) | set(self.rules)
+        for name, refs in self.depends.items():
+            unknown = refs - known
+            if unknown:
+                raise ValueError(f'Formula {name} refers to unknown values: {sorted(unknown)}')
+        self.order = self._topological_order()
+
+        self.dependents = {name: set() for name in known}
+        for name, refs in self.depends.items():
+            for ref in refs:
+                self.dependents[ref].add(name)
+
+        self._scalar = {name: rule.expr.scalar() for name, rule in self.rules.items()}
+        self._vector = {name: rule.expr.vector() for name, rule in self.rules.items()}
+        self._plans = {}
+        self._downstream = {}
+        self._timings = {name: [0, 0, 0.0] for name in self.rules}   # calls, rows, seconds
+        self._timings_lock = threading.Lock()
+
+    def _topological_order(self):
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == 'done' or name not in self.rules:
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f'Formula cycle: {" → ".join(path + [name])}')
+            state[name] = 'visiting'
+            for ref in sorted(self.depends[name]):
+                visit(ref, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.rules:
+            visit(name, [])
+        return order
+
+    # ---- dependency queries ----------------------------------------------
+
+    def requires(self, targets=None):
+        """Rules needed to compute *targets* (all rules if None), in evaluation order."""
+        key = None if targets is None else frozenset(targets)
+        plan = self._plans.get(key)
+        if plan is None:
+            if key is None:
+                plan = tuple(self.order)
+            else:
+                needed, stack = set(), [t for t in key if t in self.rules]
+                while stack:
+                    name = stack.pop()
+                    if name not in needed:
+                        needed.add(name)
+                        stack.extend(r for r in self.depends[name] if r in self.rules)
+                plan = tuple(name for name in self.order if name in needed)
+            self._plans[key] = plan
+        return plan
+
+    def downstream(self, names):
+        """Rules whose value (transitively) depends on any of *names*."""
+        key = frozenset(names)
+        found = self._downstream.get(key)
+        if found is None:
+            found, stack = set(), list(key)
+            while stack:
+                for dependent in self.dependents.get(stack.pop(), ()):
+                    if dependent not in found:
+                        found.add(dependent)
+                        stack.append(dependent)
+            found = self._downstream[key] = frozenset(found)
+        return found
+
+    def lookups_by_input(self):
+        """
+        {input: [Lookup, ...]}: every XLOOKUP grouped by the single input its key is
+        derived from. Raises ValueError for a lookup keyed on several inputs.
+        """
+        groups = {name: [] for name in self.inputs}
+        for name in self.order:
+            for lookup in self.rules[name].expr.lookups():
+                sources = self._inputs_of(lookup.key.refs())
+                if len(sources) > 1:
+                    raise ValueError(f'{lookup!r} in {name} depends on several inputs: {sorted(sources)}')
+                for source in sources:
+                    groups[source].append(lookup)
+        return groups
+
+    def _inputs_of(self, names):
+        sources, stack, seen = set(), list(names), set()
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            if name in self.rules:
+                stack.extend(self.depends[name])
+            else:
+                sources.add(name)
+        return sources
+
+    # ---- evaluation --------------------------------------------------------
+
+    def _pending(self, values, targets, changed):
+        dirty = self.downstream(changed) if changed else ()
+        return [name for name in self.requires(targets) if name not in values or name in dirty]
+
+    def evaluate(self, values, sheets, targets=None, changed=()):
+        """Scalar evaluation for one record; values holds plain Python values."""
+        spent = []
+        for name in self._pending(values, targets, changed):
+            started = time.perf_counter()
+            values[name] = self._scalar[name](values, sheets)
+            spent.append((name, time.perf_counter() - started))
+        self._record(spent, 1)
+        return values
+
+    def evaluate_arrays(self, values, sheets, n, targets=None, changed=()):
+        """Vectorised evaluation; values holds arrays of n elements (one per record)."""
+        spent = []
+        for name in self._pending(values, targets, changed):
+            started = time.perf_counter()
+            values[name] = _full(self._vector[name](values, sheets, n), n)
+            spent.append((name, time.perf_counter() - started))
+        self._record(spent, n)
+        return values
+
+    # ---- timing --------------------------------------------------------------
+
+    def _record(self, spent, rows):
+        with self._timings_lock:
+            for name, seconds in spent:
+                timing = self._timings[name]
+                timing[0] += 1
+                timing[1] += rows
+                timing[2] += seconds
+
+    def timings(self):
+        """Per-formula evaluation counts and time since the last reset, slowest first."""
+        with self._timings_lock:
+            rows = [{'formula': name, 'calls': calls, 'rows': count,
+                     'seconds': round(seconds, 4),
+                     'us_per_row': round(seconds / count * 1e6, 2) if count else None}
+                    for name, (calls, count, seconds) in self._timings.items()]
+        return sorted(rows, key=lambda r: r['seconds'], reverse=True)
+
+    def reset_timings(self):
+        with self._timings_lock:
+            for timing in self._timings.values():
+                timing[:] = [0, 0, 0.0]
+
+
+# ---------------------------------------------------------------------------
+# The DATABASE-sheet formulas
+# ---------------------------------------------------------------------------
+
+# Inputs, extracted from a record by calculations._record_inputs / _frame_inputs
+FORMULA_INPUTS = (
+    'person_id',         # ID (float)
+    'scope',             # Scope
+    'company',           # Company
+    'projects',          # Projects
+    'week_month',        # (Week / Month), normalised by excel_date_to_string
+    'isveren_currency',  # İşveren - Currency
+    'total_mh',          # TOTAL MH (float)
+    'kuzey_mh_person',   # Kuzey MH-Person (float)
+)
+
+# Inputs that vary per record even when everything else repeats
+MH_INPUTS = ('total_mh', 'kuzey_mh_person')
+
+person_id = Ref('person_id')
+scope = Ref('scope')
+company = Ref('company')
+projects = Ref('projects')
+week_month = Ref('week_month')
+total_mh = Ref('total_mh')
+kuzey_mh_person = Ref('kuzey_mh_person')
+
+FORMULA_RULES = RuleSet(FORMULA_INPUTS, [
+    # ---- FORMULA 1-5 ---------------------------------------------------------
+    Rule('north_south', Lookup('info', 13, 16, scope, ''), 'North/South'),
+    Rule('currency', Case((Eq(person_id, 905264), 'TL'),
+                          default=Lookup('rates', 0, 6, person_id, 'USD')), 'Currency'),
+    Rule('projects_group', Lookup('info', 14, 15, projects, ''),
+         'Projects/Group (written only when the record has none)'),
+    Rule('ap_cb_subcon', Case((Contains(company, 'AP-CB'), 'AP-CB'), default='Subcon'),
+         'AP-CB/Subcon'),
+    Rule('ls_unit_rate', Case((Or(Contains(Lower(scope), 'lumpsum'),
+                                  In(company, ('İ4', 'DEGENKOLB', 'Kilci Danışmanlık'))), 'Lumpsum'),
+                              default='Unit Rate'), 'LS/Unit Rate'),
+
+    # ---- FORMULA 6-8: Hourly Base / Additional / Rate ------------------------
+    Rule('hourly_base_rate', Case(
+        (And(Eq(Ref('ap_cb_subcon'), 'Subcon'), Eq(Ref('ls_unit_rate'), 'Unit Rate')),
+         Float(Lookup('rates', 0, 9, person_id, 0))),
+        default=Float(Lookup('rates', 0, 7, person_id, 0))), 'Hourly Base Rate'),
+    Rule('currency_norm', Upper(Str(Ref('currency')))),
+    Rule('usd_try', Float(Lookup('info', 20, 22, week_month, 1)), 'TCMB USD/TRY of the week'),
+    Rule('eur_usd', Float(Lookup('info', 20, 23, week_month, 1)), 'EUR/USD of the week'),
+    Rule('additional_base', Float(Lookup('rates', 0, 11, person_id, 0))),
+    Rule('hourly_additional_rate', Case(
+        (Or(Eq(Ref('ls_unit_rate'), 'Lumpsum'), In(company, ('AP-CB', 'AP-CB / pergel'))), 0),
+        (Eq(Ref('currency_norm'), 'USD'), Ref('additional_base')),
+        (Eq(Ref('currency_norm'), 'TL'), Mul(Ref('additional_base'), Ref('usd_try'))),
+        default=0), 'Hourly Additional Rates'),
+    Rule('hourly_rate', Add(Ref('hourly_base_rate'), Ref('hourly_additional_rate')), 'Hourly Rate'),
+
+    # ---- FORMULA 9-11: Cost, General Total Cost (USD), Hourly Unit Rate (USD) -
+    Rule('cost', Mul(Ref('hourly_rate'), total_mh), 'Cost'),
+    Rule('general_total_cost_usd', Case(
+        (And(Eq(Ref('currency_norm'), 'TL'), Ne(Ref('usd_try'), 0)), Div(Ref('cost'), Ref('usd_try'))),
+        (Eq(Ref('currency_norm'), 'TL'), 0),
+        (Eq(Ref('currency_norm'), 'EURO'), Mul(Ref('cost'), Ref('eur_usd'))),
+        default=Ref('cost')), 'General Total Cost (USD)'),
+    Rule('hourly_unit_rate_usd', Case(
+        (Ne(total_mh, 0), Div(Ref('general_total_cost_usd'), total_mh)),
+        default=0), 'Hourly Unit Rate (USD)'),
+
+    # ---- NO-1..NO-10 lookups --------------------------------------------------
+    Rule('no_1', Lookup('info', 13, 9, scope, 0), 'NO-1'),
+    Rule('no_2', Lookup('info', 13, 11, scope, ''), 'NO-2'),
+    Rule('no_3', Lookup('info', 13, 12, scope, ''), 'NO-3'),
+    Rule('no_10', Lookup('info', 9, 10, Ref('no_1'), ''), 'NO-10'),
+    Rule('no_1_num', Float(Ref('no_1'))),
+    Rule('no_2_str', Str(Ref('no_2'))),
+
+    # ---- FORMULA 12-15: İşveren Hakediş -------------------------------------
+    Rule('isveren_birim_fiyat', Case(
+        (Or(In(Ref('no_2_str'), ('999-A', '999-C', '414-C')), Eq(Ref('no_1_num'), 313)),
+         Ref('hourly_rate')),
+        (Or(In(Ref('no_1_num'), (312, 314, 316)), Eq(Ref('no_2_str'), '360-T')),
+         Mul(Ref('hourly_rate'), 1.02)),
+        (Eq(Ref('no_2_str'), '517-A'), Float(Lookup('info', 28, 33, person_id, 0))),
+        (Loaded('summary'), Add(Float(Lookup('summary', 2, 26, Ref('no_1'), 0)),
+                                Float(Lookup('summary', 2, 26, Ref('no_2'), 0)))),
+        default=0), 'İşveren-Hakediş Birim Fiyat'),
+    Rule('isveren_hakedis', Case(
+        (Gt(kuzey_mh_person, 0), Mul(kuzey_mh_person, Ref('isveren_birim_fiyat'))),
+        default=Mul(Ref('isveren_birim_fiyat'), total_mh)), 'İşveren- Hakediş'),
+    Rule('isveren_hakedis_usd', Case(
+        (Eq(Ref('isveren_currency'), 'EURO'), Mul(Ref('isveren_hakedis'), Ref('eur_usd'))),
+        default=Ref('isveren_hakedis')), 'İşveren- Hakediş (USD)'),
+    Rule('hakedis_mh', Case((Gt(kuzey_mh_person, 0), kuzey_mh_person), default=total_mh)),
+    Rule('isveren_birim_fiyat_usd', Case(
+        (Ne(Ref('hakedis_mh'), 0), Div(Ref('isveren_hakedis_usd'), Ref('hakedis_mh'))),
+        default=0), 'İşveren-Hakediş Birim Fiyat (USD)'),
+
+    # ---- Control & TM fields ---------------------------------------------------
+    Rule('control_1', Lookup('info', 14, 18, projects, ''), 'Control-1'),
+    Rule('has_tm_columns', Loaded('info', columns=(58, 60))),
+    Rule('tm_liste', Lookup('info', 58, 60, person_id, '', on_error=''), 'TM Liste'),
+    Rule('tm_kod', Lookup('info', 14, 17, projects, ''), 'TM Kod'),
+    Rule('kontrol_1', Lookup('info', 14, 9, projects, ''), 'Konrol-1'),
+    Rule('kontrol_2', Eq(Ref('no_1'), Ref('kontrol_1')), 'Knrtol-2'),
+])
+
+# Rules that do not depend on the MH inputs: identical for every record sharing
+# the other inputs, so the scalar path memoises them (see calculations.FormulaMemo)
+REFERENCE_RULES = tuple(name for name in FORMULA_RULES.order
+                        if name not in FORMULA_RULES.downstream(MH_INPUTS))
@@ -0,0 +1,250 @@
+"""
+Lookup indexes over the hakedis reference workbooks.
+Built once per uploaded file (see routes/hakedis.py::_excel_index) so the
+per-record rate lookups during hakedis generation do not rescan the sheets.
+"""
+
+import re
+from bisect import bisect_left
+from datetime import datetime, date
+
+import numpy as np
+
+
+def _parse_rate_date(raw):
+    """Parse a Döviz Kurları date cell → datetime.date or None."""
+    if hasattr(raw, 'date'):             # pandas Timestamp / datetime
+        return raw.date()
+    if isinstance(raw, date):
+        return raw
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%d.%m.%Y', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(str(raw)[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class ExchangeRateIndex:
+    """
+    Sorted as-of index over the Döviz Kurları rows.
+    lookup(d) returns the rate of the earliest row whose date is >= d
+    ("next valid date"); rows sharing a date keep their file order.
+    """
+
+    def __init__(self, dates, rates):
+        order = sorted(range(len(dates)), key=lambda i: dates[i])
+        self._ordinals = [dates[i].toordinal() for i in order]
+        self._rates = [rates[i] for i in order]
+        self._ordinals_np = np.asarray(self._ordinals, dtype=np.int64)
+        self._rates_np = np.asarray(self._rates, dtype=float)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Detect the date + USD/TRY columns and parse every usable row once."""
+        if not rows:
+            return cls([], [])
+
+        date_col = rate_col = None
+        for k in rows[0].keys():
+            kn = re.sub(r'[^a-z0-9]', '', k.lower())
+            if date_col is None and ('tarih' in kn or 'week' in kn or 'month' in kn):
+                date_col = k
+            if rate_col is None and ('usdtry' in kn or 'usdtl' in kn or 'usd' in kn or 'kur' in kn):
+                rate_col = k
+        if not date_col or not rate_col:
+            return cls([], [])
+
+        dates, rates = [], []
+        for row in rows:
+            raw_d = row.get(date_col)
+            raw_r = row.get(rate_col)
+            if raw_d is None or raw_r is None:
+                continue
+            d = _parse_rate_date(raw_d)
+            if d is None:
+                continue
+            try:
+                r = float(str(raw_r).replace(',', '.'))
+            except (ValueError, TypeError):
+                continue
+            dates.append(d)
+            rates.append(r)
+        return cls(dates, rates)
+
+    def __len__(self):
+        return len(self._ordinals)
+
+    def lookup(self, work_date):
+        """Rate for a single date, or None when no row is on/after it."""
+        i = bisect_left(self._ordinals, work_date.toordinal())
+        if i == len(self._ordinals):
+            return None
+        return self._rates[i]
+
+    def lookup_many(self, work_dates):
+        """Vectorised lookup for a batch of dates → list of rates (None where missing)."""
+        if not len(work_dates):
+            return []
+        wanted = np.fromiter((d.toordinal() for d in work_dates), dtype=np.int64,
+                             count=len(work_dates))
+        pos = np.searchsorted(self._ordinals_np, wanted, side='left')
+        n = len(self._ordinals_np)
+        return [float(self._rates_np[p]) if p < n else None for p in pos]
+
+
+def _clean(v):
+    """str(v).strip() with the 'nan'/'NaT'/'None' placeholders mapped to ''."""
+    if v is None:
+        return ''
+    s = str(v).strip()
+    return '' if s in ('nan', 'NaT', 'None') else s
+
+
+def _to_float(v):
+    try:
+        return float(_clean(v))
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _trigrams(s):
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class HourlyRateIndex:
+    """
+    Keyed index over the Hourly Rates rows.
+
+    Resolves a person to a row the same way the old linear scan did — ID match
+    first, then the first row (in file order) whose name equals, contains or is
+    contained in the requested name — using:
+      * a dict from ID string to row position,
+      * a dict from normalised (lower-cased) name to row position,
+      * a trigram index for the two-way "contains" fallback.
+    Rate/currency values are extracted once per period column pair, and every
+    resolved person is memoised, so lookup() is O(1) after the first call.
+    """
+
+    def __init__(self, rows, period_cols):
+        """
+        rows:        Hourly Rates rows (list of dicts, as read from the Excel).
+        period_cols: [(rate_column, currency_column), ...] that lookups may ask for.
+        """
+        self._size = len(rows)
+        id_col = name_col = None
+        if rows:
+            for k in rows[0].keys():
+                kl = k.lower().strip()
+                if id_col is None and kl in ('id', 'no', 'no.', 'sicil', 'employee id', 'emp id'):
+                    id_col = k
+                if name_col is None and any(x in kl for x in ('namesur', 'name', 'surname', 'isim', 'personel', 'ad soyad')):
+                    name_col = k
+        self._has_ids = id_col is not None
+        self._has_names = name_col is not None
+
+        self._by_id = {}
+        if id_col:
+            for pos, row in enumerate(rows):
+                self._by_id.setdefault(str(row.get(id_col, '')).strip(), pos)
+
+        self._names = []
+        self._gram_counts = []
+        self._by_name = {}
+        self._grams = {}      # trigram → sorted list of row positions
+        self._short = []      # positions of names too short for a trigram
+        if name_col:
+            for pos, row in enumerate(rows):
+                nv = _clean(row.get(name_col, '')).lower().strip()
+                grams = _trigrams(nv)
+                self._names.append(nv)
+                self._gram_counts.append(len(grams))
+                if not nv:
+                    continue
+                self._by_name.setdefault(nv, pos)
+                if not grams:
+                    self._short.append(pos)
+                for g in grams:
+                    self._grams.setdefault(g, []).append(pos)
+
+        # Period column values, resolved once: { rate_col: [(rate, currency), ...] }
+        self._periods = {}
+        for rate_col, curr_col in period_cols:
+            values = []
+            for row in rows:
+                rate = _to_float(row.get(rate_col))
+                curr = _clean(row.get(curr_col, 'USD')).upper().strip() if curr_col else 'USD'
+                values.append((rate, curr or 'USD'))
+            self._periods[rate_col] = values
+
+        self._resolved = {}   # (person_id_str, person_lower) → row position or None
+
+    def __len__(self):
+        return self._size
+
+    def lookup(self, person_name, rate_col, person_id=None):
+        """Return (rate, currency) for the person in rate_col, or (None, None)."""
+        values = self._periods.get(rate_col)
+        if values is None:
+            return None, None
+        pos = self.resolve(person_name, person_id)
+        if pos is None:
+            return None, None
+        return values[pos]
+
+    def resolve(self, person_name, person_id=None):
+        """Row position for a person (ID first, then name), or None."""
+        pid_str = str(person_id).strip() if person_id is not None else None
+        person_lower = (person_name or '').lower().strip()
+        key = (pid_str, person_lower)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+
+        pos = None
+        if pid_str is not None and self._has_ids:
+            pos = self._by_id.get(pid_str)
+        if pos is None and self._has_names and person_lower:
+            pos = self._match_name(person_lower)
+        self._resolved[key] = pos
+        return pos
+
+    def _match_name(self, p):
+        """First row whose name == p, is contained in p, or contains p."""
+        best = self._by_name.get(p)
+
+        # Row names contained in p: every trigram of the row name occurs in p
+        hits = {}
+        for g in _trigrams(p):
+            for pos in self._grams.get(g, ()):
+                hits[pos] = hits.get(pos, 0) + 1
+        for pos, n in hits.items():
+            if (best is None or pos < best) and n == self._gram_counts[pos] \
+                    and self._names[pos] in p:
+                best = pos
+        for pos in self._short:
+            if best is not None and pos >= best:
+                break
+            if self._names[pos] in p:
+                best = pos
+
+        # Row names containing p: the row name has every trigram of p
+        grams = _trigrams(p)
+        if grams:
+            postings = sorted((self._grams.get(g, []) for g in grams), key=len)
+            candidates = set(postings[0])
+            for plist in postings[1:]:
+                candidates.intersection_update(plist)
+                if not candidates:
+                    break
+        else:
+            candidates = range(len(self._names))
+        for pos in sorted(candidates):
+            if best is not None and pos >= best:
+                break
+            nv = self._names[pos]
+            if nv and p in nv:
+                best = pos
+                break
+        return best
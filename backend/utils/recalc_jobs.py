@@ -0,0 +1,363 @@
+"""
+Background recalculation of DatabaseRecord formula fields.
+
+POST /api/analytics/recalculate used to recalculate every record inside the
+request and commit once at the end. start_recalculation() instead runs the
+work on a single worker thread:
+  * records are read in keyset-paginated batches (id > last_id ORDER BY id)
+  * each batch goes through the vectorised engine (calculate_auto_fields_batch)
+    and only rows whose payload actually changed are written back
+  * every batch is committed on its own, so progress survives and no long
+    transaction is held
+In 'incremental' mode (the default) only records whose reference inputs changed
+since the last calculation are recalculated (see utils.calc_dependencies); 'full'
+recalculates everything.
+
+Job state lives in SystemInfo, so any app worker can report or cancel a job
+that another one runs:
+  * recalc_job:<id>     the job's progress as JSON (get_job()), written with every batch
+  * recalc_job_active   the id of the queued/running job; one job at a time across workers
+  * recalc_cancel:<id>  set by cancel_job(), checked by the job between batches
+A job whose state has not been written for STALE_AFTER seconds (its worker
+died) no longer blocks a new one.
+"""
+
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from models.database_record import DatabaseRecord
+from models.system_info import SystemInfo
+from utils.calc_dependencies import DependencyIndex, load_signatures, save_signatures
+from utils.record_store import bump_generation
+from utils.calculations import (
+    calculate_auto_fields, calculate_auto_fields_batch, load_excel_reference_data,
+)
+
+
+BATCH_SIZE = 2000
+MAX_ERRORS = 100       # error messages kept per job
+MAX_JOBS = 20          # finished jobs kept for status queries
+STALE_AFTER = 15 * 60  # seconds without a state write before a queued/running job counts as dead
+
+JOB_KEY = 'recalc_job:'
+CANCEL_KEY = 'recalc_cancel:'
+ACTIVE_KEY = 'recalc_job_active'
+ACTIVE_STATUSES = ('queued', 'running')
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recalc')
+
+
+def _status(state):
+    """Status dict of a stored job state, with elapsed time and ETA as of now."""
+    elapsed = eta = None
+    if state['started_at'] is not None:
+        elapsed = (state['finished_at'] or time.time()) - state['started_at']
+        if state['status'] == 'running' and state['processed']:
+            eta = elapsed / state['processed'] * max(state['total'] - state['processed'], 0)
+    status = {k: v for k, v in state.items() if k not in ('started_at', 'finished_at', 'heartbeat')}
+    status['progress'] = round(state['processed'] / state['total'] * 100, 1) if state['total'] else 0.0
+    status['elapsed_seconds'] = round(elapsed, 1) if elapsed is not None else None
+    status['eta_seconds'] = round(eta, 1) if eta is not None else None
+    return status
+
+
+def _state(job_id):
+    row = SystemInfo.query.filter_by(key=JOB_KEY + job_id).first()
+    if row is None or not row.value:
+        return None
+    try:
+        return json.loads(row.value)
+    except ValueError:
+        return None
+
+
+class RecalcJob:
+    """One recalculation run; its state is written to SystemInfo as it progresses."""
+
+    def __init__(self, upload_dir, mode='incremental'):
+        self.id = uuid.uuid4().hex
+        self.upload_dir = upload_dir
+        self.mode = mode            # 'incremental' or 'full'
+        self.status = 'queued'      # queued → running → completed / failed / cancelled
+        self.phase = None           # 'indexing' → 'recalculating'
+        self.changed_keys = None    # incremental: changed reference keys per dimension
+        self.total = 0
+        self.processed = 0
+        self.updated = 0
+        self.errors = []
+        self.error_count = 0
+        self.message = None
+        self.created_at = datetime.utcnow()
+        self.started = None         # time.time() timestamps
+        self.finished = None
+
+    def add_error(self, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(message)
+
+    def state(self):
+        return {
+            'job_id': self.id,
+            'mode': self.mode,
+            'status': self.status,
+            'phase': self.phase,
+            'changed_keys': self.changed_keys,
+            'total': self.total,
+            'processed': self.processed,
+            'updated': self.updated,
+            'errors': self.errors,
+            'error_count': self.error_count,
+            'message': self.message,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started,
+            'finished_at': self.finished,
+            'heartbeat': time.time(),
+        }
+
+    def to_dict(self):
+        return _status(self.state())
+
+    def save(self):
+        """Write the job state to SystemInfo (caller commits)."""
+        row = SystemInfo.query.filter_by(key=JOB_KEY + self.id).first()
+        if row is None:
+            row = SystemInfo(key=JOB_KEY + self.id)
+            db.session.add(row)
+        row.value = json.dumps(self.state(), ensure_ascii=False)
+
+    # ------------------------------------------------------------------
+
+    def run(self, app):
+        with app.app_context():
+            self.status = 'running'
+            self.started = time.time()
+            try:
+                self.save()
+                db.session.commit()
+                self._recalculate()
+                if self.status == 'running':
+                    self.status = 'completed'
+                    self.message = f'{self.updated} kayıt güncellendi.'
+            except Exception as e:
+                db.session.rollback()
+                self.status = 'failed'
+                self.message = str(e)
+                print(f'[CALC] Recalculation job {self.id} failed: {e}')
+            finally:
+                self.finished = time.time()
+                try:
+                    self.save()
+                    SystemInfo.query.filter_by(key=ACTIVE_KEY, value=self.id).delete()
+                    SystemInfo.query.filter_by(key=CANCEL_KEY + self.id).delete()
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f'[CALC] Could not record the end of recalculation job {self.id}: {e}')
+                db.session.remove()
+            print(f'[CALC] Recalculation job {self.id} {self.status}: {self.processed}/{self.total} '
+                  f'processed, {self.updated} updated in {self.finished - self.started:.1f}s')
+
+    def _cancelled(self):
+        if db.session.query(SystemInfo.id).filter_by(key=CANCEL_KEY + self.id).first() is not None:
+            self.status = 'cancelled'
+            self.message = f'İptal edildi ({self.processed}/{self.total}).'
+            return True
+        return False
+
+    def _recalculate(self):
+        # Read the reference file afresh; requests keep the current sheets until the new ones are in
+        if not load_excel_reference_data(upload_dir=self.upload_dir, reload=True):
+            raise RuntimeError('Excel referans verileri yüklenemedi')
+
+        index = DependencyIndex()
+        old_signatures = load_signatures() if self.mode == 'incremental' else None
+
+        if old_signatures is None:
+            # Full pass: every record, keyset-paginated; the index is built on the way
+            self.mode = 'full'
+            self.phase = 'recalculating'
+            self.total = db.session.query(func.count(DatabaseRecord.id)).scalar() or 0
+            self.save()
+            db.session.commit()
+            last_id = 0
+            while not self._cancelled():
+                batch = (self._batch_query()
+                         .filter(DatabaseRecord.id > last_id)
+                         .order_by(DatabaseRecord.id)
+                         .limit(BATCH_SIZE)
+                         .all())
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                self._process(batch, index)
+        else:
+            # Incremental: index record inputs, diff signatures, recalculate affected ids only
+            self.phase = 'indexing'
+            last_id = 0
+            while True:
+                if self._cancelled():
+                    return
+                rows = (db.session.query(DatabaseRecord.id, DatabaseRecord.data)
+                        .filter(DatabaseRecord.id > last_id)
+                        .order_by(DatabaseRecord.id)
+                        .limit(BATCH_SIZE)
+                        .all())
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                for row in rows:
+                    index.add(row.id, json.loads(row.data))
+                self.save()             # heartbeat
+                db.session.commit()
+
+            new_signatures = index.signatures()
+            self.changed_keys = index.changed_keys(old_signatures, new_signatures)
+            targets = sorted(index.affected_ids(old_signatures, new_signatures))
+            print(f'[CALC] Incremental recalculation: changed keys {self.changed_keys}, '
+                  f'{len(targets)} records affected')
+
+            self.phase = 'recalculating'
+            self.total = len(targets)
+            self.save()
+            db.session.commit()
+            for start in range(0, len(targets), BATCH_SIZE):
+                if self._cancelled():
+                    return
+                batch = (self._batch_query()
+                         .filter(DatabaseRecord.id.in_(targets[start:start + BATCH_SIZE]))
+                         .order_by(DatabaseRecord.id)
+                         .all())
+                self._process(batch)
+
+        if self.status == 'running' and not self.error_count:
+            # Stored records now match the loaded reference data. With errors the old
+            # signatures stay, so the next incremental run retries the affected records.
+            save_signatures(index.signatures())
+            db.session.commit()
+
+    @staticmethod
+    def _batch_query():
+        return db.session.query(DatabaseRecord.id, DatabaseRecord.personel,
+                                DatabaseRecord.data, DatabaseRecord.row_hash)
+
+    def _process(self, batch, index=None):
+        """Recalculate and write back one batch, then commit."""
+        changes = self._calculate_batch(batch, index)
+        if changes:
+            db.session.execute(update(DatabaseRecord), changes)
+            bump_generation()
+        self.processed += len(batch)
+        self.updated += len(changes)
+        self.save()
+        db.session.commit()
+
+    def _calculate_batch(self, batch, index=None):
+        """Recalculate one batch; returns the UPDATE parameter dicts for changed rows."""
+        payloads = [json.loads(row.data) for row in batch]
+        if index is not None:
+            for row, data in zip(batch, payloads):
+                index.add(row.id, data)
+        failed = set()
+        try:
+            calculate_auto_fields_batch(payloads, upload_dir=self.upload_dir)
+        except Exception as e:
+            # Fall back to the per-record engine so failures are reported per record
+            print(f'[CALC] Batch recalculation failed, falling back per record: {e}')
+            for i, (row, data) in enumerate(zip(batch, payloads)):
+                try:
+                    calculate_auto_fields(data, upload_dir=self.upload_dir)
+                except Exception as e:
+                    failed.add(i)
+                    self.add_error(f'Record {row.id}: {str(e)}')
+
+        now = datetime.utcnow()
+        changes = []
+        for i, (row, data) in enumerate(zip(batch, payloads)):
+            if i in failed:
+                continue
+            values = DatabaseRecord.row_values(data, row.personel)
+            if values['row_hash'] == row.row_hash:
+                continue
+            values['id'] = row.id
+            values['updated_at'] = now
+            changes.append(values)
+        return changes
+
+
+def _active_job():
+    """Status of the queued/running job, or None. Clears the marker of a job that ended or died."""
+    marker = SystemInfo.query.filter_by(key=ACTIVE_KEY).first()
+    if marker is None:
+        return None
+    state = _state(marker.value)
+    if state is not None and state['status'] in ACTIVE_STATUSES:
+        if time.time() - state['heartbeat'] < STALE_AFTER:
+            return _status(state)
+        state.update(status='failed', message='İş yanıt vermiyor (çalıştığı süreç durmuş olabilir).',
+                     finished_at=time.time())
+        SystemInfo.query.filter_by(key=JOB_KEY + marker.value).update(
+            {'value': json.dumps(state, ensure_ascii=False)})
+    db.session.delete(marker)
+    db.session.commit()
+    return None
+
+
+def _prune_jobs():
+    """Drop the state of all but the MAX_JOBS most recent jobs."""
+    old = [row.key[len(JOB_KEY):] for row in
+           SystemInfo.query.filter(SystemInfo.key.startswith(JOB_KEY))
+           .order_by(SystemInfo.id.desc()).offset(MAX_JOBS)]
+    if old:
+        SystemInfo.query.filter(SystemInfo.key.in_([JOB_KEY + i for i in old] +
+                                                   [CANCEL_KEY + i for i in old])).delete()
+        db.session.commit()
+
+
+def start_recalculation(app, upload_dir, mode='incremental'):
+    """
+    Queue a recalculation job and return (status, started). Only one job runs at
+    a time across all workers; while one is queued or running, its status is
+    returned with started=False.
+    """
+    active = _active_job()
+    if active is not None:
+        return active, False
+    job = RecalcJob(upload_dir, mode)
+    job.save()
+    db.session.add(SystemInfo(key=ACTIVE_KEY, value=job.id))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker started a job between the check and the insert
+        db.session.rollback()
+        active = _active_job()
+        if active is None:
+            raise
+        return active, False
+    _prune_jobs()
+    _executor.submit(job.run, app)
+    return job.to_dict(), True
+
+
+def get_job(job_id):
+    """Status of a job (from any worker), or None if unknown."""
+    state = _state(job_id)
+    return _status(state) if state is not None else None
+
+
+def cancel_job(job_id):
+    """Ask a queued/running job to stop after its current batch; returns its status or None."""
+    status = get_job(job_id)
+    if status is not None and status['status'] in ACTIVE_STATUSES:
+        if SystemInfo.query.filter_by(key=CANCEL_KEY + job_id).first() is None:
+            db.session.add(SystemInfo(key=CANCEL_KEY + job_id, value='1'))
+            db.session.commit()
+    return status
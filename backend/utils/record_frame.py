@@ -0,0 +1,144 @@
+"""
+Columnar view of the record store.
+
+The analytics routes filter and aggregate the whole record set per request,
+and walking the payload dicts costs a string clean-up per record, filter key
+and dimension every time. RecordFrame holds the records of one store snapshot
+as pandas columns, built once per data generation:
+
+  * dimensions (Company, Projects, Discipline, Scope, North/South, LS/Unit Rate,
+    NO-1 .. NO-10, and any other field on first use) as categoricals of the
+    cleaned value ('' when missing); utils.filter_index indexes their codes
+  * measures (TOTAL MH, İşveren Hakediş, General Total Cost) as float64
+  * the import-time period (work_year / work_month, -1 when missing)
+
+Row i of the frame is snapshot record i. Sums are taken with np.bincount, which
+adds in row order exactly as the per-record loops did (pandas' groupby().sum()
+uses compensated summation and can differ in the last digit).
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.calculations import safe_float
+from utils.record_store import get_snapshot
+from utils.schema import TOTAL_MH, NORTH_SOUTH, GENERAL_TOTAL_COST_USD
+
+
+# Dimension columns built with the frame: column → record fields, first non-empty wins
+DIMENSIONS = {
+    'Company':      ('Company', 'company'),
+    'Projects':     ('Projects', 'projects'),
+    'Discipline':   ('Discipline', 'discipline'),
+    'Scope':        ('Scope', 'scope'),
+    NORTH_SOUTH:    (NORTH_SOUTH,),
+    'LS/Unit Rate': ('LS/Unit Rate',),
+    'NO-1':         ('NO-1',),
+    'NO-2':         ('NO-2',),
+    'NO-3':         ('NO-3',),
+    'NO-10':        ('NO-10',),
+}
+
+_MISSING = ('', 'nan', 'None', 'NaT')
+
+
+def field_value(record, *names):
+    """First non-empty value of *names* in a record dict, as a stripped string ('' if none)."""
+    for n in names:
+        v = record.get(n)
+        if v is not None:
+            s = str(v).strip()
+            if s not in _MISSING:
+                return s
+    return ''
+
+
+class RecordFrame:
+    """The records of one store snapshot as columns (see module docstring)."""
+
+    def __init__(self, snapshot):
+        self.generation = snapshot.generation
+        self.records = snapshot.records
+        rows, records, n = snapshot.rows, snapshot.records, len(snapshot)
+
+        def period(values):
+            return np.fromiter((v if v else -1 for v in values), dtype=np.int64, count=n)
+
+        def measure(values):
+            return np.fromiter((safe_float(v or 0) for v in values), dtype=np.float64, count=n)
+
+        self.frame = pd.DataFrame({
+            'work_year':   period(row.work_year for row in rows),
+            'work_month':  period(row.work_month for row in rows),
+            'total_mh':    measure(rec.get(TOTAL_MH) for rec in records),
+            'hakedis_usd': measure(rec.get('İşveren- Hakediş (USD)') or rec.get('İşveren- Hakediş')
+                                   for rec in records),
+            'cost_usd':    measure(rec.get(GENERAL_TOTAL_COST_USD) for rec in records),
+        })
+        self._dimensions = {}
+        self._lock = threading.Lock()
+        for column, fields in DIMENSIONS.items():
+            self.frame[column] = self.dimension(*fields)
+
+    def __len__(self):
+        return len(self.records)
+
+    def column(self, name):
+        return self.frame[name].to_numpy()
+
+    def dimension(self, *fields):
+        """Categorical Series of field_value(record, *fields), built on first use."""
+        series = self._dimensions.get(fields)
+        if series is None:
+            values = [field_value(rec, *fields) for rec in self.records]
+            series = pd.Series(pd.Categorical(values), index=self.frame.index)
+            with self._lock:
+                series = self._dimensions.setdefault(fields, series)
+        return series
+
+    # -- masks --------------------------------------------------------------
+
+    def period_mask(self, year=None, month=None):
+        """
+        Mask of records in *year* / *month* (empty means any). Matched as the
+        strings '2024' and '03' are, so other spellings select nothing.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, value, width in (('work_year', year, 1), ('work_month', month, 2)):
+            if value:
+                value = str(value)
+                if not value.isdecimal() or value != str(int(value)).zfill(width):
+                    return np.zeros(len(self), dtype=bool)
+                mask &= self.column(column) == int(value)
+        return mask
+
+    # -- selections ---------------------------------------------------------
+
+    def select(self, mask):
+        """Record dicts where *mask* is set, in store order (shared: do not modify)."""
+        return [self.records[i] for i in np.flatnonzero(mask)]
+
+    def values(self, fields, rows, default=''):
+        """Object array of the *fields* value of the records at *rows* ('' replaced by *default*)."""
+        series = self.dimension(*fields)
+        labels = series.cat.categories.to_numpy(dtype=object)
+        if default:
+            labels = np.where(labels == '', default, labels)
+        return labels[series.cat.codes.to_numpy()[rows]]
+
+
+def group_sums(keys, weights):
+    """
+    (uniques, group, sums): *keys* grouped in first-seen order, the group of every
+    row and the sum of *weights* per group, added in row order.
+    """
+    group, uniques = pd.factorize(keys)
+    sums = np.bincount(group, weights=weights, minlength=len(uniques))
+    return uniques, group, sums
+
+
+def get_record_frame():
+    """RecordFrame of the current store snapshot (built once per data generation)."""
+    return get_snapshot().derived('frame', RecordFrame)
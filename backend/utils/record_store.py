@@ -0,0 +1,121 @@
+"""
+Shared in-process store of decoded DatabaseRecord rows.
+
+The dashboard, Excel-data, analytics and hakedis routes each used to load and
+json.loads the whole database_record table on every request, and the dashboard
+page fires five of those at once. The store keeps one decoded snapshot per
+process, tagged with the data generation. The generation is a counter in
+SystemInfo that every path writing records (import, delete, recalculation)
+advances in its own transaction through bump_generation().
+
+A reader costs one SELECT of the counter. The table is decoded again only
+after the counter moves, and then once, however many requests arrive together.
+Since the counter lives in the database, every worker process sees every
+other's writes.
+
+Snapshot records are shared between requests: treat them as read-only and copy
+a dict before adding keys to it.
+"""
+
+import json
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import Integer, Text, cast, update
+
+from models import db
+from models.database_record import DatabaseRecord
+from models.system_info import SystemInfo
+
+
+GENERATION_KEY = 'records_generation'
+
+# Promoted columns kept next to each payload, for filters that used to run in SQL
+StoredRecord = namedtuple('StoredRecord', [
+    'id', 'personel', 'company', 'projects', 'discipline', 'status', 'scope',
+    'work_year', 'work_month', 'data',
+])
+_COLUMNS = tuple(getattr(DatabaseRecord, name) for name in StoredRecord._fields)
+
+
+class RecordSnapshot:
+    """Decoded records of one data generation."""
+
+    def __init__(self, generation, rows):
+        self.generation = generation
+        self.rows = rows                           # StoredRecord tuples in id order
+        self.records = [row.data for row in rows]  # the payload dicts alone
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def derived(self, name, build):
+        """build(snapshot), computed once per snapshot and shared (frames, indexes)."""
+        value = self._derived.get(name)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = build(self)
+        return value
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def current_generation():
+    """Data generation of the stored records (0 before the first write)."""
+    value = db.session.query(SystemInfo.value).filter(SystemInfo.key == GENERATION_KEY).scalar()
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
+
+
+def bump_generation():
+    """Advance the data generation after writing records (caller commits, with the write)."""
+    stmt = (update(SystemInfo)
+            .where(SystemInfo.key == GENERATION_KEY)
+            .values(value=cast(cast(SystemInfo.value, Integer) + 1, Text),
+                    updated_at=datetime.utcnow()))
+    if db.session.execute(stmt).rowcount == 0:
+        db.session.add(SystemInfo(key=GENERATION_KEY, value='1'))
+
+
+def _load(generation):
+    started = time.perf_counter()
+    rows = []
+    for values in db.session.query(*_COLUMNS).order_by(DatabaseRecord.id):
+        try:
+            data = json.loads(values.data)
+        except (TypeError, ValueError):
+            continue
+        rows.append(StoredRecord(*values[:-1], data))
+    print(f'[STORE] Decoded {len(rows)} records for generation {generation} '
+          f'in {time.perf_counter() - started:.2f}s')
+    return RecordSnapshot(generation, rows)
+
+
+def get_snapshot():
+    """The decoded records of the current generation (reloaded only when it moved)."""
+    global _snapshot
+    # Generation first, records second: a write committed in between only costs a reload
+    generation = current_generation()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.generation == generation:
+        return snapshot
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.generation != generation:
+            snapshot = _snapshot = _load(generation)
+    return snapshot
+
+
+def load_records():
+    """Payload dicts of all records (shared: do not modify)."""
+    return get_snapshot().records
@@ -0,0 +1,148 @@
+"""
+Result cache for the analytics read endpoints.
+
+The analytics page asks for the same charts (/mh-summary, /kar-zarar-trends,
+/total-mh-pie, ...) with the same filters over and over, and the answer only
+changes when the records do. @cached_result keeps the JSON body of successful
+GET responses in a bounded LRU cache keyed by
+
+    (endpoint, canonical filters, other query args, data generation)
+
+so a repeat request is answered from the stored bytes. Filters are canonicalised
+the way the routes apply them (case-insensitive, order-free), so equivalent
+filter specs share an entry. Responses carry an ETag (hash of the body) and
+Cache-Control: private, no-cache and Vary: Authorization, Cookie; a browser
+revalidating with If-None-Match gets 304 Not Modified. The bodies do not depend
+on the user (access is checked by @role_required before the cache is asked).
+
+Entries of an older generation are dropped as soon as a newer one is stored.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from utils.record_store import current_generation
+
+
+RESULT_CACHE_BYTES = 64 * 1024 * 1024
+CACHE_CONTROL = 'private, no-cache'
+VARY = ('Authorization', 'Cookie')
+
+
+class ResultCache:
+    """LRU cache of response bodies bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key → (body, etag)
+        self._bytes = 0
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        """(body, etag) stored for *key*, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, generation, body, etag):
+        size = len(body)
+        with self._lock:
+            if self._generation is not None and generation < self._generation:
+                return                  # computed before a newer write was seen
+            if generation != self._generation:
+                self._clear()
+                self._generation = generation
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, etag)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'generation': self._generation,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_results = ResultCache()
+
+
+def result_cache_stats():
+    """Hit/miss/eviction counters of the analytics result cache."""
+    return _results.stats()
+
+
+def canonical_filters(raw):
+    """
+    Canonical JSON of a {key: [values]} filters argument: sorted keys, values
+    stripped, upper-cased, de-duplicated and sorted, inactive keys dropped.
+    Anything that is not such a dict is returned as given.
+    """
+    try:
+        filters = json.loads(raw) if raw is not None else {}
+        return json.dumps({key: sorted({str(v).strip().upper() for v in values if v})
+                           for key, values in filters.items() if values},
+                          sort_keys=True, ensure_ascii=False)
+    except (ValueError, TypeError, AttributeError):
+        return raw
+
+
+def cached_result(view):
+    """Serve a GET JSON view from the result cache (place below @role_required)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        generation = current_generation()
+        params = tuple(sorted((k, v) for k, v in request.args.items(multi=True) if k != 'filters'))
+        key = (request.endpoint, canonical_filters(request.args.get('filters')), params, generation)
+
+        entry = _results.get(key)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or not response.is_json:
+                return response
+            body = response.get_data()
+            etag = hashlib.sha1(body).hexdigest()
+            _results.put(key, generation, body, etag)
+        else:
+            body, etag = entry
+            response = current_app.response_class(body, mimetype='application/json')
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.vary.update(VARY)
+        return response.make_conditional(request)
+    return wrapper
@@ -0,0 +1,122 @@
+"""
+Canonical column names for DATABASE-sheet records.
+
+Excel exports spell the same header in several ways ('(Week / \\nMonth)',
+'(Week /\\nMonth)', '(Week / Month)', 'TOTAL\\n MH', 'TOTAL_MH', ...).
+Records are normalised once at import (normalize_record / normalize_columns)
+so readers can do a single dict lookup, e.g. record.get(TOTAL_MH), instead
+of probing every spelling.
+
+Canonical names are the spellings of the current DATABASE sheet, which is
+also what the frontend reads.
+"""
+
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+
+WEEK_MONTH             = '(Week / \nMonth)'
+TOTAL_MH               = 'TOTAL\n MH'
+NORTH_SOUTH            = 'North/\nSouth'
+GENERAL_TOTAL_COST_USD = 'General Total\n Cost (USD)'
+HOURLY_RATE            = 'Hourly\n Rate'
+AP_CB_SUBCON           = 'AP-CB /\nSubcon'
+NAME_SURNAME           = 'Name Surname'
+PROJECTS_GROUP         = 'Projects/Group'
+
+# Canonical name → other spellings seen in exports. Headers are compared
+# case- and whitespace-insensitively, so only spellings that differ in more
+# than spacing/case need to be listed, plus those whose precedence matters:
+# when a record carries several spellings, the canonical one and then the
+# listed ones in order win over any other (see normalize_record).
+COLUMN_VARIANTS = {
+    WEEK_MONTH:             ('(Week /\nMonth)', '(Week / Month)', 'Week / Month', 'Week/Month'),
+    TOTAL_MH:               ('TOTAL MH', 'Total MH', 'TOTAL_MH'),
+    NORTH_SOUTH:            (),
+    GENERAL_TOTAL_COST_USD: (),
+    HOURLY_RATE:            (),
+    AP_CB_SUBCON:           ('APCB/Subcon',),
+    NAME_SURNAME:           ('Name_Surname', 'NameSurname'),
+    PROJECTS_GROUP:         (),
+}
+
+
+def _header_key(name):
+    return re.sub(r'\s+', '', name).lower()
+
+
+_CANONICAL_BY_KEY = {}
+_PRECEDENCE = {}    # exact spelling → rank among the spellings of its column
+for _canonical, _variants in COLUMN_VARIANTS.items():
+    for _rank, _name in enumerate((_canonical,) + _variants):
+        _CANONICAL_BY_KEY[_header_key(_name)] = _canonical
+        _PRECEDENCE.setdefault(_name, _rank)
+
+
+@lru_cache(maxsize=4096)
+def canonical_name(header):
+    """Canonical spelling of a column header (unknown headers are returned stripped)."""
+    header = str(header).strip()
+    return _CANONICAL_BY_KEY.get(_header_key(header), header)
+
+
+def _is_blank(v):
+    if v is None:
+        return True
+    if isinstance(v, float) and v != v:
+        return True
+    return isinstance(v, str) and v.strip() in ('', 'nan', 'None', 'NaT')
+
+
+def _is_empty(v):
+    """Blank or zero: a spelling holding this gives way to the next one, as `a or b or c` did."""
+    if _is_blank(v):
+        return True
+    try:
+        return float(v) == 0
+    except (TypeError, ValueError):
+        return False
+
+
+def _precedence(header):
+    return _PRECEDENCE.get(str(header).strip(), len(_PRECEDENCE))
+
+
+def normalize_record(row):
+    """
+    Return a copy of a record dict keyed by canonical names.
+    When several spellings of one column are present, the first one in
+    COLUMN_VARIANTS order wins unless it is blank or zero, e.g. 'TOTAL\\n MH',
+    then 'TOTAL MH', then 'Total MH'. Other spellings follow in record order.
+    """
+    out = {}
+    best = {}   # canonical name → (empty, precedence) of the value kept
+    for k, v in row.items():
+        key = canonical_name(k)
+        rank = (_is_empty(v), _precedence(k))
+        if key in out and rank >= best[key]:
+            continue
+        out[key] = v
+        best[key] = rank
+    return out
+
+
+def normalize_columns(df):
+    """Rename DataFrame columns to canonical names, coalescing duplicate spellings as normalize_record does."""
+    names = [canonical_name(c) for c in df.columns]
+    if len(set(names)) == len(names):
+        df.columns = names
+        return df
+    spellings = {}
+    for position, (name, column) in enumerate(zip(names, df.columns)):
+        spellings.setdefault(name, []).append((_precedence(column), position))
+    merged = {}
+    for name, ranked in spellings.items():
+        columns = [df.iloc[:, position] for _, position in sorted(ranked)]
+        series = columns[0]
+        for other in columns[1:]:
+            series = series.where(~series.map(_is_empty) | other.map(_is_empty), other)
+        merged[name] = series
+    return pd.DataFrame(merged, index=df.index)
@@ -0,0 +1,314 @@
+"""
+Parquet snapshots of workbook sheets.
+
+Parsing the reference sheets (.xlsb through pyxlsb) takes seconds and used to
+happen whenever a cache was cold: after every restart and invalidate_cache().
+read_sheet() parses a sheet once, stores it as a Parquet file under
+<workbook dir>/.snapshots/<sha256 of the workbook>/ and serves later reads
+from that file (memory-mapped). Snapshots are keyed by the workbook content,
+so a re-uploaded file never sees another file's sheets.
+
+Cell values round-trip exactly. Excel columns often mix numbers and text, which
+Parquet cannot hold in one column, so object columns are stored as a type-code
+column plus one column per value type and reassembled on read. Every snapshot
+is read back and compared before it is used; a sheet that does not round-trip
+is marked unsupported and always parsed from the workbook. Without pyarrow
+read_sheet() is plain pd.read_excel.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # optional: every read parses the workbook
+    pa = pq = None
+
+
+SNAPSHOT_DIR = '.snapshots'
+FORMAT_VERSION = 1
+_META_KEY = b'sheet_snapshot'
+_EXCEL_EXTENSIONS = ('.xlsb', '.xlsx', '.xls')
+
+# (sheet, header row) as load_excel_reference_data reads them; converted on upload
+REFERENCE_SHEETS = (('Info', 0), ('Hourly Rates', 1), ('Summary', 0))
+
+_digests = {}   # (path, size, mtime_ns) → sha256 hex
+_digests_lock = threading.Lock()
+
+
+class _Unsupported(Exception):
+    """Sheet content the snapshot format cannot reproduce exactly."""
+
+
+def file_digest(path):
+    """sha256 of the file content (hashed once per path/size/mtime)."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        with _digests_lock:
+            _digests[key] = digest
+    return digest
+
+
+def snapshot_path(file_path, sheet_name, header=0):
+    folder = os.path.join(os.path.dirname(os.path.abspath(file_path)), SNAPSHOT_DIR,
+                          file_digest(file_path))
+    name = re.sub(r'[^A-Za-z0-9_-]+', '_', sheet_name)
+    tag = hashlib.sha1(f'{sheet_name}\0{header}'.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(folder, f'{name}.{tag}.parquet')
+
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+
+# Type codes of values in object columns: code → (child column suffix, arrow type, fill value)
+_NONE, _FLOAT, _BOOL, _INT, _STR, _DATETIME, _TIMESTAMP = range(7)
+_CHILDREN = {
+    _FLOAT:     ('f', 'float64', 0.0),
+    _BOOL:      ('b', 'bool', False),
+    _INT:       ('i', 'int64', 0),
+    _STR:       ('s', 'string', ''),
+    _DATETIME:  ('d', 'timestamp[ns]', np.datetime64(0, 'ns')),
+    _TIMESTAMP: ('t', 'timestamp[ns]', np.datetime64(0, 'ns')),
+}
+_NATIVE_KINDS = 'fiub'   # float, int, uint, bool numpy dtypes
+
+
+def _type_code(value):
+    if value is None:
+        return _NONE
+    if isinstance(value, (bool, np.bool_)):
+        return _BOOL
+    if isinstance(value, float):
+        return _FLOAT
+    if isinstance(value, (int, np.integer)):
+        if not -2 ** 63 <= value < 2 ** 63:
+            raise _Unsupported('integer out of int64 range')
+        return _INT
+    if isinstance(value, str):
+        return _STR
+    if isinstance(value, pd.Timestamp):
+        if value.tzinfo is not None:
+            raise _Unsupported('timezone-aware timestamp')
+        return _TIMESTAMP
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            raise _Unsupported('timezone-aware datetime')
+        return _DATETIME
+    raise _Unsupported(f'cell type {type(value).__name__}')
+
+
+def _encode_name(name):
+    if isinstance(name, str):
+        return ['s', name]
+    if isinstance(name, (bool, np.bool_)):
+        raise _Unsupported('boolean column name')
+    if isinstance(name, (int, np.integer)):
+        return ['i', int(name)]
+    if isinstance(name, float):
+        return ['f', name]
+    if isinstance(name, datetime) and name.tzinfo is None:
+        return ['t' if isinstance(name, pd.Timestamp) else 'd', name.isoformat()]
+    raise _Unsupported(f'column name type {type(name).__name__}')
+
+
+def _decode_name(encoded):
+    kind, value = encoded
+    return {'s': str, 'i': int, 'f': float, 'd': datetime.fromisoformat, 't': pd.Timestamp}[kind](value)
+
+
+def _encode(df):
+    """DataFrame → pyarrow Table (positional column keys, layout in the schema metadata)."""
+    arrays, layout = {}, []
+    for i in range(df.shape[1]):
+        values = df.iloc[:, i].to_numpy()
+        key = f'c{i}'
+        if values.dtype == object:
+            codes = np.fromiter((_type_code(v) for v in values), dtype=np.int8, count=len(values))
+            arrays[key] = pa.array(codes, type=pa.int8())
+            present = sorted(int(c) for c in np.unique(codes) if c != _NONE)
+            for code in present:
+                suffix, arrow_type, fill = _CHILDREN[code]
+                child = [v if c == code else fill for v, c in zip(values, codes)]
+                arrays[f'{key}.{suffix}'] = pa.array(child, type=arrow_type)
+            layout.append(['object', present])
+        elif values.dtype.kind in _NATIVE_KINDS or values.dtype == np.dtype('datetime64[ns]'):
+            arrays[key] = pa.array(values)
+            layout.append(['native', str(values.dtype)])
+        else:
+            raise _Unsupported(f'column dtype {values.dtype}')
+
+    meta = {
+        'version': FORMAT_VERSION,
+        'columns': [_encode_name(c) for c in df.columns],
+        'columns_dtype': str(df.columns.dtype),
+        'layout': layout,
+        'rows': len(df),
+    }
+    table = pa.table(arrays) if arrays else pa.table({'_': pa.nulls(len(df))})
+    return table.replace_schema_metadata({_META_KEY: json.dumps(meta, ensure_ascii=False)})
+
+
+def _decode(table):
+    meta = json.loads(table.schema.metadata[_META_KEY])
+    if meta.get('version') != FORMAT_VERSION:
+        raise _Unsupported('snapshot format version')
+    n = meta['rows']
+    data = {}
+    for i, (kind, spec) in enumerate(meta['layout']):
+        key = f'c{i}'
+        if kind == 'native':
+            data[i] = table.column(key).to_numpy().astype(spec, copy=False)
+            continue
+        codes = table.column(key).to_numpy()
+        values = np.empty(n, dtype=object)
+        for code in spec:
+            suffix = _CHILDREN[code][0]
+            child = table.column(f'{key}.{suffix}')
+            mask = codes == code
+            if code == _DATETIME:
+                values[mask] = pd.DatetimeIndex(child.to_numpy())[mask].to_pydatetime()
+            elif code == _TIMESTAMP:
+                values[mask] = pd.DatetimeIndex(child.to_numpy())[mask].astype(object)
+            else:
+                values[mask] = child.to_numpy(zero_copy_only=False)[mask]
+        data[i] = values
+
+    df = pd.DataFrame(data, index=pd.RangeIndex(n))
+    df.columns = pd.Index([_decode_name(c) for c in meta['columns']], dtype=meta['columns_dtype'])
+    return df
+
+
+def _same(a, b):
+    """Exact equality: column names/types, dtypes, and every cell's value and type."""
+    if a.shape != b.shape or a.columns.dtype != b.columns.dtype:
+        return False
+    if [(type(x), x) for x in a.columns] != [(type(x), x) for x in b.columns]:
+        return False
+    for i in range(a.shape[1]):
+        x, y = a.iloc[:, i].to_numpy(), b.iloc[:, i].to_numpy()
+        if x.dtype != y.dtype:
+            return False
+        if x.dtype == object:
+            for u, v in zip(x, y):
+                if type(u) is not type(v):
+                    return False
+                if u != v and not (u != u and v != v):
+                    return False
+        elif x.dtype.kind == 'f':
+            if not np.array_equal(x, y, equal_nan=True):
+                return False
+        elif not np.array_equal(x, y):
+            return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Reading / writing
+# ---------------------------------------------------------------------------
+
+def _write(df, path):
+    """Write and verify a snapshot; returns False (and marks the sheet) if it cannot round-trip."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        pq.write_table(_encode(df), tmp)
+        if not _same(df, _decode(pq.read_table(tmp, memory_map=True))):
+            raise _Unsupported('read-back mismatch')
+        os.replace(tmp, path)
+        return True
+    except _Unsupported as e:
+        print(f'[SNAPSHOT] {os.path.basename(path)}: not snapshotted ({e})')
+        open(f'{path}.unsupported', 'w').close()
+        return False
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_sheet(file_path, sheet_name, header=0, engine=None):
+    """
+    pd.read_excel(file_path, sheet_name=sheet_name, header=header, engine=engine),
+    served from the sheet's Parquet snapshot when there is one; a sheet parsed
+    here is snapshotted for the next read.
+    """
+    def parse():
+        if engine:
+            return pd.read_excel(file_path, sheet_name=sheet_name, header=header, engine=engine)
+        return pd.read_excel(file_path, sheet_name=sheet_name, header=header)
+
+    if pq is None:
+        return parse()
+
+    path = snapshot_path(file_path, sheet_name, header)
+    if os.path.exists(path):
+        try:
+            return _decode(pq.read_table(path, memory_map=True))
+        except Exception as e:
+            print(f'[SNAPSHOT] Ignoring unreadable snapshot {path}: {e}')
+
+    df = parse()
+    if not os.path.exists(f'{path}.unsupported'):
+        try:
+            if _write(df, path):
+                print(f'[SNAPSHOT] Stored {sheet_name!r} of {os.path.basename(file_path)} '
+                      f'({len(df)} rows)')
+        except Exception as e:
+            print(f'[SNAPSHOT] Could not store {sheet_name!r}: {e}')
+    return df
+
+
+def snapshot_workbook(file_path, sheets, engine=None):
+    """
+    Convert [(sheet_name, header), ...] of a freshly uploaded workbook into snapshots.
+    Sheets the workbook does not have are skipped. Returns the names snapshotted.
+    """
+    if pq is None:
+        return []
+    stored = []
+    for sheet_name, header in sheets:
+        path = snapshot_path(file_path, sheet_name, header)
+        if os.path.exists(path):
+            stored.append(sheet_name)
+            continue
+        try:
+            read_sheet(file_path, sheet_name, header, engine)
+        except Exception as e:
+            print(f'[SNAPSHOT] Skipping {sheet_name!r}: {e}')
+            continue
+        if os.path.exists(path):
+            stored.append(sheet_name)
+    return stored
+
+
+def prune_snapshots(directory):
+    """Remove snapshots of workbooks no longer present in *directory*."""
+    root = os.path.join(directory, SNAPSHOT_DIR)
+    if not os.path.isdir(root):
+        return 0
+    keep = {file_digest(os.path.join(directory, f)) for f in os.listdir(directory)
+            if f.lower().endswith(_EXCEL_EXTENSIONS)}
+    removed = 0
+    for digest in os.listdir(root):
+        if digest not in keep:
+            shutil.rmtree(os.path.join(root, digest), ignore_errors=True)
+            removed += 1
+    return removed
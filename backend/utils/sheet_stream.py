@@ -0,0 +1,158 @@
+"""
+Streaming reader for large worksheets.
+
+pd.read_excel builds a list of every row and then a DataFrame of the whole
+sheet; for a DATABASE sheet near the upload limit that peaks at several GB.
+SheetStream walks one sheet row by row (openpyxl read_only / pyxlsb) and hands
+it out as DataFrames of at most chunk_rows rows, so only one chunk is held in
+memory at a time.
+
+Cells are converted as pd.read_excel converts them (integral numbers → int,
+empty cells and the default NA strings → missing) and header names follow
+read_excel(header=0) ('Unnamed: 3', duplicate 'Name.1'). Unlike read_excel:
+  * chunks are object columns typed per cell, so a row reads the same whatever
+    chunk it lands in (read_excel infers per column: numeric text becomes a
+    number, an int column with blanks becomes float)
+  * blank rows are skipped; the index still counts them, so it matches
+    read_excel's row numbers
+  * cells right of the header row's last column are ignored
+.xls workbooks (xlrd has no streaming mode) are read whole and then chunked.
+"""
+
+import os
+
+import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
+from pandas.io.parsers import TextParser
+
+
+CHUNK_ROWS = 5000
+
+
+def _convert_number(value):
+    if isinstance(value, float):
+        as_int = int(value)
+        if as_int == value:
+            return as_int
+    return value
+
+
+def _openpyxl_rows(file_path, sheet_name):
+    """Converted rows of an .xlsx sheet, (rows, dimension row count, close)."""
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    book = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    if sheet_name not in book.sheetnames:
+        book.close()
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    sheet = book[sheet_name]
+    total = sheet.max_row
+    sheet.reset_dimensions()   # as pandas: the stored dimension may be stale
+
+    def convert(cell):
+        if cell.value is None:
+            return ''
+        if cell.data_type == TYPE_ERROR:
+            return None
+        if cell.data_type == TYPE_NUMERIC:
+            return _convert_number(cell.value)
+        return cell.value
+
+    rows = ([convert(cell) for cell in row] for row in sheet.rows)
+    return rows, total, book.close
+
+
+def _pyxlsb_rows(file_path, sheet_name):
+    """Converted rows of an .xlsb sheet, (rows, dimension row count, close)."""
+    from pyxlsb import open_workbook
+
+    book = open_workbook(file_path)
+    try:
+        sheet = book.get_sheet(sheet_name)
+    except ValueError:
+        book.close()
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    total = sheet.dimension.r + sheet.dimension.h if sheet.dimension else None
+
+    def rows():
+        previous = -1
+        for row in sheet.rows(sparse=True):
+            for _ in range(previous + 1, row[0].r):
+                yield []
+            previous = row[0].r
+            yield ['' if cell.v is None else _convert_number(cell.v) for cell in row]
+
+    def close():
+        sheet.close()
+        book.close()
+
+    return rows(), total, close
+
+
+def _whole_sheet_rows(file_path, sheet_name, engine):
+    """Fallback for formats without a streaming reader (.xls): parse once, then iterate."""
+    df = pd.read_excel(file_path, sheet_name=sheet_name, header=None, dtype=object,
+                       na_filter=False, engine=engine)
+    return (list(row) for row in df.itertuples(index=False)), len(df), lambda: None
+
+
+class SheetStream:
+    """
+    One worksheet read row by row, header on the first row.
+
+        with SheetStream(path, 'DATABASE', engine) as sheet:
+            sheet.columns                       # header names, as read_excel(header=0)
+            for chunk in sheet.chunks(5000):    # object DataFrames
+                ... sheet.rows_read / sheet.total_rows ...
+
+    total_rows is the data row count from the sheet's dimension record (an
+    estimate for progress; None if the file has none).
+    """
+
+    def __init__(self, file_path, sheet_name, engine=None):
+        ext = os.path.splitext(file_path)[1].lower()
+        if engine == 'pyxlsb' or ext == '.xlsb':
+            rows, total, self._close = _pyxlsb_rows(file_path, sheet_name)
+        elif ext in ('.xlsx', '.xlsm'):
+            rows, total, self._close = _openpyxl_rows(file_path, sheet_name)
+        else:
+            rows, total, self._close = _whole_sheet_rows(file_path, sheet_name, engine)
+        self._rows = rows
+        self.rows_read = 0
+
+        header = next(self._rows, [])
+        while header and header[-1] == '':
+            header.pop()
+        self.columns = list(TextParser([header], header=0).read().columns) if header else []
+        self.total_rows = max(total - 1, 0) if total is not None else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        """Yield the data rows as object DataFrames of at most chunk_rows rows."""
+        width = len(self.columns)
+        values, index = [], []
+        for position, row in enumerate(self._rows):
+            self.rows_read = position + 1
+            cells = [None if v is None or (isinstance(v, str) and v in STR_NA_VALUES) else v
+                     for v in row[:width]]
+            if all(v is None for v in cells):
+                continue
+            cells.extend([None] * (width - len(cells)))
+            values.append(cells)
+            index.append(position)
+            if len(values) >= chunk_rows:
+                yield pd.DataFrame(values, columns=self.columns, index=index, dtype=object)
+                values, index = [], []
+        if values:
+            yield pd.DataFrame(values, columns=self.columns, index=index, dtype=object)
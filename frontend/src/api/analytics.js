@@ -5,8 +5,9 @@ const BASE = '/analytics';
 export const analyticsApi = {
     /**
      * GET /api/analytics/filter-options
-     * Returns available filter values for all dimensions.
-     * Pass activeFilters to get cascading options.
+     * Returns available filter values ({label, value, count}) for all dimensions.
+     * Pass activeFilters to get cascading options: each dimension is narrowed
+     * by the filters on the other dimensions.
      */
     getFilterOptions: async (filters = {}) => {
         try {
@@ -109,13 +110,32 @@ export const analyticsApi = {
 
     /**
      * POST /api/analytics/recalculate  (admin only)
-     * Re-run calculate_auto_fields on every record in the DB.
+     * Start a background job that re-runs the calculation engine on every record.
+     * Returns the job ({ job_id, status, processed, total, ... }).
      */
     recalculate: async () => {
         const response = await client.post(`${BASE}/recalculate`);
         return response.data;
     },
 
+    /**
+     * GET /api/analytics/recalculate/:jobId  (admin only)
+     * Progress of a recalculation job: processed/total/errors/eta_seconds.
+     */
+    getRecalculateStatus: async (jobId) => {
+        const response = await client.get(`${BASE}/recalculate/${jobId}`);
+        return response.data;
+    },
+
+    /**
+     * DELETE /api/analytics/recalculate/:jobId  (admin only)
+     * Cancel a running recalculation job (already committed batches are kept).
+     */
+    cancelRecalculate: async (jobId) => {
+        const response = await client.delete(`${BASE}/recalculate/${jobId}`);
+        return response.data;
+    },
+
     /**
      * POST /api/analytics/fill-empty-cells  (admin only)
      * Upload an Excel file; receive a processed file with empty cells filled.
@@ -20,6 +20,11 @@ const DashboardService = {
     getProjectStats: async () => {
         const response = await client.get('/dashboard/project-stats');
         return response.data;
+    },
+    // Several widgets ('stats', 'personnel', 'projects', ...) from one request
+    getBatch: async (widgets) => {
+        const response = await client.post('/dashboard/batch', { widgets });
+        return response.data;
     }
 };
 
@@ -132,9 +132,31 @@ export const excelApi = {
             console.error('Failed to fetch data status:', error);
             throw error;
         }
+    },
+
+    // Progress of the running import-all (DATABASE rows read so far)
+    getImportProgress: async () => {
+        const response = await client.get('/excel/import-progress');
+        return response.data;
     }
 };
 
+// Consistent field names for the personnel list
+const normalizePersonnel = (data) => data.map((p, index) => ({
+    id: p.id || index,
+    name: p.ad || 'Unknown',
+    ad: p.ad || 'Unknown',
+    department: p.departman || 'Genel',
+    departman: p.departman || 'Genel',
+    role: p.pozisyon || 'Personel',
+    pozisyon: p.pozisyon || 'Personel',
+    performance: p.performans || 0,
+    performans: p.performans || 0,
+    toplamMH: p.toplamMH || 0,
+    tamamlanan: p.tamamlanan || 0,
+    projects: p.projects || ''
+}));
+
 // Enhanced dashboard API with Excel integration
 export const dashboardApi = {
     // Get dashboard statistics with Excel data
@@ -181,23 +203,7 @@ export const dashboardApi = {
         try {
             // Use dashboard API which now returns real data
             const response = await client.get('/dashboard/personnel');
-            const data = response.data;
-
-            // Ensure consistent field names for frontend
-            return data.map((p, index) => ({
-                id: p.id || index,
-                name: p.ad || 'Unknown',
-                ad: p.ad || 'Unknown',
-                department: p.departman || 'Genel',
-                departman: p.departman || 'Genel',
-                role: p.pozisyon || 'Personel',
-                pozisyon: p.pozisyon || 'Personel',
-                performance: p.performans || 0,
-                performans: p.performans || 0,
-                toplamMH: p.toplamMH || 0,
-                tamamlanan: p.tamamlanan || 0,
-                projects: p.projects || ''
-            }));
+            return normalizePersonnel(response.data);
         } catch (error) {
             console.error('Failed to fetch personnel:', error);
             throw error;
@@ -214,5 +220,19 @@ export const dashboardApi = {
             console.error('Failed to fetch projects:', error);
             throw error;
         }
+    },
+
+    // Several widgets in one request, computed in one pass on the server:
+    // 'stats', 'personnel', 'department-performance', 'projects', 'project-stats'
+    getBatch: async (widgets) => {
+        try {
+            const response = await client.post('/dashboard/batch', { widgets });
+            const data = response.data;
+            if (data.personnel) data.personnel = normalizePersonnel(data.personnel);
+            return data;
+        } catch (error) {
+            console.error('Failed to fetch dashboard widgets:', error);
+            throw error;
+        }
     }
 };
\ No newline at end of file
@@ -35,7 +35,7 @@ const YEAR_OPTIONS = [2022, 2023, 2024, 2025].map(y => ({ value: String(y), labe
 
 
 
-function MultiSelect({ label, options = [], value = [], onChange }) {
+function MultiSelect({ label, options = [], counts = {}, value = [], onChange }) {
     const [open, setOpen] = useState(false);
     const ref = useRef(null);
 
@@ -50,6 +50,9 @@ function MultiSelect({ label, options = [], value = [], onChange }) {
         else onChange([...value, opt]);
     };
 
+    // Keep selected values listed even when the other filters leave no records for them
+    const shown = [...options, ...value.filter(v => !options.includes(v))];
+
     return (
         <div ref={ref} style={{ position: 'relative', minWidth: 140 }}>
             <button
@@ -82,7 +85,7 @@ function MultiSelect({ label, options = [], value = [], onChange }) {
                     border: '1px solid var(--border-color, #2d3148)', borderRadius: 8,
                     boxShadow: '0 8px 24px rgba(0,0,0,.4)'
                 }}>
-                    {options.map(opt => (
+                    {shown.map(opt => (
                         <label key={opt} style={{
                             display: 'flex', alignItems: 'center', gap: 8,
                             padding: '6px 12px', cursor: 'pointer', fontSize: 13,
@@ -95,10 +98,11 @@ function MultiSelect({ label, options = [], value = [], onChange }) {
                                 onChange={() => toggleOption(opt)}
                                 style={{ accentColor: '#6366f1' }}
                             />
-                            {opt}
+                            <span style={{ flex: 1 }}>{opt}</span>
+                            <span style={{ color: '#64748b', fontSize: 11 }}>{counts[opt] ?? 0}</span>
                         </label>
                     ))}
-                    {options.length === 0 && (
+                    {shown.length === 0 && (
                         <div style={{ padding: '8px 12px', color: '#64748b', fontSize: 12 }}>Seçenek yok</div>
                     )}
                 </div>
@@ -137,17 +141,22 @@ export default function GelismisAnaliz() {
     // Admin actions state
     const [recalculating, setRecalculating] = useState(false);
     const [recalcMsg, setRecalcMsg] = useState(null);
+    const [recalcJob, setRecalcJob] = useState(null);
     const [fillUploading, setFillUploading] = useState(false);
     const [fillMsg, setFillMsg] = useState(null);
     const [fillDownloadUrl, setFillDownloadUrl] = useState(null);
 
-    // Load filter options once on mount
+    // Cascading filter options: reload whenever the active filters change
     useEffect(() => {
+        let cancelled = false;
         setFiltersLoading(true);
-        analyticsApi.getFilterOptions({}).then(data => {
-            setFilterOptions(data || {});
-        }).catch(console.warn).finally(() => setFiltersLoading(false));
-    }, []);
+        analyticsApi.getFilterOptions(activeFilters).then(data => {
+            if (!cancelled) setFilterOptions(data || {});
+        }).catch(console.warn).finally(() => {
+            if (!cancelled) setFiltersLoading(false);
+        });
+        return () => { cancelled = true; };
+    }, [activeFilters]);
 
     // Load summary stats from filtered records
     useEffect(() => {
@@ -246,12 +255,33 @@ export default function GelismisAnaliz() {
         setRecalculating(true);
         setRecalcMsg(null);
         try {
-            const res = await analyticsApi.recalculate();
-            setRecalcMsg({ type: 'success', text: res?.message || `${res?.updated || 0} kayıt güncellendi.` });
+            // Runs as a background job on the server; poll until it finishes
+            let job = await analyticsApi.recalculate();
+            setRecalcJob(job);
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                job = await analyticsApi.getRecalculateStatus(job.job_id);
+                setRecalcJob(job);
+            }
+            if (job.status === 'failed') {
+                setRecalcMsg({ type: 'error', text: job.message || 'Yeniden hesaplama başarısız.' });
+            } else {
+                setRecalcMsg({ type: 'success', text: job.message || `${job.updated || 0} kayıt güncellendi.` });
+            }
         } catch (e) {
             setRecalcMsg({ type: 'error', text: e?.response?.data?.error || 'Yeniden hesaplama başarısız.' });
         } finally {
             setRecalculating(false);
+            setRecalcJob(null);
+        }
+    };
+
+    const handleCancelRecalculate = async () => {
+        if (!recalcJob) return;
+        try {
+            await analyticsApi.cancelRecalculate(recalcJob.job_id);
+        } catch (e) {
+            console.error('Failed to cancel recalculation:', e);
         }
     };
 
@@ -319,14 +349,18 @@ export default function GelismisAnaliz() {
                         { key: 'northSouth', label: 'North/South' },
                         { key: 'lsUnitRate', label: 'LS/Unit Rate' },
                     ].map(({ key, label }) => {
-                        // backend returns [{label, value}] objects — extract plain strings
+                        // backend returns [{label, value, count}] objects — extract plain strings
                         const rawOpts = filterOptions[key] || [];
                         const opts = rawOpts.map(o => (typeof o === 'object' ? o.value : o));
+                        const counts = Object.fromEntries(
+                            rawOpts.filter(o => typeof o === 'object').map(o => [o.value, o.count])
+                        );
                         return (
                             <MultiSelect
                                 key={key}
-                                label={filtersLoading ? '…' : label}
+                                label={filtersLoading && rawOpts.length === 0 ? '…' : label}
                                 options={opts}
+                                counts={counts}
                                 value={activeFilters[key] || []}
                                 onChange={(vals) => handleFilterChange(key, vals)}
                             />
@@ -576,6 +610,28 @@ export default function GelismisAnaliz() {
                                 <RefreshCw size={14} className={recalculating ? 'spin' : ''} />
                                 {recalculating ? 'Hesaplanıyor…' : 'Yeniden Hesapla'}
                             </button>
+                            {recalculating && recalcJob && (
+                                <div style={{ marginTop: 12, fontSize: 13, color: '#94a3b8' }}>
+                                    <div style={{ height: 6, background: 'rgba(148,163,184,.2)', borderRadius: 3, overflow: 'hidden' }}>
+                                        <div style={{ width: `${recalcJob.progress || 0}%`, height: '100%', background: '#6366f1' }} />
+                                    </div>
+                                    <div style={{ marginTop: 6, display: 'flex', justifyContent: 'space-between', alignItems: 'center' }}>
+                                        <span>
+                                            {recalcJob.processed || 0} / {recalcJob.total || 0} kayıt
+                                            {recalcJob.eta_seconds != null && ` · ~${Math.ceil(recalcJob.eta_seconds)} sn kaldı`}
+                                        </span>
+                                        <button
+                                            onClick={handleCancelRecalculate}
+                                            style={{
+                                                background: 'none', border: '1px solid rgba(244,63,94,.5)', borderRadius: 6,
+                                                padding: '2px 10px', color: '#f43f5e', cursor: 'pointer', fontSize: 12
+                                            }}
+                                        >
+                                            İptal
+                                        </button>
+                                    </div>
+                                </div>
+                            )}
                             {recalcMsg && (
                                 <div style={{
                                     marginTop: 12, display: 'flex', alignItems: 'center', gap: 6,
@@ -20,11 +20,12 @@ export default function PersonelAnalizRaporlari() {
 
                 // Try Excel API first, fallback to mock data
                 try {
-                    const [pData, summaryStats, projData] = await Promise.all([
-                        dashboardApi.getPersonnel(),
-                        excelApi.getSummaryStats(),
-                        dashboardApi.getProjects()
+                    const [batch, summaryStats] = await Promise.all([
+                        dashboardApi.getBatch(['personnel', 'projects']),
+                        excelApi.getSummaryStats()
                     ]);
+                    const pData = batch.personnel;
+                    const projData = batch.projects;
 
                     setPersonnel(pData);
 
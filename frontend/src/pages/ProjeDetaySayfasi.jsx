@@ -20,10 +20,9 @@ export default function ProjeDetaySayfasi() {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [projectsData, personnelData] = await Promise.all([
-                    DashboardService.getProjects(),
-                    DashboardService.getPersonnelList()
-                ]);
+                const batch = await DashboardService.getBatch(['projects', 'personnel']);
+                const projectsData = batch.projects;
+                const personnelData = batch.personnel;
 
                 if (projectsData.length > 0) {
                     const currentProj = projectsData[0]; // Pick first project for now
@@ -16,10 +16,9 @@ export default function ProjeRaporDagilimi() {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [projectStats, projects] = await Promise.all([
-                    dashboardApi.getProjectStats(),
-                    dashboardApi.getProjects()
-                ]);
+                const batch = await dashboardApi.getBatch(['project-stats', 'projects']);
+                const projectStats = batch['project-stats'];
+                const projects = batch.projects;
 
                 // Build report distribution from projects
                 const distribution = projects.slice(0, 10).map(p => ({
@@ -17,10 +17,9 @@ export default function ProjeRaporlama() {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [statsData, projects] = await Promise.all([
-                    dashboardApi.getProjectStats(),
-                    dashboardApi.getProjects()
-                ]);
+                const batch = await dashboardApi.getBatch(['project-stats', 'projects']);
+                const statsData = batch['project-stats'];
+                const projects = batch.projects;
 
                 setStats({
                     activeProjects: statsData.activeProjects,
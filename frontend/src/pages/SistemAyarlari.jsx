@@ -26,6 +26,7 @@ export default function SistemAyarlari() {
     const [uploadError, setUploadError] = useState('');
     const [importing, setImporting] = useState(false);
     const [importResult, setImportResult] = useState(null);
+    const [importProgress, setImportProgress] = useState(null);
     const [selectedIdCol, setSelectedIdCol] = useState('');
     const [expandedSheet, setExpandedSheet] = useState(null);
     const [dragOver, setDragOver] = useState(false);
@@ -92,14 +93,27 @@ export default function SistemAyarlari() {
         }
         setImporting(true);
         setImportResult(null);
+        setImportProgress(null);
         setUploadError('');
 
+        // The DATABASE sheet is streamed on the server; poll how far it got
+        const poll = setInterval(async () => {
+            try {
+                const progress = await excelApi.getImportProgress();
+                if (progress.status === 'running') setImportProgress(progress);
+            } catch {
+                // Progress is informational only
+            }
+        }, 1000);
+
         try {
             const res = await client.post('/excel/import-all', { idColumn: selectedIdCol });
             setImportResult(res.data);
         } catch (err) {
             setUploadError(err.response?.data?.error || 'Veriler içe aktarılırken hata oluştu');
         } finally {
+            clearInterval(poll);
+            setImportProgress(null);
             setImporting(false);
         }
     };
@@ -538,7 +552,13 @@ export default function SistemAyarlari() {
                                     }}
                                 >
                                     {importing ? (
-                                        <><div className="spinner-small" style={{ width: 16, height: 16, border: '2px solid rgba(255,255,255,0.2)', borderTopColor: '#fff', borderRadius: '50%', animation: 'spin 1s linear infinite' }} /> İçe Aktarılıyor...</>
+                                        <><div className="spinner-small" style={{ width: 16, height: 16, border: '2px solid rgba(255,255,255,0.2)', borderTopColor: '#fff', borderRadius: '50%', animation: 'spin 1s linear infinite' }} /> İçe Aktarılıyor...
+                                            {importProgress?.phase === 'database' && (
+                                                <span style={{ fontSize: '0.8rem', opacity: 0.8 }}>
+                                                    {importProgress.rows_read.toLocaleString('tr-TR')}
+                                                    {importProgress.total_rows ? ` / ${importProgress.total_rows.toLocaleString('tr-TR')}` : ''} satır
+                                                </span>
+                                            )}</>
                                     ) : (
                                         <><Users size={16} /> Tüm Verileri İçe Aktar (Kullanıcı, Bilgi, Saat Ücretleri)</>
                                     )}